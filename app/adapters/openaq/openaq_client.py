@@ -0,0 +1,181 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+from app.domain.metrics import OPENAQ_REQUEST_SECONDS, OPENAQ_REQUESTS, OPENAQ_RETRIES
+from app.domain.model.config import OpenAQConfig
+
+# Statuses worth another attempt, everything else is returned to the caller as an error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def _header_float(response: httpx.Response, name: str) -> Optional[float]:
+    try:
+        return float(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Client-side request budget, corrected by the rate-limit headers of every response."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # waiters queue on the lock, so they are served in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def observe(self, remaining: Optional[float], reset_seconds: Optional[float]):
+        """Trusts the server's count of remaining requests over the local estimate."""
+        if remaining is None:
+            return
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0 and reset_seconds:
+            self.pause(reset_seconds)
+
+
+class OpenAQClient:
+    """Pooled keep-alive client for the OpenAQ v3 API.
+
+    Requests are throttled by a token bucket, at most `max_concurrency` are in flight, and 429/5xx
+    responses or transport errors are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 60,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        timeout_seconds: float = 10,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.http_client = http_client or httpx.AsyncClient(
+            timeout=timeout_seconds,
+            headers={"X-API-Key": api_key},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.bucket = TokenBucket(requests_per_minute / 60, capacity=max(1, min(max_concurrency, requests_per_minute)))
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_config(cls, config: OpenAQConfig) -> "OpenAQClient":
+        return cls(
+            base_url=config.base_url,
+            api_key=config.api_key,
+            max_concurrency=config.max_concurrency,
+            requests_per_minute=config.requests_per_minute,
+            max_retries=config.max_retries,
+            timeout_seconds=config.timeout_seconds,
+        )
+
+    async def __aenter__(self) -> "OpenAQClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+    async def get_latest(self, location_id: int) -> dict:
+        return await self._get_json(f"/locations/{location_id}/latest", endpoint="/locations/{id}/latest")
+
+    async def get_latest_many(self, location_ids: Iterable[int]) -> Dict[int, dict]:
+        """Latest readings of every location, fetched concurrently."""
+        location_ids = list(dict.fromkeys(location_ids))
+        payloads = await asyncio.gather(*(self.get_latest(i) for i in location_ids))
+        return dict(zip(location_ids, payloads))
+
+    async def get_sensor_measurements(
+            self,
+            sensor_id: int,
+            datetime_from: datetime,
+            datetime_to: datetime,
+            page: int = 1,
+            limit: int = 1000,
+    ) -> dict:
+        """One page of a sensor's measurement history, oldest first."""
+        params = {
+            "datetime_from": datetime_from.isoformat(),
+            "datetime_to": datetime_to.isoformat(),
+            "page": page,
+            "limit": limit,
+        }
+        return await self._get_json(f"/sensors/{sensor_id}/measurements", params=params, endpoint="/sensors/{id}/measurements")
+
+    async def _get_json(self, path: str, params: Optional[dict] = None, endpoint: Optional[str] = None) -> dict:
+        """`endpoint` is the path template the metrics are labelled with."""
+        url = f"{self.base_url}{path}"
+        endpoint = endpoint or path
+        attempt = 0
+        while True:
+            async with self._concurrency:
+                await self.bucket.acquire()
+                started, outcome = time.perf_counter(), "error"
+                try:
+                    response = await self.http_client.get(url, params=params)
+                    outcome = str(response.status_code)
+                except httpx.TransportError as e:
+                    response, outcome = None, "transport_error"
+                    if attempt >= self.max_retries:
+                        raise
+                    print(f"OpenAQ request {path} failed ({e!r}), retrying")
+                finally:
+                    OPENAQ_REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - started)
+                    OPENAQ_REQUESTS.inc(endpoint, outcome)
+
+            if response is not None:
+                self.bucket.observe(
+                    _header_float(response, "x-ratelimit-remaining"),
+                    _header_float(response, "x-ratelimit-reset"),
+                )
+                if response.status_code not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+
+                retry_after = _header_float(response, "retry-after")
+                if response.status_code == 429:
+                    # the whole client waits, not just this request
+                    self.bucket.pause(retry_after or _header_float(response, "x-ratelimit-reset") or 1.0)
+                print(f"OpenAQ request {path} returned {response.status_code}, retrying")
+
+            OPENAQ_RETRIES.inc(endpoint)
+            attempt += 1
+            backoff = min(MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, backoff))
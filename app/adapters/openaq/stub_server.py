@@ -0,0 +1,192 @@
+"""Local stand-in for the OpenAQ v3 API, for exercising OpenAQClient without network access.
+
+    python -m app.adapters.openaq.stub_server --port 8765 --latency 0.2 --error-rate 0.1
+
+then point `openaq.base_url` at http://127.0.0.1:8765/v3. Sensors of locations listed in
+sensor_metadata.yaml are served with their configured ids, other locations get three made-up sensors.
+Sensor history (/sensors/{id}/measurements) is generated as one reading per hour.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+
+LATEST_PATH = re.compile(r"^/v3/locations/(\d+)/latest$")
+MEASUREMENTS_PATH = re.compile(r"^/v3/sensors/(\d+)/measurements$")
+
+# The stub's sensors report once an hour
+READING_INTERVAL = timedelta(hours=1)
+
+
+class StubState:
+    """Fixed-window rate limit and fault injection shared by all handler threads."""
+
+    def __init__(self, rate_limit: int, window_seconds: float, latency: float, error_rate: float):
+        self.rate_limit = rate_limit
+        self.window_seconds = window_seconds
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.window_start = time.monotonic()
+        self.window_used = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Returns (allowed, remaining, reset_seconds)."""
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self.window_start >= self.window_seconds:
+                self.window_start, self.window_used = now, 0
+            reset = self.window_seconds - (now - self.window_start)
+            if self.window_used >= self.rate_limit:
+                return False, 0, reset
+            self.window_used += 1
+            return True, self.rate_limit - self.window_used, reset
+
+
+def _sensor_ids(location_id: int) -> List[int]:
+    sensors = get_sensor_registry()
+    city = sensors.city_for_location(location_id)
+    if city is not None:
+        return list(sensors.city(city).sensors)
+    return [location_id * 10 + i for i in range(3)]
+
+
+def latest_payload(location_id: int) -> dict:
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return {
+        "meta": {"name": "openaq-stub", "found": len(_sensor_ids(location_id))},
+        "results": [
+            {
+                "datetime": {"utc": now.strftime("%Y-%m-%dT%H:%M:%SZ"), "local": now.isoformat()},
+                "value": round(random.uniform(1, 80), 1),
+                "sensorsId": sensor_id,
+                "locationsId": location_id,
+            }
+            for sensor_id in _sensor_ids(location_id)
+        ],
+    }
+
+
+def _parse_utc(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def measurements_payload(sensor_id: int, query: dict) -> dict:
+    """Hourly readings of `sensor_id` in [datetime_from, datetime_to), paginated like OpenAQ."""
+    start = _parse_utc(query["datetime_from"][0])
+    end = _parse_utc(query["datetime_to"][0])
+    limit = int(query.get("limit", ["100"])[0])
+    page = int(query.get("page", ["1"])[0])
+
+    # first full hour at or after start
+    first = start.replace(minute=0, second=0, microsecond=0)
+    if first < start:
+        first += READING_INTERVAL
+    total = max(0, math.ceil((end - first) / READING_INTERVAL))
+
+    results = []
+    for i in range((page - 1) * limit, min(page * limit, total)):
+        period_start = first + i * READING_INTERVAL
+        results.append({
+            "value": round(20 + 15 * math.sin(i / 12 + sensor_id), 2),
+            "period": {
+                "label": "raw",
+                "interval": "01:00:00",
+                "datetimeFrom": {"utc": period_start.strftime("%Y-%m-%dT%H:%M:%SZ")},
+                "datetimeTo": {"utc": (period_start + READING_INTERVAL).strftime("%Y-%m-%dT%H:%M:%SZ")},
+            },
+        })
+    return {"meta": {"name": "openaq-stub", "page": page, "limit": limit, "found": total}, "results": results}
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            allowed, remaining, reset = state.take()
+            headers = {
+                "x-ratelimit-limit": str(state.rate_limit),
+                "x-ratelimit-remaining": str(remaining),
+                "x-ratelimit-reset": str(max(1, round(reset))),
+            }
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            url = urlsplit(self.path)
+            latest = LATEST_PATH.match(url.path)
+            measurements = MEASUREMENTS_PATH.match(url.path)
+            if not allowed:
+                self._send(429, {"detail": "Too many requests"}, {**headers, "retry-after": headers["x-ratelimit-reset"]})
+            elif random.random() < state.error_rate:
+                self._send(503, {"detail": "Injected failure"}, headers)
+            elif latest is not None:
+                self._send(200, latest_payload(int(latest.group(1))), headers)
+            elif measurements is not None:
+                self._send(200, measurements_payload(int(measurements.group(1)), parse_qs(url.query)), headers)
+            else:
+                self._send(404, {"detail": "Not found"}, headers)
+
+        def _send(self, status: int, body: dict, headers: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 makes concurrent clients wait on SYN retransmits
+    request_queue_size = 128
+
+
+def serve(host: str, port: int, state: StubState) -> ThreadingHTTPServer:
+    """Starts the stub on a daemon thread, port 0 picks a free port (see server.server_port)."""
+    server = StubServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name="openaq-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAQ v3 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limit", type=int, default=60, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=60, help="Rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    args = parser.parse_args()
+
+    state = StubState(args.rate_limit, args.window, args.latency, args.error_rate)
+    server = serve(args.host, args.port, state)
+    print(f"OpenAQ stub listening on http://{args.host}:{server.server_port}/v3")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
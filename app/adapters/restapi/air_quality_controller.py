@@ -1,29 +1,78 @@
+import asyncio
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, WebSocket, status
+from fastapi.responses import FileResponse, StreamingResponse
 from datetime import datetime, timezone
-
-from app.adapters.restapi.dependecies import get_measurement_repository
+from itertools import islice
+
+from app.adapters.restapi.dependecies import (
+    get_air_quality_stats_service,
+    get_measurement_repository,
+    get_chart_data_cache,
+    get_export_manager,
+    get_ingestion_scheduler,
+    get_live_measurements,
+    get_measurement_broadcaster,
+    get_openaq_client,
+    open_measurement_repository,
+)
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.domain.air_quality_stats import AirQualityStatsService
+from app.domain.chart_data_cache import ChartDataCache
+from app.domain.chart_payload import build_batch_payload, encode_ndjson
+from app.domain.export_jobs import EXPORT_WRITERS, ExportManager, download_name, to_status
+from app.domain.ingestion_scheduler import IngestionScheduler
+from app.domain.live_measurements import LiveMeasurements
 from app.domain.mapper import to_air_quality
-from app.domain.model.air_quality import AirQualityMeasurement
+from app.domain.measurement_broadcaster import MeasurementBroadcaster, TooManySubscribers
+from app.domain.model.air_quality import AirQualityMeasurement, MeasurementPage
+from app.domain.model.air_quality_stats import AirQualityStats
+from app.domain.model.chart_batch import ChartBatchRequest
+from app.domain.model.config import get_config
+from app.domain.model.export_job import ExportJobStatus, ExportRequest
+from app.domain.model.cache_stats import ChartDataCacheStats
+from app.domain.measurement_import_service import MeasurementImportService, parse_json_array, parse_ndjson
+from app.domain.model.ingestion_status import IngestionStatus
+from app.domain.model.measurement_import import MeasurementImportSummary
 from app.domain.openaq_service import OpenAQAirQualityService
 from app.persistance.model.measurement_entity import MeasurementEntity
-from app.persistance.repositories.measurement_repository import MeasurementRepository
-from app.persistance.sensor_metadata_loader import load_sensor_metadata
+from app.persistance.repositories.async_measurement_repository import AsyncMeasurementRepository
+from app.persistance.repositories.measurement_repository import DuplicateMeasurement
+from app.persistance.sensor_metadata_loader import CityInfo, get_sensor_registry
+
+# the prefix belongs to the routes themselves, their path_format is the path that is served
+router = APIRouter(prefix="/api")
+
+# NDJSON lines written per chunk of the streaming response
+STREAM_CHUNK_ROWS = 500
+
+def live_heartbeat_seconds() -> float:
+    # idle time after which a live connection gets a keep-alive, lets proxies and clients see it is open
+    return get_config().live_push.heartbeat_seconds
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
 
-router = APIRouter()
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
 
-def assert_city_supported(city: str):
-    if city.lower() != "warsaw":
+
+def assert_city_supported(city: str) -> CityInfo:
+    sensors = get_sensor_registry()
+    city_info = sensors.city(city)
+    if city_info is None:
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
-            detail=f"City '{city}' is not implemented. Only Warsaw is supported."
+            detail=f"City '{city}' is not implemented. Supported cities: {', '.join(sensors.cities)}."
         )
+    return city_info
 
 
 @router.get(
     "/air/measurements",
     response_model=List[AirQualityMeasurement],
-    summary="Fetch latest air quality measurements from OpenAQ or cache",
+    summary="Fetch latest air quality measurements from OpenAQ or the ingested database",
     responses={
         200: {"description": "List of latest measurements"},
         204: {"description": "No measurements found for the given city"},
@@ -32,15 +81,25 @@ def assert_city_supported(city: str):
         501: {"description": "City not implemented"},
     },
 )
-def get_air_quality(
+async def get_air_quality(
     city: str = Query("Warsaw", description="City name, e.g. Warsaw"),
-    repo: MeasurementRepository = Depends(get_measurement_repository),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
+    scheduler: Optional[IngestionScheduler] = Depends(get_ingestion_scheduler),
+    openaq_client: Optional[OpenAQClient] = Depends(get_openaq_client),
+    live_measurements: Optional[LiveMeasurements] = Depends(get_live_measurements),
 ):
-    assert_city_supported(city)
+    city = assert_city_supported(city).name
 
     try:
-        service = OpenAQAirQualityService(measurement_repo=repo)
-        new_measurements = service.get_latest_measurements(city)
+        if scheduler is not None:
+            # Background ingestion keeps the database current, no upstream call needed
+            new_measurements = [to_air_quality(m) for m in await repo.get_latest(city)]
+        elif live_measurements is not None:
+            # one shared, briefly cached upstream fetch per city
+            new_measurements = await live_measurements.get_latest(city)
+        else:
+            service = OpenAQAirQualityService(measurement_repo=repo, client=openaq_client)
+            new_measurements = await service.get_latest_measurements(city)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -50,18 +109,41 @@ def get_air_quality(
     return new_measurements
 
 
+@router.get(
+    "/air/ingestion/status",
+    response_model=IngestionStatus,
+    summary="State of the background OpenAQ ingestion",
+    responses={
+        200: {"description": "Last run time, lag and failure counts"},
+        404: {"description": "Background ingestion is disabled"},
+    },
+)
+async def get_ingestion_status(
+    scheduler: Optional[IngestionScheduler] = Depends(get_ingestion_scheduler),
+):
+    if scheduler is None:
+        raise HTTPException(status_code=404, detail="Background ingestion is disabled")
+
+    return scheduler.status()
+
+
 @router.get(
     "/air/measurements/chart-data",
     response_model=List[AirQualityMeasurement],
     summary="Retrieve measurement data filtered for chart rendering",
     responses={
-        200: {"description": "Filtered measurement list"},
+        200: {
+            "description": "Filtered measurement list. With format=columnar an object "
+                           "{timestamps: [...], values: {parameter: [...]}, units: {parameter: unit}} instead",
+        },
+        304: {"description": "Data unchanged since the ETag sent in If-None-Match"},
         400: {"description": "Invalid filter parameters"},
         500: {"description": "Internal server error"},
         501: {"description": "City not implemented"},
     },
 )
-def get_chart_data(
+async def get_chart_data(
+    request: Request,
     city: str = Query("Warsaw", description="City name, e.g. Warsaw"),
     start_date: Optional[datetime] = Query(None, description="Filter start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="Filter end date (ISO format)"),
@@ -72,23 +154,309 @@ def get_chart_data(
         ["timestamp:asc"],
         description="Sorting directives, e.g. ?sort_by=timestamp:asc&sort_by=city:desc",
     ),
-    repo: MeasurementRepository = Depends(get_measurement_repository),
+    bucket: Optional[str] = Query(
+        None, description="Aggregate values into time buckets: 5m, 1h or 1d"
+    ),
+    agg: str = Query("avg", description="Bucket aggregation: avg, min, max or p95"),
+    max_points: Optional[int] = Query(
+        None, ge=3, description="Downsample every parameter series to at most this many points (LTTB)"
+    ),
+    format: str = Query("rows", description="rows: list of measurements, columnar: shared time axis and value arrays"),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
 ):
-    assert_city_supported(city)
+    city = assert_city_supported(city).name
 
     try:
-        items = repo.get_chart_data(
+        payload = await repo.get_chart_payload(
+            format,
+            city=city,
             start_date=start_date,
             end_date=end_date,
             parameters=parameter,
             sort_by=sort_by,
+            bucket=bucket,
+            agg=agg,
+            max_points=max_points,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # already encoded JSON, skips response_model validation and serialization
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+@router.post(
+    "/air/measurements/chart-data/batch",
+    summary="Retrieve several chart-data series in one request",
+    description=(
+        "Every series spec is answered like a chart-data call with the same filters. The backend runs "
+        "them together, as a single UNION ALL where possible, and cached series are not queried again."
+    ),
+    responses={
+        200: {"description": "Object of series by key, each in the chosen format"},
+        304: {"description": "Data unchanged since the ETag sent in If-None-Match"},
+        400: {"description": "Invalid series spec or duplicate keys"},
+        500: {"description": "Internal server error"},
+        501: {"description": "City not implemented"},
+    },
+)
+async def get_chart_data_batch(
+    request: Request,
+    batch: ChartBatchRequest,
+    format: str = Query("rows", description="rows: list of measurements, columnar: shared time axis and value arrays"),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
+):
+    keys = [spec.key if spec.key is not None else str(i) for i, spec in enumerate(batch.series)]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Series keys must be unique")
+    specs = [{**spec.filters(), "city": assert_city_supported(spec.city).name} for spec in batch.series]
+
+    try:
+        payloads = await repo.get_chart_payloads(specs, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    payload = build_batch_payload(dict(zip(keys, payloads)))
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/air/measurements/stats",
+    response_model=AirQualityStats,
+    summary="Rolling means, percentiles, exceedance days and AQI per parameter",
+    description=(
+        "Computed server-side over the whole range. Rolling means and the AQI include the readings "
+        "just before start_date, so the first values already average a full window. AQI follows the "
+        "US EPA breakpoints (PM2.5/PM10 24h, CO 8h, NO2 1h), exceedances count days above the WHO 2021 "
+        "24-hour guideline."
+    ),
+    responses={
+        200: {"description": "Statistics of every parameter that has data in the range"},
+        400: {"description": "Invalid filter parameters"},
+        500: {"description": "Internal server error"},
+        501: {"description": "City not implemented"},
+    },
+)
+async def get_air_quality_stats(
+    city: str = Query("Warsaw", description="City name, e.g. Warsaw"),
+    start_date: Optional[datetime] = Query(None, description="Filter start date (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter end date (ISO format)"),
+    parameter: Optional[List[str]] = Query(
+        [], description="Parameters to analyse, defaults to pm25, pm10, co and no2"
+    ),
+    window: Optional[List[str]] = Query(
+        [], description="Rolling-mean windows: 1h, 8h or 24h, defaults to 8h and 24h"
+    ),
+    service: AirQualityStatsService = Depends(get_air_quality_stats_service),
+):
+    city = assert_city_supported(city).name
+
+    try:
+        return await service.get_stats(
+            city=city,
+            start_date=start_date,
+            end_date=end_date,
+            parameters=parameter,
+            windows=window,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/air/measurements/chart-data/cache-stats",
+    response_model=ChartDataCacheStats,
+    summary="Hit/miss counters of the chart-data cache",
+)
+async def get_chart_data_cache_stats(cache: ChartDataCache = Depends(get_chart_data_cache)):
+    return cache.stats()
+
+
+@router.get(
+    "/air/measurements/chart-data/page",
+    response_model=MeasurementPage,
+    summary="Retrieve one page of chart data using keyset pagination",
+    responses={
+        200: {"description": "Page of measurements ordered by timestamp and id, with the cursor of the next page"},
+        400: {"description": "Invalid filter parameters or cursor"},
+        500: {"description": "Internal server error"},
+        501: {"description": "City not implemented"},
+    },
+)
+async def get_chart_data_page(
+    city: str = Query("Warsaw", description="City name, e.g. Warsaw"),
+    start_date: Optional[datetime] = Query(None, description="Filter start date (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter end date (ISO format)"),
+    parameter: Optional[List[str]] = Query(
+        [], description="Filter by parameter. Repeat parameter for multiple values, e.g. ?parameter=pm25&parameter=no2"
+    ),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of measurements in the page"),
+    cursor: Optional[str] = Query(None, description="next_cursor returned by the previous page"),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
+):
+    city = assert_city_supported(city).name
+
+    try:
+        items, next_cursor = await repo.get_chart_page(
+            city=city,
+            start_date=start_date,
+            end_date=end_date,
+            parameters=parameter,
+            limit=limit,
+            cursor=cursor,
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    return items
+    return MeasurementPage(items=items, next_cursor=next_cursor)
+
+
+@router.get(
+    "/air/measurements/chart-data/stream",
+    summary="Stream chart data as newline-delimited JSON",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "One measurement per line, ordered by timestamp and id", "content": {"application/x-ndjson": {}}},
+        501: {"description": "City not implemented"},
+    },
+)
+def stream_chart_data(
+    city: str = Query("Warsaw", description="City name, e.g. Warsaw"),
+    start_date: Optional[datetime] = Query(None, description="Filter start date (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter end date (ISO format)"),
+    parameter: Optional[List[str]] = Query(
+        [], description="Filter by parameter. Repeat parameter for multiple values, e.g. ?parameter=pm25&parameter=no2"
+    ),
+):
+    city = assert_city_supported(city).name
+
+    def ndjson_lines():
+        # Runs in the threadpool on a sync session with yield_per, which the async driver cannot stream.
+        # The repository session has to outlive the endpoint, it is closed when the stream ends
+        with open_measurement_repository() as repo:
+            rows = repo.iter_chart_data(
+                city=city,
+                start_date=start_date,
+                end_date=end_date,
+                parameters=parameter,
+            )
+            while chunk := list(islice(rows, STREAM_CHUNK_ROWS)):
+                yield encode_ndjson(chunk)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/air/measurements/live",
+    summary="Push newly stored measurements as server-sent events",
+    description=(
+        "Every measurement stored by the ingestion or a POST is sent as an `event: measurement` whose data "
+        "is the measurement JSON. A client that falls too far behind loses the oldest events and gets an "
+        "`event: lagged` with the number dropped, refetch chart-data to fill the gap."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "Endless event stream", "content": {"text/event-stream": {}}},
+        501: {"description": "City not implemented"},
+        503: {"description": "Too many live subscribers"},
+    },
+)
+async def stream_live_measurements(
+    city: Optional[str] = Query(None, description="Only measurements of this city, all cities when omitted"),
+    parameter: Optional[List[str]] = Query(
+        [], description="Only these parameters. Repeat parameter for multiple values, e.g. ?parameter=pm25&parameter=no2"
+    ),
+    broadcaster: MeasurementBroadcaster = Depends(get_measurement_broadcaster),
+):
+    if city is not None:
+        city = assert_city_supported(city).name
+
+    # subscribe before the response starts, a measurement stored right after the request is not missed
+    try:
+        subscription = broadcaster.subscribe(city=city, parameters=parameter)
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    heartbeat = live_heartbeat_seconds()
+
+    async def events():
+        # the generator is cancelled when the client disconnects, which ends the subscription
+        try:
+            yield b": connected\n\n"
+            while (batch := await subscription.get(heartbeat)) is not None:
+                items, dropped = batch
+                chunk = b""
+                if dropped:
+                    chunk += b'event: lagged\ndata: {"dropped":%d}\n\n' % dropped
+                chunk += b"".join(b"event: measurement\ndata: " + item + b"\n\n" for item in items)
+                yield chunk or b": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/air/measurements/live/ws")
+async def live_measurements_socket(
+    websocket: WebSocket,
+    city: Optional[str] = Query(None, description="Only measurements of this city, all cities when omitted"),
+    parameter: Optional[List[str]] = Query([], description="Only these parameters, repeatable"),
+    broadcaster: MeasurementBroadcaster = Depends(get_measurement_broadcaster),
+):
+    """Same events as /air/measurements/live, one JSON message each: {"event": "measurement", "data": {...}}
+    or {"event": "lagged", "dropped": n}. Messages sent by the client are ignored."""
+    if city is not None:
+        city_info = get_sensor_registry().city(city)
+        if city_info is None:
+            await websocket.close(code=1008, reason=f"City '{city}' is not implemented")
+            return
+        city = city_info.name
+
+    try:
+        subscription = broadcaster.subscribe(city=city, parameters=parameter)
+    except TooManySubscribers as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    heartbeat = live_heartbeat_seconds()
+
+    async def send_events():
+        while (batch := await subscription.get(heartbeat)) is not None:
+            items, dropped = batch
+            if dropped:
+                await websocket.send_text('{"event":"lagged","dropped":%d}' % dropped)
+            for item in items:
+                await websocket.send_text('{"event":"measurement","data":%s}' % item.decode())
+
+    await websocket.accept()
+    sender = asyncio.create_task(send_events())
+    try:
+        # a disconnect only shows up on receive, so keep reading while the sender pushes
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        broadcaster.unsubscribe(subscription)
 
 
 @router.post(
@@ -99,57 +467,87 @@ def get_chart_data(
         201: {"description": "Measurement created"},
         400: {"description": "Invalid input"},
         404: {"description": "City or sensor not found"},
+        409: {"description": "A measurement of the sensor already exists at this time"},
         500: {"description": "Internal server error"},
         501: {"description": "City not implemented"},
     },
     status_code=201,
 )
-def add_manual_measurement(
+async def add_manual_measurement(
     city: str = Query(..., example="Warsaw", description="City name"),
     sensor_id: int = Query(..., example=36161, description="Sensor identifier"),
     value: float = Query(..., example=18.4, description="Measured numeric value"),
-    repo: MeasurementRepository = Depends(get_measurement_repository),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
 ):
-    assert_city_supported(city)
+    city_info = assert_city_supported(city)
 
     try:
-        sensor_metadata = load_sensor_metadata()
-        if not sensor_metadata:
-            raise HTTPException(
-                status_code=500,
-                detail="Sensor metadata could not be loaded"
-            )
-
-        city_data = sensor_metadata.get(city)
-        if not city_data:
-            raise HTTPException(
-                status_code=501,
-                detail=f"City '{city}' is not implemented. Only Warsaw is supported."
-            )
-
-        sensor_info = city_data.get(sensor_id)
-        if not sensor_info:
+        sensor = city_info.sensors.get(sensor_id)
+        if sensor is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Sensor ID {sensor_id} not found for city '{city}'",
             )
 
-        parameter = sensor_info.get("parameter", "unknown")
-        unit = sensor_info.get("unit", "unknown")
-
         measurement = MeasurementEntity(
-            city=city,
-            parameter=parameter,
+            city=city_info.name,
+            parameter=sensor.parameter,
             value=value,
-            unit=unit,
+            unit=sensor.unit,
             timestamp=datetime.now(timezone.utc),
         )
 
-        saved = repo.add(measurement)
+        saved = await repo.add(measurement)
         return to_air_quality(saved)
 
     except HTTPException:
         raise
+    except DuplicateMeasurement as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/air/measurements/batch",
+    response_model=MeasurementImportSummary,
+    summary="Import many measurements in one request",
+    description=(
+        "Accepts a JSON array, or NDJSON when sent with Content-Type application/x-ndjson, "
+        "of {city, sensor_id, value, timestamp} records. Every record is validated against the sensor "
+        "metadata and reported as accepted or rejected, duplicates included."
+    ),
+    responses={
+        200: {"description": "Per-record accept/reject results"},
+        400: {"description": "Body is not a JSON array or NDJSON"},
+        500: {"description": "Internal server error"},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/MeasurementImportRecord"}}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_measurements(
+    request: Request,
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
+):
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            records = parse_ndjson(body)
+        else:
+            records = parse_json_array(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        service = MeasurementImportService(measurement_repo=repo, sensors=get_sensor_registry())
+        return await service.import_records(records)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -162,19 +560,20 @@ def add_manual_measurement(
         200: {"description": "Measurement updated"},
         400: {"description": "Invalid request data"},
         404: {"description": "Measurement not found"},
+        409: {"description": "Another measurement exists with the updated city, parameter and timestamp"},
         500: {"description": "Server error"},
     },
 )
-def update_measurement(
+async def update_measurement(
     measurement_id: str,
     city: Optional[str] = Query(None, description="Optional city name"),
     parameter: Optional[str] = Query(None, description="Optional parameter"),
     value: Optional[float] = Query(None, description="Optional updated numeric value"),
     timestamp: Optional[datetime] = Query(None, description="Optional updated timestamp"),
-    repo: MeasurementRepository = Depends(get_measurement_repository),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
 ):
     try:
-        existing = repo.get_by_id(measurement_id)
+        existing = await repo.get_by_id(measurement_id)
         if not existing:
             raise HTTPException(status_code=404, detail="Measurement not found")
 
@@ -194,11 +593,13 @@ def update_measurement(
             timestamp=timestamp or existing.timestamp,
         )
 
-        saved = repo.update(measurement_id, updated)
+        saved = await repo.update(measurement_id, updated)
         return to_air_quality(saved)
 
     except HTTPException:
         raise
+    except DuplicateMeasurement as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -218,12 +619,12 @@ def update_measurement(
         500: {"description": "Server error"},
     },
 )
-def delete_measurement(
+async def delete_measurement(
     measurement_id: str,
-    repo: MeasurementRepository = Depends(get_measurement_repository),
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
 ):
     try:
-        deleted = repo.delete(measurement_id)
+        deleted = await repo.delete(measurement_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Measurement not found")
 
@@ -233,3 +634,91 @@ def delete_measurement(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/air/exports",
+    response_model=ExportJobStatus,
+    status_code=202,
+    summary="Start a background export of measurements to gzip CSV or Parquet",
+    description=(
+        "The job streams the matching measurements into a file in chunks, poll its status until it is "
+        "done and download the file from download_url. Finished files are kept for a limited time."
+    ),
+    responses={
+        202: {"description": "Export job queued"},
+        501: {"description": "City not implemented"},
+    },
+)
+async def start_export(
+    request: Request,
+    export: ExportRequest,
+    manager: ExportManager = Depends(get_export_manager),
+):
+    export = export.model_copy(update={"city": assert_city_supported(export.city).name})
+
+    job = manager.submit(export)
+    return to_status(job, str(request.url_for("download_export", job_id=job.id)))
+
+
+@router.get(
+    "/air/exports/{job_id}",
+    response_model=ExportJobStatus,
+    summary="State and progress of an export job",
+    responses={
+        200: {"description": "Rows written, progress through the time range and, once done, the download URL"},
+        404: {"description": "Export job not found or expired"},
+    },
+)
+async def get_export(
+    request: Request,
+    job_id: str,
+    manager: ExportManager = Depends(get_export_manager),
+):
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+
+    return to_status(job, str(request.url_for("download_export", job_id=job.id)))
+
+
+@router.get(
+    "/air/exports/{job_id}/download",
+    response_class=FileResponse,
+    summary="Download the file of a finished export job",
+    description="Supports Range requests, interrupted downloads can be resumed.",
+    responses={
+        200: {"description": "The export file"},
+        206: {"description": "Requested byte range of the export file"},
+        404: {"description": "Export job not found or expired"},
+        409: {"description": "Export job not finished"},
+    },
+)
+async def download_export(
+    job_id: str,
+    manager: ExportManager = Depends(get_export_manager),
+):
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.state != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.state}")
+
+    return FileResponse(job.path, media_type=EXPORT_WRITERS[job.request.format].media_type, filename=download_name(job))
+
+
+@router.delete(
+    "/air/exports/{job_id}",
+    status_code=204,
+    summary="Cancel an export job or delete its file",
+    responses={
+        204: {"description": "Export job cancelled or its file deleted"},
+        404: {"description": "Export job not found or expired"},
+    },
+)
+async def delete_export(
+    job_id: str,
+    manager: ExportManager = Depends(get_export_manager),
+):
+    if not manager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Export job not found")
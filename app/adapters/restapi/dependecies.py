@@ -1,15 +1,105 @@
-from app.domain.model.config import load_config
-from app.persistance.model.measurement_entity import SessionLocal
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Depends, Request
+
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.domain.air_quality_stats import AirQualityStatsService
+from app.domain.chart_data_cache import ChartDataCache
+from app.domain.export_jobs import ExportManager
+from app.domain.ingestion_scheduler import IngestionScheduler
+from app.domain.live_measurements import LiveMeasurements
+from app.domain.measurement_broadcaster import MeasurementBroadcaster
+from app.domain.model.config import get_config
+from app.persistance.measurement_archive import MeasurementArchive
+from app.persistance.model.measurement_entity import AsyncSessionLocal, SessionLocal
+from app.persistance.repositories.async_measurement_repository import (
+    AsyncMeasurementRepository,
+    AsyncSQLMeasurementRepository,
+    InlineAsyncMeasurementRepository,
+    PublishingAsyncMeasurementRepository,
+)
+from app.persistance.repositories.caching_measurement_repository import CachingMeasurementRepository
+from app.persistance.repositories.in_memory_measurement_repository import InMemoryMeasurementRepository
 from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
 
-configs = load_config()
+# process-wide objects, built on first use so importing the app reads neither config nor database
+
+@lru_cache(maxsize=1)
+def get_chart_data_cache() -> ChartDataCache:
+    config = get_config().cache
+    return ChartDataCache(max_entries=config.max_entries, ttl_seconds=config.ttl_seconds)
+
+@lru_cache(maxsize=1)
+def get_measurement_broadcaster() -> MeasurementBroadcaster:
+    # every write through the async repositories is pushed to the live subscribers of this process
+    config = get_config().live_push
+    return MeasurementBroadcaster(max_queue=config.max_queue, max_subscribers=config.max_subscribers)
 
-def get_measurement_repository():
-    if configs.repository_type == "postgres":
+@lru_cache(maxsize=1)
+def get_measurement_archive() -> Optional[MeasurementArchive]:
+    # months moved out of the measurements table, read together with it by the SQL repositories
+    config = get_config().archive
+    return MeasurementArchive(config.path) if config.enabled else None
+
+@lru_cache(maxsize=1)
+def get_in_memory_repository() -> InMemoryMeasurementRepository:
+    # shared by every request, the data lives as long as the process
+    return InMemoryMeasurementRepository()
+
+def _with_cache(repo):
+    if get_config().cache.enabled:
+        return CachingMeasurementRepository(repo, get_chart_data_cache())
+    return repo
+
+@contextmanager
+def open_measurement_repository():
+    config = get_config()
+    if config.repository_type == "postgres":
         db = SessionLocal()
         try:
-            yield SQLMeasurementRepository(db)
+            yield _with_cache(SQLMeasurementRepository(db, get_measurement_archive()))
         finally:
             db.close()
+    elif config.repository_type in ("in_memory", "mock"):
+        yield get_in_memory_repository()
     else:
-        yield None
\ No newline at end of file
+        raise ValueError(f"Unsupported repository_type '{config.repository_type}'")
+
+@asynccontextmanager
+async def open_async_measurement_repository():
+    config = get_config()
+    if config.repository_type == "postgres":
+        async with AsyncSessionLocal() as session:
+            repo = AsyncSQLMeasurementRepository(session, wrap=_with_cache, archive=get_measurement_archive())
+            yield PublishingAsyncMeasurementRepository(repo, get_measurement_broadcaster())
+    elif config.repository_type in ("in_memory", "mock"):
+        repo = InlineAsyncMeasurementRepository(get_in_memory_repository())
+        yield PublishingAsyncMeasurementRepository(repo, get_measurement_broadcaster())
+    else:
+        raise ValueError(f"Unsupported repository_type '{config.repository_type}'")
+
+async def get_measurement_repository() -> AsyncMeasurementRepository:
+    async with open_async_measurement_repository() as repo:
+        yield repo
+
+def get_air_quality_stats_service(
+    repo: AsyncMeasurementRepository = Depends(get_measurement_repository),
+) -> AirQualityStatsService:
+    # results are only memoized while writes invalidate the shared cache
+    config = get_config().cache
+    cache = get_chart_data_cache() if config.enabled else None
+    return AirQualityStatsService(repo, cache=cache, closed_ttl_seconds=config.closed_ttl_seconds)
+
+def get_ingestion_scheduler(request: Request) -> Optional[IngestionScheduler]:
+    return getattr(request.app.state, "ingestion_scheduler", None)
+
+def get_openaq_client(request: Request) -> Optional[OpenAQClient]:
+    return getattr(request.app.state, "openaq_client", None)
+
+def get_live_measurements(request: Request) -> Optional[LiveMeasurements]:
+    return getattr(request.app.state, "live_measurements", None)
+
+def get_export_manager(request: Request) -> ExportManager:
+    return request.app.state.export_manager
@@ -0,0 +1,66 @@
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.domain.metrics import (
+    HTTP_REQUEST_DB_QUERIES,
+    HTTP_REQUEST_DB_SECONDS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_FLIGHT,
+)
+from app.domain.model.config import get_config
+from app.persistance.query_metrics import QueryStats, current_query_stats
+
+# label of requests no route matches, keeps scanners from creating a series per path
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """Per-route request count, latency, in-flight requests and database usage.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass through untouched. Requests
+    are labelled with the template of the route that handled them ({measurement_id}, not the id),
+    never the raw path, behind the root path the app is mounted at. The route is only known once the router has run, so in-flight requests are
+    counted per method.
+
+    Without `enabled` the metrics config decides, read on the first request.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: Optional[bool] = None):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and self.enabled is None:
+            self.enabled = get_config().metrics.enabled
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # set by the router on the scope it was given
+            path_format = getattr(scope.get("route"), "path_format", None)
+            route = scope.get("root_path", "") + path_format if path_format else UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.observe(method, route, value=time.perf_counter() - started)
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_REQUEST_DB_QUERIES.observe(method, route, value=stats.queries)
+            HTTP_REQUEST_DB_SECONDS.observe(method, route, value=stats.seconds)
+            current_query_stats.reset(token)
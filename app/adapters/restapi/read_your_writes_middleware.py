@@ -0,0 +1,84 @@
+import time
+from http.cookies import SimpleCookie
+from typing import Collection, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.domain.model.config import get_config
+from app.persistance.read_routing import read_from_primary
+
+# unix time until which the client reads from the primary
+COOKIE_NAME = "aqm_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _primary_until(scope: Scope) -> float:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(COOKIE_NAME)
+            if morsel is not None:
+                try:
+                    return float(morsel.value)
+                except ValueError:
+                    return 0
+    return 0
+
+
+class ReadYourWritesMiddleware:
+    """Keeps the reads of a client on the primary for `window_seconds` after it wrote.
+
+    A successful non-GET request sets a cookie with the end of the window, requests carrying an
+    unexpired one read from the primary, as do the writing requests themselves. Replicas lagging
+    less than the window therefore never hide a client's own writes from it.
+
+    Without `window_seconds` the window comes from the database config, read on the first request,
+    and requests pass through untouched unless replicas are configured.
+    """
+
+    def __init__(self, app: ASGIApp, window_seconds: Optional[float] = None, read_only_paths: Collection[str] = ()):
+        self.app = app
+        self.window_seconds = window_seconds
+        self.enabled: Optional[bool] = None if window_seconds is None else True
+        # POST endpoints that only query, e.g. because their filters do not fit in a query string
+        self.read_only_paths = frozenset(read_only_paths)
+
+    def _configure(self):
+        database = get_config().database
+        self.enabled = bool(database.replica_urls)
+        self.window_seconds = database.read_your_writes_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        if self.enabled is None:
+            self._configure()
+        if not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        writes = (
+            scope["type"] == "http"
+            and scope["method"] not in SAFE_METHODS
+            and scope["path"] not in self.read_only_paths
+        )
+        if not writes and _primary_until(scope) <= time.time():
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + self.window_seconds
+                cookie = SimpleCookie()
+                cookie[COOKIE_NAME] = f"{until:.3f}"
+                cookie[COOKIE_NAME].update({"path": "/", "max-age": str(int(self.window_seconds) + 1), "samesite": "lax"})
+                MutableHeaders(scope=message).append("set-cookie", cookie[COOKIE_NAME].OutputString())
+            await send(message)
+
+        token = read_from_primary.set(True)
+        try:
+            await self.app(scope, receive, send_with_cookie if writes else send)
+        finally:
+            read_from_primary.reset(token)
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.domain.model.config import get_config
+from app.persistance.maintenance import MAINTENANCE_TASKS, run_maintenance
+from app.persistance.measurement_archive import MeasurementArchive, archive_closed_months
+from app.persistance.model.measurement_entity import SessionLocal, dispose_engines, get_database, init_db
+from app.persistance.rollups import rebuild_rollups
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+
+
+def _archive():
+    config = get_config().archive
+    return MeasurementArchive(config.path) if config.enabled else None
+
+
+def _rebuild_rollups(args):
+    init_db()
+    archive = _archive()
+    db = SessionLocal()
+    try:
+        # rollups of archived months were computed from the segments, the table cannot rebuild them
+        batches = rebuild_rollups(db, batch_days=args.batch_days, not_before=archive.horizon() if archive else None)
+    finally:
+        db.close()
+    print(f"Rollups rebuilt in {batches} batches")
+
+
+def _archive_months(args):
+    config = get_config().archive
+    init_db()
+    db = SessionLocal()
+    try:
+        report = archive_closed_months(
+            db,
+            MeasurementArchive(args.path or config.path),
+            keep_months=args.keep_months or config.keep_months,
+            batch_size=args.batch_size or config.delete_batch_size,
+        )
+    finally:
+        db.close()
+    print(f"Archived {report.rows} rows of {report.months} months into {report.segments} segments")
+
+
+def _maintenance(args):
+    config = get_config().maintenance
+    init_db()
+    archive = _archive()
+    report = run_maintenance(
+        SessionLocal,
+        get_database().engine,
+        retention_days=config.retention_days,
+        batch_size=args.batch_size or config.batch_size,
+        pause_seconds=config.pause_seconds if args.pause is None else args.pause,
+        tasks=args.only or MAINTENANCE_TASKS,
+        not_before=archive.horizon() if archive else None,
+    )
+    print(f"Removed {report.duplicates_removed} duplicate rows")
+    for parameter, removed in report.expired_removed.items():
+        print(f"Removed {removed} expired rows of {parameter}")
+    if report.index:
+        print(f"Unique index {report.index}")
+    if report.compacted:
+        print(f"Compacted {', '.join(report.compacted)}")
+    print(f"Maintenance finished in {report.seconds:.1f}s")
+    if report.index == "failed":
+        raise SystemExit("Unique index could not be built, run the same command again")
+
+
+def _utc(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def _backfill(args):
+    from app.adapters.openaq.openaq_client import OpenAQClient
+    from app.adapters.restapi.dependecies import open_async_measurement_repository
+    from app.domain.backfill import BackfillCheckpoint, BackfillJob
+
+    configs = get_config()
+    sensors = get_sensor_registry().sensors
+    if args.city:
+        cities = {c.lower() for c in args.city}
+        sensors = [s for s in sensors if s.city.lower() in cities]
+    if args.sensor:
+        sensors = [s for s in sensors if s.sensor_id in args.sensor]
+    if not sensors:
+        raise SystemExit("No sensors match the given --city/--sensor filters")
+
+    if configs.repository_type == "postgres":
+        init_db()
+    try:
+        checkpoint = BackfillCheckpoint.open(Path(args.checkpoint), args.date_from, args.date_to)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(
+        f"Backfilling {len(sensors)} sensors from {checkpoint.datetime_from.isoformat()} "
+        f"to {checkpoint.datetime_to.isoformat()}, checkpoint {args.checkpoint}"
+    )
+
+    async def run():
+        try:
+            async with OpenAQClient.from_config(configs.openaq) as client:
+                job = BackfillJob(
+                    repository_factory=open_async_measurement_repository,
+                    client=client,
+                    sensors=sensors,
+                    checkpoint=checkpoint,
+                    parallel=args.parallel,
+                    page_size=args.page_size,
+                )
+                return await job.run()
+        finally:
+            await dispose_engines()
+
+    report = asyncio.run(run())
+    print(
+        f"Backfill finished: {report.completed}/{report.sensors} sensors complete, {report.rows_fetched} rows fetched, "
+        f"{report.rows_stored} new, {report.seconds:.1f}s, {report.rows_per_second:.0f} rows/s"
+    )
+    if report.errors:
+        raise SystemExit(f"{len(report.errors)} sensors failed, run the same command again to resume")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Air Quality Monitor maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollups = commands.add_parser("rebuild-rollups", help="Rebuild hourly/daily rollups from raw measurements")
+    rollups.add_argument("--batch-days", type=int, default=7, help="Days recomputed per transaction")
+    rollups.set_defaults(handler=_rebuild_rollups)
+
+    backfill = commands.add_parser("backfill", help="Load measurement history of configured sensors from OpenAQ")
+    backfill.add_argument("--from", dest="date_from", type=_utc, help="Start of the history, ISO date (UTC); new backfills only")
+    backfill.add_argument("--to", dest="date_to", type=_utc, help="End of the history, ISO date (UTC); defaults to now")
+    backfill.add_argument("--checkpoint", default="backfill_checkpoint.json", help="Progress file, rerun with it to resume")
+    backfill.add_argument("--parallel", type=int, default=4, help="Sensors backfilled at once")
+    backfill.add_argument("--page-size", type=int, default=1000, help="Measurements per OpenAQ page")
+    backfill.add_argument("--city", action="append", help="Only sensors of this city, repeatable")
+    backfill.add_argument("--sensor", action="append", type=int, help="Only this sensor id, repeatable")
+    backfill.set_defaults(handler=_backfill)
+
+    archive = commands.add_parser("archive", help="Move closed months into Parquet segments and delete them from the table")
+    archive.add_argument("--keep-months", type=int, help="Months kept in the table, the current one included")
+    archive.add_argument("--batch-size", type=int, help="Rows deleted per transaction")
+    archive.add_argument("--path", help="Archive directory, defaults to archive.path of the config")
+    archive.set_defaults(handler=_archive_months)
+
+    maintenance = commands.add_parser("maintenance", help="Remove duplicates and expired rows, rebuild the unique index, compact")
+    maintenance.add_argument("--only", action="append", choices=MAINTENANCE_TASKS, help="Only this task, repeatable")
+    maintenance.add_argument("--batch-size", type=int, help="Rows (duplicate groups) per transaction")
+    maintenance.add_argument("--pause", type=float, help="Seconds to wait between two transactions")
+    maintenance.set_defaults(handler=_maintenance)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.domain.chart_data_cache import ChartDataCache, ChartDataScope
+from app.domain.model.air_quality_stats import AirQualityStats, ParameterStats
+from app.domain.time_series import SeriesColumns, naive_utc
+from app.persistance.read_routing import primary_reads, read_from_primary
+from app.persistance.repositories.async_measurement_repository import AsyncMeasurementRepository
+
+ROLLING_WINDOWS: Dict[str, int] = {
+    "1h": 60 * 60,
+    "8h": 8 * 60 * 60,
+    "24h": 24 * 60 * 60,
+}
+
+DEFAULT_WINDOWS = ("8h", "24h")
+
+PERCENTILES = (50, 90, 95, 98)
+
+DAY_SECONDS = 24 * 60 * 60
+
+# WHO 2021 24-hour guideline levels in µg/m³, a day whose mean is above the level is an exceedance
+DAILY_LIMITS: Dict[str, float] = {
+    "pm25": 15.0,
+    "pm10": 45.0,
+    "no2": 25.0,
+    "co": 4000.0,
+}
+
+AQI_CATEGORIES = (
+    (50, "Good"),
+    (100, "Moderate"),
+    (150, "Unhealthy for Sensitive Groups"),
+    (200, "Unhealthy"),
+    (300, "Very Unhealthy"),
+    (500, "Hazardous"),
+)
+
+
+@dataclass(frozen=True)
+class AqiScale:
+    """US EPA breakpoints of one pollutant.
+
+    Concentrations are converted from µg/m³ with `ugm3_per_unit`, averaged over `window` and truncated
+    to `decimals` before the piecewise-linear interpolation.
+    """
+    window: str
+    unit: str
+    ugm3_per_unit: float
+    decimals: int
+    breakpoints: Tuple[Tuple[float, float], ...]  # (concentration low, concentration high) per AQI band
+
+
+_AQI_INDEX = ((0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500))
+
+AQI_SCALES: Dict[str, AqiScale] = {
+    "pm25": AqiScale("24h", "µg/m³", 1.0, 1, ((0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4))),
+    "pm10": AqiScale("24h", "µg/m³", 1.0, 0, ((0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604))),
+    "co": AqiScale("8h", "ppm", 1145.0, 1, ((0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4))),
+    "no2": AqiScale("1h", "ppb", 1.88, 0, ((0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049))),
+}
+
+# µg/m³ in one unit of what a sensor may report
+_UNIT_TO_UGM3 = {"µg/m³": 1.0, "ug/m3": 1.0, "mg/m³": 1000.0}
+
+
+def validate_windows(windows: List[str]) -> List[str]:
+    unknown = [w for w in windows if w not in ROLLING_WINDOWS]
+    if unknown:
+        raise ValueError(f"Unsupported rolling window '{unknown[0]}', expected one of {', '.join(ROLLING_WINDOWS)}")
+    return list(dict.fromkeys(windows))
+
+
+def lookback_seconds(windows: List[str], parameters: List[str]) -> int:
+    """History needed before the range so the first rolling values cover a full window."""
+    needed = [ROLLING_WINDOWS[w] for w in windows]
+    needed += [ROLLING_WINDOWS[AQI_SCALES[p].window] for p in parameters if p in AQI_SCALES]
+    return max(needed, default=0)
+
+
+def rolling_mean(seconds: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing time-based mean over (t - window, t] at every sample, in O(n log n).
+
+    Samples may be irregular, a window averages whatever readings it contains.
+    """
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    first = np.searchsorted(seconds, seconds - window, side="right")
+    last = np.arange(1, len(values) + 1)
+    return (sums[last] - sums[first]) / (last - first)
+
+
+def aqi(parameter: str, concentration: np.ndarray) -> np.ndarray:
+    """EPA AQI of averaged concentrations already in the scale's unit, capped at 500."""
+    scale = AQI_SCALES[parameter]
+    factor = 10 ** scale.decimals
+    # the epsilon keeps e.g. 9.1 * 10 = 90.99999... from truncating into the lower band
+    c = np.floor(np.clip(concentration, 0, None) * factor + 1e-9) / factor
+
+    c_low = np.array([low for low, _ in scale.breakpoints])
+    c_high = np.array([high for _, high in scale.breakpoints])
+    i_low = np.array([low for low, _ in _AQI_INDEX], dtype=float)
+    i_high = np.array([high for _, high in _AQI_INDEX], dtype=float)
+
+    band = np.clip(np.searchsorted(c_low, c, side="right") - 1, 0, len(c_low) - 1)
+    index = (i_high[band] - i_low[band]) / (c_high[band] - c_low[band]) * (c - c_low[band]) + i_low[band]
+    return np.clip(np.rint(index), 0, 500).astype(int)
+
+
+def aqi_category(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return next(name for upper, name in AQI_CATEGORIES if value <= upper)
+
+
+def compute_parameter_stats(
+        parameter: str,
+        series: SeriesColumns,
+        start_date: Optional[datetime],
+        windows: List[str],
+) -> ParameterStats:
+    """Statistics of one series loaded with lookback_seconds() of extra history before `start_date`.
+
+    Rolling means and the AQI use that history, everything else only covers readings from the start day on.
+    """
+    seconds = np.array(series.timestamps, dtype="datetime64[s]").astype(np.int64)
+    values = np.asarray(series.values, dtype=float)
+
+    first = 0
+    if start_date is not None:
+        start = datetime.combine(naive_utc(start_date).date(), time.min)
+        first = int(np.searchsorted(seconds, int(start.replace(tzinfo=timezone.utc).timestamp()), side="left"))
+
+    in_range = values[first:]
+    stats = ParameterStats(
+        parameter=parameter,
+        unit=series.unit,
+        count=len(in_range),
+        timestamps=list(series.timestamps[first:]),
+        rolling_means={},
+    )
+    if not len(in_range):
+        return stats
+
+    stats.mean = float(in_range.mean())
+    stats.min = float(in_range.min())
+    stats.max = float(in_range.max())
+    stats.percentiles = {f"p{q}": float(v) for q, v in zip(PERCENTILES, np.percentile(in_range, PERCENTILES))}
+
+    rolling = {w: rolling_mean(seconds, values, ROLLING_WINDOWS[w]) for w in windows}
+    stats.rolling_means = {w: np.round(r[first:], 3).tolist() for w, r in rolling.items()}
+
+    to_ugm3 = _UNIT_TO_UGM3.get(series.unit)
+    if parameter in DAILY_LIMITS and to_ugm3 is not None:
+        days = seconds[first:] // DAY_SECONDS - seconds[first] // DAY_SECONDS
+        daily_means = np.bincount(days, weights=in_range) / np.maximum(np.bincount(days), 1)
+        observed = np.bincount(days) > 0
+        stats.exceedance_limit = DAILY_LIMITS[parameter]
+        stats.exceedance_days = int(np.count_nonzero(observed & (daily_means * to_ugm3 > DAILY_LIMITS[parameter])))
+
+    scale = AQI_SCALES.get(parameter)
+    if scale is not None and to_ugm3 is not None:
+        window = rolling.get(scale.window)
+        if window is None:
+            window = rolling_mean(seconds, values, ROLLING_WINDOWS[scale.window])
+        index = aqi(parameter, window[first:] * to_ugm3 / scale.ugm3_per_unit)
+        stats.aqi = index.tolist()
+        stats.aqi_max = int(index.max())
+        stats.aqi_category = aqi_category(stats.aqi_max)
+
+    return stats
+
+
+def is_closed(end_date: Optional[datetime]) -> bool:
+    """True when no reading can still arrive for the range, i.e. its last day is over."""
+    if end_date is None:
+        return False
+    end = datetime.combine(naive_utc(end_date).date(), time.min) + timedelta(days=1)
+    return end <= naive_utc(datetime.now(timezone.utc))
+
+
+class AirQualityStatsService:
+    """Rolling means, percentiles, exceedances and AQI of whole series, computed with NumPy.
+
+    Results of closed ranges are kept in the shared chart-data cache for `closed_ttl_seconds`, per
+    parameter, and dropped by the same write invalidation as chart data. Open ranges are always recomputed.
+    """
+
+    def __init__(
+        self,
+        measurement_repo: AsyncMeasurementRepository,
+        cache: Optional[ChartDataCache] = None,
+        closed_ttl_seconds: float = 3600,
+    ):
+        self.measurement_repo = measurement_repo
+        self.cache = cache
+        self.closed_ttl_seconds = closed_ttl_seconds
+
+    async def get_stats(
+        self,
+        city: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        parameters: Optional[List[str]] = None,
+        windows: Optional[List[str]] = None,
+    ) -> AirQualityStats:
+        windows = validate_windows(windows or list(DEFAULT_WINDOWS))
+        parameters = list(dict.fromkeys(parameters or AQI_SCALES))
+
+        load_start = None
+        if start_date is not None:
+            start_day = datetime.combine(naive_utc(start_date).date(), time.min)
+            load_start = start_day - timedelta(seconds=lookback_seconds(windows, parameters))
+
+        # results of clients in their read-your-writes window are neither served from nor stored in the cache
+        memoize = self.cache is not None and is_closed(end_date) and not read_from_primary.get()
+        results: Dict[str, ParameterStats] = {}
+        generations: Dict[str, int] = {}
+        for parameter in parameters:
+            if memoize:
+                cached, generations[parameter] = self.cache.lookup(self._key(city, parameter, start_date, end_date, windows))
+                if cached is not None:
+                    results[parameter] = cached
+
+        missing = [p for p in parameters if p not in results]
+        if missing:
+            # memoized stats are loaded from the primary, a replica may lag behind
+            with primary_reads() if memoize else nullcontext():
+                series = await self.measurement_repo.get_series(
+                    city, start_date=load_start, end_date=end_date, parameters=missing
+                )
+            for parameter in missing:
+                if parameter not in series:
+                    continue
+                stats = compute_parameter_stats(parameter, series[parameter], start_date, windows)
+                results[parameter] = stats
+                if memoize:
+                    scope = ChartDataScope(
+                        city=city,
+                        parameters=frozenset([parameter]),
+                        start=load_start.date() if load_start else None,
+                        end=end_date.date(),
+                    )
+                    key = self._key(city, parameter, start_date, end_date, windows)
+                    self.cache.store(key, scope, stats, generations[parameter], ttl_seconds=self.closed_ttl_seconds)
+
+        return AirQualityStats(
+            city=city,
+            start_date=start_date,
+            end_date=end_date,
+            windows=windows,
+            parameters=[results[p] for p in parameters if p in results],
+        )
+
+    @staticmethod
+    def _key(city: str, parameter: str, start_date: Optional[datetime], end_date: Optional[datetime], windows: List[str]):
+        return (
+            "air-quality-stats",
+            city,
+            parameter,
+            start_date.date() if start_date else None,
+            end_date.date() if end_date else None,
+            tuple(windows),
+        )
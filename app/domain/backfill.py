@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.domain.ingestion_scheduler import RepositoryFactory
+from app.domain.model.backfill import BackfillReport
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.sensor_metadata_loader import SensorInfo
+
+# Rows per page requested from OpenAQ, the largest page the API serves
+BACKFILL_PAGE_SIZE = 1000
+
+CHECKPOINT_VERSION = 1
+
+
+def _parse_utc(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+
+class BackfillCheckpoint:
+    """Per-sensor progress of a backfill, rewritten atomically after every stored page.
+
+    A checkpoint belongs to one date range, pages of that range are stable so resuming at
+    `next_page` neither skips nor re-reads history.
+    """
+
+    def __init__(self, path: Path, datetime_from: datetime, datetime_to: datetime, sensors: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.datetime_from = datetime_from
+        self.datetime_to = datetime_to
+        self.sensors: Dict[str, dict] = sensors or {}
+
+    @classmethod
+    def open(cls, path: Path, datetime_from: Optional[datetime], datetime_to: Optional[datetime]) -> "BackfillCheckpoint":
+        if not path.exists():
+            if datetime_from is None:
+                raise ValueError("A start date is required to begin a new backfill")
+            return cls(path, datetime_from, datetime_to or datetime.now(timezone.utc))
+
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if raw.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {path}")
+
+        checkpoint = cls(path, _parse_utc(raw["datetime_from"]), _parse_utc(raw["datetime_to"]), raw.get("sensors"))
+        if (datetime_from and datetime_from != checkpoint.datetime_from) or (datetime_to and datetime_to != checkpoint.datetime_to):
+            raise ValueError(
+                f"{path} belongs to a backfill of {checkpoint.datetime_from.isoformat()} - "
+                f"{checkpoint.datetime_to.isoformat()}, use another checkpoint file for a different range"
+            )
+        return checkpoint
+
+    def progress(self, sensor_id: int) -> dict:
+        return self.sensors.setdefault(str(sensor_id), {"next_page": 1, "rows": 0, "done": False})
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CHECKPOINT_VERSION,
+                "datetime_from": self.datetime_from.isoformat(),
+                "datetime_to": self.datetime_to.isoformat(),
+                "sensors": self.sensors,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BackfillJob:
+    """Walks the paginated measurement history of sensors into the repository.
+
+    Up to `parallel` sensors run at once. Each page is inserted with add_many while the next one is
+    downloaded, so a sensor holds at most two pages in memory however long its history is.
+    """
+
+    def __init__(
+        self,
+        repository_factory: RepositoryFactory,
+        client: OpenAQClient,
+        sensors: List[SensorInfo],
+        checkpoint: BackfillCheckpoint,
+        parallel: int = 4,
+        page_size: int = BACKFILL_PAGE_SIZE,
+        report_seconds: float = 10,
+    ):
+        self.repository_factory = repository_factory
+        self.client = client
+        self.sensors = sensors
+        self.checkpoint = checkpoint
+        self.parallel = parallel
+        self.page_size = page_size
+        self.report_seconds = report_seconds
+
+        self.pages = 0
+        self.rows_fetched = 0
+        self.rows_stored = 0
+        self.errors: Dict[int, str] = {}
+
+    async def run(self) -> BackfillReport:
+        started = time.monotonic()
+        limit = asyncio.Semaphore(self.parallel)
+
+        async def run_sensor(sensor: SensorInfo):
+            async with limit:
+                try:
+                    await self._backfill_sensor(sensor)
+                except Exception as e:
+                    self.errors[sensor.sensor_id] = str(e)
+                    print(f"Backfill of sensor {sensor.sensor_id} ({sensor.city} {sensor.parameter}) failed: {e}")
+
+        reporter = asyncio.create_task(self._report(started))
+        try:
+            await asyncio.gather(*(run_sensor(s) for s in self.sensors))
+        finally:
+            reporter.cancel()
+            with suppress(asyncio.CancelledError):
+                await reporter
+
+        seconds = time.monotonic() - started
+        return BackfillReport(
+            sensors=len(self.sensors),
+            completed=sum(1 for s in self.sensors if self.checkpoint.progress(s.sensor_id)["done"]),
+            pages=self.pages,
+            rows_fetched=self.rows_fetched,
+            rows_stored=self.rows_stored,
+            seconds=round(seconds, 3),
+            rows_per_second=round(self.rows_fetched / seconds, 1) if seconds else 0.0,
+            errors=self.errors,
+        )
+
+    async def _backfill_sensor(self, sensor: SensorInfo):
+        progress = self.checkpoint.progress(sensor.sensor_id)
+        if progress["done"]:
+            return
+
+        page = progress["next_page"]
+        next_fetch = asyncio.create_task(self._fetch(sensor, page))
+        try:
+            while next_fetch is not None:
+                results = (await next_fetch).get("results", [])
+                # a short page is the last one
+                next_fetch = asyncio.create_task(self._fetch(sensor, page + 1)) if len(results) >= self.page_size else None
+
+                stored = await self._store(sensor, results)
+                self.pages += 1
+                self.rows_fetched += len(results)
+                self.rows_stored += stored
+
+                page += 1
+                progress.update(next_page=page, rows=progress["rows"] + stored, done=next_fetch is None)
+                self.checkpoint.save()
+        finally:
+            if next_fetch is not None:
+                next_fetch.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await next_fetch
+
+    async def _fetch(self, sensor: SensorInfo, page: int) -> dict:
+        return await self.client.get_sensor_measurements(
+            sensor.sensor_id,
+            self.checkpoint.datetime_from,
+            self.checkpoint.datetime_to,
+            page=page,
+            limit=self.page_size,
+        )
+
+    async def _store(self, sensor: SensorInfo, results: List[dict]) -> int:
+        if not results:
+            return 0
+
+        measurements = []
+        for r in results:
+            period = r.get("period") or {}
+            # like /latest, a reading is stamped with the end of its averaging period
+            stamp = (period.get("datetimeTo") or period.get("datetimeFrom") or r.get("datetime") or {}).get("utc")
+            if stamp is None or r.get("value") is None:
+                continue
+            measurements.append(MeasurementEntity(
+                city=sensor.city,
+                parameter=sensor.parameter,
+                value=r["value"],
+                unit=sensor.unit,
+                timestamp=_parse_utc(stamp),
+            ))
+
+        async with self.repository_factory() as repo:
+            return len(await repo.add_many(measurements))
+
+    async def _report(self, started: float):
+        while True:
+            await asyncio.sleep(self.report_seconds)
+            elapsed = time.monotonic() - started
+            print(
+                f"Backfill: {self.pages} pages, {self.rows_fetched} rows fetched, {self.rows_stored} stored, "
+                f"{self.rows_fetched / elapsed:.0f} rows/s"
+            )
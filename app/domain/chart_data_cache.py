@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Hashable, List, Optional, Tuple, TypeVar
+
+from app.domain.model.cache_stats import ChartDataCacheStats
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ChartDataScope:
+    """Rows a cached result was built from, used to invalidate it precisely."""
+    city: Optional[str]
+    parameters: Optional[frozenset]
+    start: Optional[date]
+    end: Optional[date]
+
+    def covers(self, city: str, parameter: str, timestamp: datetime) -> bool:
+        if self.city is not None and self.city != city:
+            return False
+        if self.parameters is not None and parameter not in self.parameters:
+            return False
+
+        day = _utc_date(timestamp)
+        if self.start is not None and day < self.start:
+            return False
+        if self.end is not None and day > self.end:
+            return False
+        return True
+
+
+@dataclass
+class _Entry:
+    value: Any
+    scope: ChartDataScope
+    expires_at: float
+
+
+def _utc_date(ts: datetime) -> date:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.date()
+
+
+def chart_data_key(
+    city: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    parameters: Optional[List[str]] = None,
+    sort_by: Optional[List[str]] = None,
+    bucket: Optional[str] = None,
+    agg: str = "avg",
+    max_points: Optional[int] = None,
+) -> Tuple[Hashable, ChartDataScope]:
+    """Normalized cache key of a get_chart_data call and the scope of rows it reads.
+
+    The repository widens the range to whole days, so only the dates take part in the key.
+    """
+    scope = ChartDataScope(
+        city=city or None,
+        parameters=frozenset(parameters) if parameters else None,
+        start=start_date.date() if start_date else None,
+        end=end_date.date() if end_date else None,
+    )
+    key = (
+        scope.city,
+        tuple(sorted(scope.parameters)) if scope.parameters else None,
+        scope.start,
+        scope.end,
+        tuple(sort_by or ()),
+        bucket,
+        agg if bucket else None,
+        max_points,
+    )
+    return key, scope
+
+
+class ChartDataCache:
+    """Bounded LRU cache with TTL for chart-data results and other values derived from measurements."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        scope: ChartDataScope,
+        loader: Callable[[], T],
+    ) -> T:
+        value, generation = self.lookup(key)
+        if value is not None:
+            return value
+
+        value = loader()
+        self.store(key, scope, value, generation)
+        return value
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], int]:
+        """Cached value or None, with the generation to hand to store() after loading a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value, self._generation
+
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None, self._generation
+
+    def store(
+        self,
+        key: Hashable,
+        scope: ChartDataScope,
+        value: Any,
+        generation: int,
+        ttl_seconds: Optional[float] = None,
+    ) -> bool:
+        """Caches a loaded value unless a write landed since lookup(), the value may already be stale then."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if generation != self._generation:
+                return False
+
+            self._entries[key] = _Entry(value=value, scope=scope, expires_at=time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, city: str, parameter: str, timestamp: datetime) -> int:
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if entry.scope.covers(city, parameter, timestamp)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> ChartDataCacheStats:
+        with self._lock:
+            return ChartDataCacheStats(
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl_seconds,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+            )
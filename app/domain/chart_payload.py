@@ -0,0 +1,96 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import orjson
+
+from app.domain.model.air_quality import AirQualityMeasurement
+
+CHART_FORMATS = ("rows", "columnar")
+
+# datetimes come out exactly like pydantic writes them: naive as is, UTC with a "Z"
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+class ChartRow(NamedTuple):
+    """One chart-data row as selected from the database, same fields as AirQualityMeasurement."""
+    id: str
+    city: str
+    parameter: str
+    value: float
+    unit: str
+    timestamp: datetime
+
+
+_FIELDS = ChartRow._fields
+
+
+@dataclass(frozen=True)
+class ChartPayload:
+    body: bytes
+    etag: str
+
+
+def validate_format(fmt: str) -> str:
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(CHART_FORMATS)}")
+    return fmt
+
+
+def to_row(item: AirQualityMeasurement) -> ChartRow:
+    return ChartRow(item.id, item.city, item.parameter, item.value, item.unit, item.timestamp)
+
+
+def to_measurement(row: ChartRow) -> AirQualityMeasurement:
+    return AirQualityMeasurement(**row._asdict())
+
+
+def encode_rows(rows: Iterable[Sequence]) -> bytes:
+    """JSON array of measurement objects, byte-for-byte what the response_model would produce."""
+    return orjson.dumps([dict(zip(_FIELDS, row)) for row in rows], option=_ORJSON_OPTIONS)
+
+
+def encode_row(row: Sequence) -> bytes:
+    return orjson.dumps(dict(zip(_FIELDS, row)), option=_ORJSON_OPTIONS)
+
+
+def encode_ndjson(rows: Iterable[Sequence]) -> bytes:
+    return b"".join(encode_row(row) + b"\n" for row in rows)
+
+
+def encode_columnar(rows: Sequence[ChartRow]) -> bytes:
+    """{timestamps, values, units} of one city: a shared sorted time axis and one value array per parameter.
+
+    Parameters without a reading at a timestamp get null there.
+    """
+    timestamps = sorted({row.timestamp for row in rows})
+    position = {ts: i for i, ts in enumerate(timestamps)}
+
+    units: Dict[str, str] = {}
+    values: Dict[str, List[Optional[float]]] = {}
+    for row in rows:
+        series = values.get(row.parameter)
+        if series is None:
+            series = values[row.parameter] = [None] * len(timestamps)
+            units[row.parameter] = row.unit
+        series[position[row.timestamp]] = row.value
+
+    return orjson.dumps({"timestamps": timestamps, "values": values, "units": units}, option=_ORJSON_OPTIONS)
+
+
+def compute_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def build_payload(rows: Sequence[ChartRow], fmt: str = "rows") -> ChartPayload:
+    body = encode_columnar(rows) if validate_format(fmt) == "columnar" else encode_rows(rows)
+    return ChartPayload(body=body, etag=compute_etag(body))
+
+
+def build_batch_payload(series: Dict[str, ChartPayload]) -> ChartPayload:
+    """JSON object of already encoded payloads by key, the bodies are spliced in as they are."""
+    body = b"{" + b",".join(orjson.dumps(key) + b":" + payload.body for key, payload in series.items()) + b"}"
+    # the parts are hashed already, only keys and their ETags go into the batch ETag
+    etag = compute_etag(b"".join(orjson.dumps(key) + payload.etag.encode() for key, payload in series.items()))
+    return ChartPayload(body=body, etag=etag)
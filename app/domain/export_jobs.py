@@ -0,0 +1,270 @@
+import asyncio
+import contextvars
+import csv
+import gzip
+import os
+import re
+import time
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, time as day_time, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.domain.chart_payload import ChartRow
+from app.domain.model.export_job import ExportJobStatus, ExportRequest
+from app.domain.time_series import naive_utc
+from app.persistance.repositories.measurement_repository import MeasurementRepository
+
+RepositoryFactory = Callable[[], ContextManager[MeasurementRepository]]
+
+EXPORT_COLUMNS = ChartRow._fields
+
+
+class CsvExportWriter:
+    suffix = ".csv.gz"
+    media_type = "application/gzip"
+
+    def __init__(self, path: Path):
+        self._file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows: List[ChartRow]):
+        self._csv.writerows(row._replace(timestamp=row.timestamp.isoformat()) for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExportWriter:
+    suffix = ".parquet"
+    media_type = "application/vnd.apache.parquet"
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("city", pa.string()),
+        ("parameter", pa.string()),
+        ("value", pa.float64()),
+        ("unit", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+    def __init__(self, path: Path):
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows: List[ChartRow]):
+        # one row group per chunk, the file is readable chunk by chunk as well
+        columns = [list(column) for column in zip(*rows)]
+        columns[-1] = [naive_utc(ts) for ts in columns[-1]]
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+EXPORT_WRITERS = {
+    "csv": CsvExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+# <job id><suffix>, or its .tmp when a process stopped during the export
+_JOB_FILE_NAME = re.compile(
+    r"[0-9a-f]{32}(?:%s)(?:\.tmp)?" % "|".join(re.escape(writer.suffix) for writer in EXPORT_WRITERS.values())
+)
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+@dataclass
+class ExportJob:
+    id: str
+    request: ExportRequest
+    created_at: datetime
+    state: str = "queued"
+    rows: int = 0
+    size_bytes: Optional[int] = None
+    progress: float = 0
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    path: Optional[Path] = None
+    cancelled: bool = field(default=False, repr=False)
+
+
+class ExportManager:
+    """Runs bulk exports in worker threads, at most `max_concurrent` at a time.
+
+    Rows are streamed from the repository `chunk_rows` at a time into a temporary file that is
+    renamed once complete, so memory stays flat for any range and a file on disk is always whole.
+    Jobs live in this process, finished files are removed after `retention_hours`.
+    """
+
+    def __init__(
+        self,
+        repository_factory: RepositoryFactory,
+        root: Path,
+        max_concurrent: int = 2,
+        chunk_rows: int = 10000,
+        retention_hours: float = 24,
+    ):
+        self.repository_factory = repository_factory
+        self.root = Path(root)
+        self.chunk_rows = chunk_rows
+        self.retention_seconds = retention_hours * 3600
+
+        self.jobs: Dict[str, ExportJob] = {}
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, request: ExportRequest) -> ExportJob:
+        self.purge_expired()
+        job = ExportJob(id=uuid.uuid4().hex, request=request, created_at=datetime.now(timezone.utc))
+        self.jobs[job.id] = job
+
+        # a fresh context, the job must not inherit the per-request state of the request that started it
+        task = asyncio.create_task(self._run(job), name=f"export-{job.id}", context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Stops a queued or running job, or deletes the file of a finished one."""
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+
+        job.cancelled = True
+        if job.path is not None and job.state == "done":
+            with suppress(FileNotFoundError):
+                job.path.unlink()
+        return True
+
+    async def close(self):
+        for job in self.jobs.values():
+            job.cancelled = True
+        # running exports stop at their next chunk
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at.timestamp() < cutoff:
+                self.cancel(job_id)
+
+        # files of jobs an earlier process ran, anything else in the directory is not ours
+        if self.root.is_dir():
+            for entry in os.scandir(self.root):
+                if not _JOB_FILE_NAME.fullmatch(entry.name):
+                    continue
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    with suppress(FileNotFoundError):
+                        os.unlink(entry.path)
+
+    async def _run(self, job: ExportJob):
+        async with self._slots:
+            if job.cancelled:
+                return
+
+            job.state = "running"
+            job.started_at = datetime.now(timezone.utc)
+            try:
+                await asyncio.to_thread(self._export, job)
+                job.state = "done"
+                job.progress = 1
+                print(f"Export {job.id} finished: {job.rows} rows, {job.size_bytes} bytes")
+            except ExportCancelled:
+                job.state = "cancelled"
+            except Exception as e:
+                job.state = "failed"
+                job.error = str(e)
+                print(f"Export {job.id} failed: {e}")
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+
+    def _export(self, job: ExportJob):
+        request = job.request
+        writer_class = EXPORT_WRITERS[request.format]
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{job.id}{writer_class.suffix}"
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        writer = writer_class(tmp_path)
+        try:
+            with self.repository_factory() as repo:
+                rows = repo.iter_chart_data(
+                    city=request.city,
+                    start_date=request.start_date,
+                    end_date=request.end_date,
+                    parameters=request.parameters,
+                )
+                start, end = _progress_range(request)
+                while chunk := list(islice(rows, self.chunk_rows)):
+                    if job.cancelled:
+                        raise ExportCancelled()
+                    writer.write(chunk)
+                    job.rows += len(chunk)
+                    if start is None:
+                        start = naive_utc(chunk[0].timestamp)
+                    job.progress = _share(start, end, naive_utc(chunk[-1].timestamp))
+            writer.close()
+        except BaseException:
+            writer.close()
+            with suppress(FileNotFoundError):
+                tmp_path.unlink()
+            raise
+
+        os.replace(tmp_path, path)
+        job.path = path
+        job.size_bytes = path.stat().st_size
+        if job.cancelled:
+            # cancelled after the last chunk, nobody will download it
+            path.unlink()
+            raise ExportCancelled()
+
+
+def _progress_range(request: ExportRequest) -> Tuple[Optional[datetime], datetime]:
+    # the whole days the repository reads
+    start = end = None
+    if request.start_date is not None:
+        start = datetime.combine(naive_utc(request.start_date).date(), day_time.min)
+    if request.end_date is not None:
+        end = datetime.combine(naive_utc(request.end_date).date(), day_time.max)
+    return start, min(end or datetime.max, naive_utc(datetime.now(timezone.utc)))
+
+
+def _share(start: datetime, end: datetime, reached: datetime) -> float:
+    if end <= start:
+        return 0
+    return max(0.0, min(1.0, (reached - start) / (end - start)))
+
+
+def download_name(job: ExportJob) -> str:
+    """File name offered to the client, the file on disk is named after the job."""
+    return f"measurements-{job.request.city}-{job.created_at:%Y%m%d%H%M%S}{EXPORT_WRITERS[job.request.format].suffix}"
+
+
+def to_status(job: ExportJob, download_url: Optional[str] = None) -> ExportJobStatus:
+    return ExportJobStatus(
+        id=job.id,
+        state=job.state,
+        request=job.request,
+        rows=job.rows,
+        size_bytes=job.size_bytes,
+        progress=round(job.progress, 4),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        download_url=download_url if job.state == "done" else None,
+    )
@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import AsyncContextManager, Callable, List, Optional
+
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.domain.model.config import get_config
+from app.domain.model.ingestion_status import IngestionStatus
+from app.domain.openaq_service import OpenAQAirQualityService
+from app.persistance.repositories.async_measurement_repository import AsyncMeasurementRepository
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+
+RepositoryFactory = Callable[[], AsyncContextManager[AsyncMeasurementRepository]]
+
+
+class IngestionScheduler:
+    """Polls OpenAQ for every configured city in the background and stores new readings."""
+
+    def __init__(self, repository_factory: RepositoryFactory, interval_seconds: int, client: Optional[OpenAQClient] = None):
+        self.repository_factory = repository_factory
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.cities: List[str] = get_sensor_registry().cities
+
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_success_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._loop(), name="openaq-ingestion")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._stopping.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def status(self) -> IngestionStatus:
+        lag = None
+        if self.last_success_at:
+            lag = (datetime.now(timezone.utc) - self.last_success_at).total_seconds()
+
+        return IngestionStatus(
+            running=self._task is not None and not self._task.done(),
+            interval_seconds=self.interval_seconds,
+            cities=self.cities,
+            runs=self.runs,
+            failures=self.failures,
+            consecutive_failures=self.consecutive_failures,
+            last_run_at=self.last_run_at,
+            last_success_at=self.last_success_at,
+            lag_seconds=lag,
+            last_error=self.last_error,
+        )
+
+    async def _loop(self):
+        # one keep-alive connection pool and rate limit for every poll
+        client = self.client or OpenAQClient.from_config(get_config().openaq)
+        try:
+            while not self._stopping.is_set():
+                await self.run_once(client)
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.interval_seconds)
+        finally:
+            if client is not self.client:
+                await client.aclose()
+
+    async def run_once(self, client: Optional[OpenAQClient] = None) -> int:
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc)
+
+        # picks up cities added to sensor_metadata.yaml since the last run
+        self.cities = get_sensor_registry().cities
+
+        # cities are fetched concurrently, the client bounds the requests in flight
+        results = await asyncio.gather(
+            *(self._ingest_city(city, client or self.client) for city in self.cities),
+            return_exceptions=True,
+        )
+
+        stored = 0
+        failed = False
+        for city, result in zip(self.cities, results):
+            if isinstance(result, Exception):
+                failed = True
+                self.failures += 1
+                self.last_error = f"{city}: {result}"
+                print(f"Ingestion for {city} failed: {result}")
+            else:
+                stored += result
+
+        if failed:
+            self.consecutive_failures += 1
+        else:
+            self.consecutive_failures = 0
+            self.last_success_at = datetime.now(timezone.utc)
+
+        return stored
+
+    async def _ingest_city(self, city: str, client: Optional[OpenAQClient]) -> int:
+        async with self.repository_factory() as repo:
+            service = OpenAQAirQualityService(measurement_repo=repo, client=client)
+            return len(await service.get_latest_measurements(city))
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.domain.ingestion_scheduler import RepositoryFactory
+from app.domain.mapper import to_air_quality
+from app.domain.model.air_quality import AirQualityMeasurement
+from app.domain.openaq_service import OpenAQAirQualityService
+
+
+@dataclass
+class _Entry:
+    items: List[AirQualityMeasurement]
+    loaded_at: float
+
+
+class LiveMeasurements:
+    """Latest readings per city fetched from OpenAQ on demand, shared by every request.
+
+    Concurrent requests for a city wait on one in-flight fetch (single flight). A result younger than
+    `fresh_seconds` is served as is, one younger than `fresh_seconds + stale_seconds` is served
+    immediately while a single background fetch refreshes it. Upstream calls are therefore bounded
+    by the number of cities, not by the number of clients.
+    """
+
+    def __init__(
+        self,
+        repository_factory: RepositoryFactory,
+        client: Optional[OpenAQClient] = None,
+        fresh_seconds: float = 30,
+        stale_seconds: float = 300,
+    ):
+        self.repository_factory = repository_factory
+        self.client = client
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get_latest(self, city: str) -> List[AirQualityMeasurement]:
+        entry = self._entries.get(city)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.fresh_seconds:
+                return entry.items
+            if age < self.fresh_seconds + self.stale_seconds:
+                self._refresh(city)
+                return entry.items
+
+        # shielded, a client hanging up must not cancel the fetch other requests wait on
+        return await asyncio.shield(self._refresh(city))
+
+    async def close(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError, Exception):
+                await task
+
+    def _refresh(self, city: str) -> asyncio.Task:
+        task = self._inflight.get(city)
+        if task is None:
+            task = asyncio.create_task(self._load(city), name=f"live-measurements-{city}")
+            self._inflight[city] = task
+            task.add_done_callback(lambda t: self._done(city, t))
+        return task
+
+    def _done(self, city: str, task: asyncio.Task):
+        if self._inflight.get(city) is task:
+            del self._inflight[city]
+        if not task.cancelled() and task.exception() is not None:
+            # the stale entry, if any, keeps being served until it expires
+            print(f"Live measurements refresh for {city} failed: {task.exception()}")
+
+    async def _load(self, city: str) -> List[AirQualityMeasurement]:
+        async with self.repository_factory() as repo:
+            service = OpenAQAirQualityService(measurement_repo=repo, client=self.client)
+            await service.get_latest_measurements(city)
+            items = [to_air_quality(m) for m in await repo.get_latest(city)]
+
+        self._entries[city] = _Entry(items=items, loaded_at=time.monotonic())
+        return items
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from app.persistance.maintenance import MaintenanceReport
+
+# called with the event stop() sets, the run checks it between two transactions
+MaintenanceRun = Callable[[threading.Event], MaintenanceReport]
+
+
+class MaintenanceScheduler:
+    """Runs the database maintenance in a worker thread every `interval_seconds`, the first time right away.
+
+    Every uvicorn worker runs its own scheduler, the tasks are idempotent so overlapping runs only
+    repeat work.
+    """
+
+    def __init__(self, run: MaintenanceRun, interval_seconds: float):
+        self.run = run
+        self.interval_seconds = interval_seconds
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_report: Optional[MaintenanceReport] = None
+        self.last_error: Optional[str] = None
+
+        self._stopping = asyncio.Event()
+        self._stop_run = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._stop_run.clear()
+            self._task = asyncio.create_task(self._loop(), name="db-maintenance")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        # a run in progress ends after its current transaction, waiting for it keeps the engine open until then
+        self._stopping.set()
+        self._stop_run.set()
+        await self._task
+        self._task = None
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            await self.run_once()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval_seconds)
+
+    async def run_once(self) -> Optional[MaintenanceReport]:
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc)
+        try:
+            report = await asyncio.to_thread(self.run, self._stop_run)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Database maintenance failed: {e}")
+            return None
+
+        self.last_report = report
+        print(
+            f"Database maintenance finished in {report.seconds:.1f}s: {report.duplicates_removed} duplicates and "
+            f"{sum(report.expired_removed.values())} expired rows removed, index {report.index}"
+        )
+        return report
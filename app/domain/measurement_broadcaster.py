@@ -0,0 +1,98 @@
+import asyncio
+from collections import deque
+from contextlib import suppress
+from typing import Iterable, List, Optional, Set, Tuple
+
+from app.domain.chart_payload import encode_row, to_row
+from app.persistance.model.measurement_entity import MeasurementEntity
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """Measurements of one client, waiting in a bounded queue until the client takes them.
+
+    A client that falls `max_queue` events behind loses the oldest ones; how many were lost is
+    reported with the next batch so it can refetch the gap from chart-data.
+    """
+
+    def __init__(self, city: Optional[str], parameters: Optional[Iterable[str]], max_queue: int):
+        self.city = city
+        self.parameters = frozenset(parameters) if parameters else None
+        self.dropped = 0
+        self.closed = False
+        self._events: deque = deque(maxlen=max_queue)
+        self._ready = asyncio.Event()
+
+    def matches(self, city: str, parameter: str) -> bool:
+        if self.city is not None and self.city != city:
+            return False
+        return self.parameters is None or parameter in self.parameters
+
+    def push(self, event: bytes):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[Tuple[List[bytes], int]]:
+        """Every queued event and the number dropped since the last call, both empty after `timeout`.
+
+        Returns None once the subscription is closed.
+        """
+        if not self._events and not self.closed:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._ready.wait(), timeout)
+        if self.closed:
+            return None
+
+        self._ready.clear()
+        events = list(self._events)
+        self._events.clear()
+        dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class MeasurementBroadcaster:
+    """Fans newly stored measurements out to the live subscribers of this process.
+
+    Publishing never waits on a subscriber: each measurement is encoded once and appended to the
+    queue of every matching subscription. Must be used from the event loop.
+    """
+
+    def __init__(self, max_queue: int = 256, max_subscribers: int = 1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, city: Optional[str] = None, parameters: Optional[Iterable[str]] = None) -> Subscription:
+        """Starts queueing matching measurements, the caller has to unsubscribe() when done."""
+        if len(self.subscriptions) >= self.max_subscribers:
+            raise TooManySubscribers(f"Live subscriptions are limited to {self.max_subscribers}")
+
+        subscription = Subscription(city, parameters, self.max_queue)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+        subscription.close()
+
+    def publish(self, measurements: Iterable[MeasurementEntity]):
+        if not self.subscriptions:
+            return
+
+        for m in measurements:
+            event = None
+            for subscription in self.subscriptions:
+                if subscription.matches(m.city, m.parameter):
+                    if event is None:
+                        event = encode_row(to_row(m))
+                    subscription.push(event)
+
@@ -0,0 +1,115 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.domain.model.measurement_import import (
+    MeasurementImportRecord,
+    MeasurementImportResult,
+    MeasurementImportSummary,
+)
+from app.domain.time_series import naive_utc
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.async_measurement_repository import AsyncMeasurementRepository
+from app.persistance.sensor_metadata_loader import SensorRegistry
+
+# Records per add_many call, each chunk is its own transaction
+IMPORT_CHUNK_SIZE = 5000
+
+ParsedRecord = Tuple[int, Optional[MeasurementImportRecord], Optional[str]]
+
+
+def _validate(index: int, raw) -> ParsedRecord:
+    try:
+        return index, MeasurementImportRecord.model_validate(raw), None
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        return index, None, errors
+
+
+def parse_json_array(body: bytes) -> List[ParsedRecord]:
+    payload = json.loads(body)
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of measurements")
+    return [_validate(index, raw) for index, raw in enumerate(payload)]
+
+
+def parse_ndjson(body: bytes) -> List[ParsedRecord]:
+    parsed = []
+    for index, line in enumerate(l for l in body.splitlines() if l.strip()):
+        try:
+            parsed.append(_validate(index, json.loads(line)))
+        except json.JSONDecodeError as e:
+            parsed.append((index, None, f"Invalid JSON: {e.msg}"))
+    return parsed
+
+
+class MeasurementImportService:
+
+    def __init__(self, measurement_repo: AsyncMeasurementRepository, sensors: SensorRegistry):
+        self.measurement_repo = measurement_repo
+        self.sensors = sensors
+
+    async def import_records(self, records: Iterable[ParsedRecord]) -> MeasurementImportSummary:
+        results: Dict[int, MeasurementImportResult] = {}
+        pending: List[Tuple[int, MeasurementEntity]] = []
+        now = datetime.now(timezone.utc)
+
+        for index, record, error in records:
+            if record is not None:
+                entity, error = self._to_entity(record, now)
+                if entity is not None:
+                    pending.append((index, entity))
+                    continue
+            results[index] = MeasurementImportResult(index=index, status="rejected", error=error)
+
+        # neighbouring timestamps in one chunk keep the rollup refresh of every chunk narrow
+        pending.sort(key=lambda p: (p[1].city, p[1].timestamp))
+        for start in range(0, len(pending), IMPORT_CHUNK_SIZE):
+            chunk = pending[start:start + IMPORT_CHUNK_SIZE]
+            try:
+                saved = await self.measurement_repo.add_many([entity for _, entity in chunk])
+            except Exception as e:
+                for index, _ in chunk:
+                    results[index] = MeasurementImportResult(index=index, status="rejected", error=str(e))
+                continue
+
+            saved_ids = {self._key(m): m.id for m in saved}
+            for index, entity in chunk:
+                saved_id = saved_ids.pop(self._key(entity), None)
+                if saved_id is None:
+                    results[index] = MeasurementImportResult(
+                        index=index, status="rejected", error="Measurement already exists"
+                    )
+                else:
+                    results[index] = MeasurementImportResult(index=index, status="accepted", id=saved_id)
+
+        ordered = [results[index] for index in sorted(results)]
+        accepted = sum(1 for r in ordered if r.status == "accepted")
+        return MeasurementImportSummary(accepted=accepted, rejected=len(ordered) - accepted, results=ordered)
+
+    def _to_entity(self, record: MeasurementImportRecord, now: datetime) -> Tuple[Optional[MeasurementEntity], Optional[str]]:
+        city_info = self.sensors.city(record.city)
+        if city_info is None:
+            return None, f"City '{record.city}' is not implemented"
+
+        sensor = city_info.sensors.get(record.sensor_id)
+        if sensor is None:
+            return None, f"Sensor ID {record.sensor_id} not found for city '{record.city}'"
+
+        timestamp = record.timestamp or now
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        return MeasurementEntity(
+            city=city_info.name,
+            parameter=sensor.parameter,
+            value=record.value,
+            unit=sensor.unit,
+            timestamp=timestamp.astimezone(timezone.utc),
+        ), None
+
+    @staticmethod
+    def _key(m: MeasurementEntity) -> Tuple[str, str, datetime]:
+        return m.city, m.parameter, naive_utc(m.timestamp)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 
 class AirQualityMeasurement(BaseModel):
@@ -7,4 +8,9 @@ class AirQualityMeasurement(BaseModel):
     parameter: str
     value: float
     unit: str
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+
+class MeasurementPage(BaseModel):
+    items: List[AirQualityMeasurement]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+class ParameterStats(BaseModel):
+    parameter: str
+    unit: str
+    count: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    exceedance_limit: Optional[float] = None
+    exceedance_days: Optional[int] = None
+    aqi_max: Optional[int] = None
+    aqi_category: Optional[str] = None
+    timestamps: List[datetime]
+    rolling_means: Dict[str, List[float]]
+    aqi: Optional[List[int]] = None
+
+class AirQualityStats(BaseModel):
+    city: str
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    windows: List[str]
+    parameters: List[ParameterStats]
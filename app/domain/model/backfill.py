@@ -0,0 +1,12 @@
+from typing import Dict
+from pydantic import BaseModel
+
+class BackfillReport(BaseModel):
+    sensors: int
+    completed: int
+    pages: int
+    rows_fetched: int
+    rows_stored: int
+    seconds: float
+    rows_per_second: float
+    errors: Dict[int, str] = {}
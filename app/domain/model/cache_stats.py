@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+class ChartDataCacheStats(BaseModel):
+    size: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+MAX_BATCH_SERIES = 50
+
+class ChartSeriesSpec(BaseModel):
+    key: Optional[str] = Field(None, description="Key of the series in the response, its index when omitted")
+    city: str
+    parameters: List[str] = []
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    bucket: Optional[str] = Field(None, description="Aggregate values into time buckets: 5m, 1h or 1d")
+    agg: str = Field("avg", description="Bucket aggregation: avg, min, max or p95")
+    max_points: Optional[int] = Field(None, ge=3, description="Downsample every parameter series to at most this many points")
+
+    def filters(self) -> dict:
+        """Keyword arguments of the matching get_chart_data() call, sorted like the chart-data endpoint."""
+        return {**self.model_dump(exclude={"key"}), "sort_by": ["timestamp:asc"]}
+
+class ChartBatchRequest(BaseModel):
+    series: List[ChartSeriesSpec] = Field(..., min_length=1, max_length=MAX_BATCH_SERIES)
@@ -1,7 +1,8 @@
 import os
 import yaml
+from functools import lru_cache
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,16 +10,90 @@ load_dotenv()
 class OpenAQConfig(BaseModel):
     base_url: str
     api_key: str
+    max_concurrency: int = 8
+    requests_per_minute: float = 60
+    max_retries: int = 3
+    timeout_seconds: float = 10
+
+class IngestionConfig(BaseModel):
+    enabled: bool = False
+    interval_seconds: int = 300
+
+class LiveMeasurementsConfig(BaseModel):
+    fresh_seconds: float = 30
+    stale_seconds: float = 300
+
+class LivePushConfig(BaseModel):
+    max_queue: int = 256
+    max_subscribers: int = 1000
+    heartbeat_seconds: float = 15
+
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    max_entries: int = 256
+    ttl_seconds: float = 60
+    closed_ttl_seconds: float = 3600
+
+class MetricsConfig(BaseModel):
+    enabled: bool = True
+
+class ArchiveConfig(BaseModel):
+    enabled: bool = False
+    path: str = "./archive"
+    keep_months: int = 3
+    delete_batch_size: int = 5000
+
+class ExportConfig(BaseModel):
+    path: str = "./exports"
+    max_concurrent: int = 2
+    chunk_rows: int = 10000
+    # finished files are deleted this long after the job ended
+    retention_hours: float = 24
+
+class MaintenanceConfig(BaseModel):
+    enabled: bool = False
+    interval_hours: float = 24
+    # rows (duplicate groups for the cleanup) per transaction, and the pause between two transactions
+    batch_size: int = 1000
+    pause_seconds: float = 0.05
+    # days raw measurements are kept per parameter, "default" for the rest, none means forever
+    retention_days: Dict[str, int] = {}
+
+class DatabaseConfig(BaseModel):
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # read-only repository calls go to these, round-robin over the healthy ones
+    replica_urls: List[str] = []
+    replica_check_seconds: float = 10
+    # reads of a client that wrote within this window go to the primary
+    read_your_writes_seconds: float = 5
+
+class StartupConfig(BaseModel):
+    # seconds from importing the app to serving, a slower start is logged as a warning
+    budget_seconds: float = 5
 
 class AppConfig(BaseModel):
     name: str = "Web app"
     environment: str = "dev"
     repository_type: str = "in_memory"
     openaq: Optional[OpenAQConfig] = None
+    ingestion: IngestionConfig = IngestionConfig()
+    live_measurements: LiveMeasurementsConfig = LiveMeasurementsConfig()
+    live_push: LivePushConfig = LivePushConfig()
+    cache: CacheConfig = CacheConfig()
+    database: DatabaseConfig = DatabaseConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    archive: ArchiveConfig = ArchiveConfig()
+    export: ExportConfig = ExportConfig()
+    maintenance: MaintenanceConfig = MaintenanceConfig()
+    startup: StartupConfig = StartupConfig()
 
 def load_config() -> AppConfig:
     try:
-        config_path = "./config.yaml"
+        config_path = os.getenv("CONFIG_PATH", "./config.yaml")
 
         with open(config_path, "r") as f:
             raw_yaml = f.read()
@@ -34,3 +109,8 @@ def load_config() -> AppConfig:
         print(f"Config load failed: {e}")
         return AppConfig()
 
+
+@lru_cache(maxsize=1)
+def get_config() -> AppConfig:
+    """Configuration loaded once per process."""
+    return load_config()
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+class ExportRequest(BaseModel):
+    city: str
+    parameters: List[str] = []
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    format: Literal["csv", "parquet"] = Field("csv", description="csv: gzip-compressed CSV, parquet: zstd-compressed Parquet")
+
+class ExportJobStatus(BaseModel):
+    id: str
+    state: Literal["queued", "running", "done", "failed", "cancelled"]
+    request: ExportRequest
+    rows: int = 0
+    size_bytes: Optional[int] = None
+    # share of the requested time range written so far, rows stream in timestamp order
+    progress: float = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class IngestionStatus(BaseModel):
+    running: bool
+    interval_seconds: int
+    cities: list[str]
+    runs: int
+    failures: int
+    consecutive_failures: int
+    last_run_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    lag_seconds: Optional[float] = None
+    last_error: Optional[str] = None
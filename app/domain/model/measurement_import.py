@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+class MeasurementImportRecord(BaseModel):
+    city: str
+    sensor_id: int
+    value: float
+    timestamp: Optional[datetime] = None
+
+class MeasurementImportResult(BaseModel):
+    index: int
+    status: Literal["accepted", "rejected"]
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class MeasurementImportSummary(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[MeasurementImportResult]
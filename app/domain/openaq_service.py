@@ -1,55 +1,51 @@
-import requests
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
+from app.adapters.openaq.openaq_client import OpenAQClient
 from app.domain.mapper import to_air_quality
 from app.domain.model.air_quality import AirQualityMeasurement
-from app.domain.model.config import load_config
+from app.domain.model.config import get_config
 from app.persistance.model.measurement_entity import MeasurementEntity
-from app.persistance.repositories.measurement_repository import MeasurementRepository
-from app.persistance.sensor_metadata_loader import load_sensor_metadata
+from app.persistance.repositories.async_measurement_repository import AsyncMeasurementRepository
+from app.persistance.sensor_metadata_loader import get_sensor_registry
 
 class OpenAQAirQualityService:
 
-    def __init__(self, measurement_repo: MeasurementRepository):
-        self.config = load_config()
-        self.base_url = self.config.openaq.base_url
-        self.api_key = self.config.openaq.api_key
-        self.sensor_metadata = load_sensor_metadata()
+    def __init__(self, measurement_repo: AsyncMeasurementRepository, client: Optional[OpenAQClient] = None):
+        self.config = get_config()
+        self.sensors = get_sensor_registry()
         self.measurement_repo = measurement_repo
-
-    def get_latest_measurements(self, city: str) -> List[AirQualityMeasurement]:
-        location_id = self.sensor_metadata.get(city).get("id")
-        url = f"{self.base_url}/locations/{location_id}/latest"
-        headers = {"X-API-Key": self.api_key}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        results = []
-        city_metadata = self.sensor_metadata.get(city, {})
-        for m in data.get("results", []):
-            sensor_id = m.get("sensorsId")
-            param_info = city_metadata.get(sensor_id, {"parameter": "unknown", "unit": "unknown"})
-
-            timestamp = datetime.fromisoformat(m["datetime"]["utc"].replace("Z", "+00:00"))
-            parameter = param_info["parameter"]
-            value = m["value"]
-
-            exists = self.measurement_repo.measurement_exists(city=city, parameter=parameter, timestamp=timestamp)
-            if exists:
-                continue
-
-            measurement = MeasurementEntity(
-                city=city,
-                parameter=parameter,
-                value=value,
-                unit=param_info["unit"],
-                timestamp=timestamp,
-            )
-            saved = self.measurement_repo.add(measurement)
-            results.append(to_air_quality(saved))
-
-        return results
-
-
+        self.client = client
+
+    async def _fetch_latest(self, location_ids) -> dict:
+        if self.client is not None:
+            return await self.client.get_latest_many(location_ids)
+
+        async with OpenAQClient.from_config(self.config.openaq) as client:
+            return await client.get_latest_many(location_ids)
+
+    async def get_latest_measurements(self, city: str) -> List[AirQualityMeasurement]:
+        city_info = self.sensors.city(city)
+        if city_info is None:
+            raise ValueError(f"City '{city}' is not configured in sensor metadata")
+
+        # every station of the city in one concurrent round trip
+        payloads = await self._fetch_latest(city_info.location_ids)
+
+        measurements = []
+        for data in payloads.values():
+            for m in data.get("results", []):
+                sensor = city_info.sensors.get(m.get("sensorsId"))
+                timestamp = datetime.fromisoformat(m["datetime"]["utc"].replace("Z", "+00:00"))
+
+                measurements.append(MeasurementEntity(
+                    city=city_info.name,
+                    parameter=sensor.parameter if sensor else "unknown",
+                    value=m["value"],
+                    unit=sensor.unit if sensor else "unknown",
+                    timestamp=timestamp,
+                ))
+
+        # Duplicates are skipped by the database, only new rows come back
+        saved = await self.measurement_repo.add_many(measurements)
+        return [to_air_quality(m) for m in saved]
@@ -0,0 +1,17 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(timestamp: datetime, measurement_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{measurement_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, measurement_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), measurement_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
@@ -0,0 +1,35 @@
+import time
+from typing import Dict
+
+from app.domain.metrics import STARTUP_SECONDS
+
+
+class StartupTimer:
+    """Wall-clock time of the startup phases, from `started` (a time.perf_counter() value) to ready.
+
+    Phases are consecutive, each lap() closes the phase that began where the previous one ended.
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self.phases: Dict[str, float] = {}
+        self._mark = started
+        self.total: float = 0
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.phases[name] = now - self._mark
+        self._mark = now
+
+    def finish(self, budget_seconds: float) -> float:
+        """Prints the breakdown and publishes it as metrics, returns the total."""
+        self.total = time.perf_counter() - self.started
+        for name, seconds in self.phases.items():
+            STARTUP_SECONDS.set(name, value=seconds)
+        STARTUP_SECONDS.set("total", value=self.total)
+
+        breakdown = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        print(f"Startup took {self.total * 1000:.0f}ms: {breakdown}")
+        if self.total > budget_seconds:
+            print(f"WARNING: startup exceeded its budget of {budget_seconds}s")
+        return self.total
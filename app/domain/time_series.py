@@ -0,0 +1,161 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.domain.model.air_quality import AirQualityMeasurement
+
+BUCKET_SECONDS: Dict[str, int] = {
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+AGGREGATIONS = ("avg", "min", "max", "p95")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SeriesColumns(NamedTuple):
+    """One parameter series as parallel columns, timestamps naive UTC in ascending order."""
+    unit: str
+    timestamps: List[datetime]
+    values: List[float]
+
+
+def bucket_seconds(bucket: str) -> int:
+    try:
+        return BUCKET_SECONDS[bucket]
+    except KeyError:
+        raise ValueError(f"Unsupported bucket '{bucket}', expected one of {', '.join(BUCKET_SECONDS)}")
+
+
+def validate_aggregation(agg: str) -> str:
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation '{agg}', expected one of {', '.join(AGGREGATIONS)}")
+    return agg
+
+
+def naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def floor_timestamp(ts: datetime, seconds: int) -> datetime:
+    elapsed = int((naive_utc(ts) - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear interpolation between closest ranks, same as SQL percentile_cont."""
+    position = (len(sorted_values) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def aggregate(values: List[float], agg: str) -> float:
+    if agg == "avg":
+        return sum(values) / len(values)
+    if agg == "min":
+        return min(values)
+    if agg == "max":
+        return max(values)
+    return percentile(sorted(values), 0.95)
+
+
+def aggregate_buckets(items: Iterable[AirQualityMeasurement], seconds: int, agg: str) -> List[AirQualityMeasurement]:
+    """Python counterpart of the repository GROUP BY (city, parameter, unit, time bucket)."""
+    groups = defaultdict(list)
+    for item in items:
+        groups[(item.city, item.parameter, item.unit, floor_timestamp(item.timestamp, seconds))].append(item.value)
+
+    return [
+        AirQualityMeasurement(id="", city=city, parameter=parameter, value=aggregate(values, agg), unit=unit, timestamp=ts)
+        for (city, parameter, unit, ts), values in groups.items()
+    ]
+
+
+def sort_items(items: List[AirQualityMeasurement], sort_by: Optional[List[str]]) -> List[AirQualityMeasurement]:
+    """Applies "field:asc|desc" directives the same way the SQL repository orders rows."""
+    directives = []
+    for sort_item in sort_by or []:
+        try:
+            field, direction = sort_item.split(":")
+        except ValueError:
+            continue
+        if field in AirQualityMeasurement.model_fields:
+            directives.append((field, direction.lower() != "asc"))
+
+    if not directives:
+        directives = [("timestamp", False)]
+
+    # stable sorts applied from the least significant directive
+    for field, descending in reversed(directives):
+        items.sort(key=lambda i: getattr(i, field), reverse=descending)
+    return items
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets, returns indexes of the points to keep.
+
+    Points must be sorted by x. First and last point are always kept.
+    """
+    n = len(points)
+    if threshold < 3:
+        raise ValueError("max_points must be at least 3")
+    if threshold >= n:
+        return list(range(n))
+
+    selected = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # average point of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(items: List[AirQualityMeasurement], max_points: int) -> List[AirQualityMeasurement]:
+    """Keeps at most max_points per (city, parameter) series, preserving the input order."""
+    series = defaultdict(list)
+    for position, item in enumerate(items):
+        series[(item.city, item.parameter)].append(position)
+
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+
+    keep = set()
+    for positions in series.values():
+        if len(positions) <= max_points:
+            keep.update(positions)
+            continue
+
+        positions.sort(key=lambda p: items[p].timestamp)
+        # naive timestamps are UTC, datetime.timestamp() would read them as server local time
+        points = [((naive_utc(items[p].timestamp) - _EPOCH).total_seconds(), items[p].value) for p in positions]
+        keep.update(positions[i] for i in lttb(points, max_points))
+
+    return [item for position, item in enumerate(items) if position in keep]
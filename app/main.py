@@ -1,22 +1,132 @@
+import time
+
+# before the other imports, their time is the first phase of the startup report
+STARTED = time.perf_counter()
+
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from app.adapters.openaq.openaq_client import OpenAQClient
 from app.adapters.restapi.air_quality_controller import router as air_router
-from app.domain.model.config import load_config
-from app.persistance.model.measurement_entity import init_db
+from app.adapters.restapi.dependecies import (
+    get_measurement_archive,
+    get_measurement_broadcaster,
+    open_async_measurement_repository,
+    open_measurement_repository,
+)
+from app.adapters.restapi.metrics_middleware import MetricsMiddleware
+from app.adapters.restapi.read_your_writes_middleware import ReadYourWritesMiddleware
+from app.domain.export_jobs import ExportManager
+from app.domain.ingestion_scheduler import IngestionScheduler
+from app.domain.live_measurements import LiveMeasurements
+from app.domain.maintenance_scheduler import MaintenanceScheduler
+from app.domain.metrics import LIVE_SUBSCRIBERS, REGISTRY
+from app.domain.model.config import get_config
+from app.domain.startup_timing import StartupTimer
+from app.persistance.maintenance import run_maintenance
+from app.persistance.model.measurement_entity import SessionLocal, dispose_engines, get_database, init_db
+from app.persistance.query_metrics import record_pool_usage
+from app.persistance.sensor_metadata_loader import get_sensor_registry
 
-config = load_config()
+startup = StartupTimer(STARTED)
+startup.lap("imports")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    if config.repository_type != "mock":
-        print("Checking/creating tables in database...")
-        init_db()
-        print("Tables ready")
+    startup.lap("server")
+
+    config = get_config()
+    startup.lap("config")
+
+    # fail fast on a broken sensor_metadata.yaml, later edits are picked up on the fly
+    sensors = get_sensor_registry()
+    print(f"Sensor metadata loaded: {', '.join(sensors.cities)}")
+    startup.lap("sensor_metadata")
+
+    if config.repository_type == "postgres":
+        # one query when the schema is current, the first connection is opened here
+        migrated = init_db()
+        print("Schema updated" if migrated else "Schema current")
+        startup.lap("schema")
+
+    # shared by the scheduler and the request handlers, so the rate limit is process-wide
+    openaq_client = OpenAQClient.from_config(config.openaq) if config.openaq else None
+    app.state.openaq_client = openaq_client
+
+    scheduler = None
+    if config.ingestion.enabled:
+        scheduler = IngestionScheduler(
+            repository_factory=open_async_measurement_repository,
+            interval_seconds=config.ingestion.interval_seconds,
+            client=openaq_client,
+        )
+        await scheduler.start()
+        print(f"Ingestion scheduler started, polling every {config.ingestion.interval_seconds}s")
+    app.state.ingestion_scheduler = scheduler
+
+    live_measurements = LiveMeasurements(
+        repository_factory=open_async_measurement_repository,
+        client=openaq_client,
+        fresh_seconds=config.live_measurements.fresh_seconds,
+        stale_seconds=config.live_measurements.stale_seconds,
+    )
+    app.state.live_measurements = live_measurements
+
+    # exports read through the sync repository in worker threads, like the NDJSON stream
+    export_manager = ExportManager(
+        repository_factory=open_measurement_repository,
+        root=config.export.path,
+        max_concurrent=config.export.max_concurrent,
+        chunk_rows=config.export.chunk_rows,
+        retention_hours=config.export.retention_hours,
+    )
+    app.state.export_manager = export_manager
+
+    maintenance = None
+    if config.maintenance.enabled and config.repository_type == "postgres":
+        def run_configured_maintenance(stop):
+            # rollups of archived months came from the segments, the table cannot refresh them
+            archive = get_measurement_archive()
+            return run_maintenance(
+                SessionLocal,
+                get_database().engine,
+                retention_days=config.maintenance.retention_days,
+                batch_size=config.maintenance.batch_size,
+                pause_seconds=config.maintenance.pause_seconds,
+                not_before=archive.horizon() if archive else None,
+                stop=stop,
+            )
+
+        maintenance = MaintenanceScheduler(
+            run=run_configured_maintenance,
+            interval_seconds=config.maintenance.interval_hours * 3600,
+        )
+        await maintenance.start()
+        print(f"Maintenance scheduler started, running every {config.maintenance.interval_hours}h")
+    app.state.maintenance_scheduler = maintenance
+    startup.lap("background_tasks")
+
+    startup.finish(config.startup.budget_seconds)
+    app.state.startup = startup
+
     yield
 
+    if scheduler is not None:
+        await scheduler.stop()
+        print("Ingestion scheduler stopped")
+    if maintenance is not None:
+        await maintenance.stop()
+        print("Maintenance scheduler stopped")
+
+    await live_measurements.close()
+    await export_manager.close()
+    if openaq_client is not None:
+        await openaq_client.aclose()
+    await dispose_engines()
+
 app = FastAPI(title="Air Quality Monitor", lifespan=lifespan)
-app.include_router(air_router, prefix="/api", tags=["Air Quality"])
+app.include_router(air_router, tags=["Air Quality"])
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -31,6 +141,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# both read the config on the first request and pass requests through when their feature is off
+app.add_middleware(ReadYourWritesMiddleware, read_only_paths=["/api/air/measurements/chart-data/batch"])
+
+# outermost, so the timings include the CORS handling
+app.add_middleware(MetricsMiddleware)
+
+startup.lap("app")
+
 @app.get("/")
 async def root():
-    return {"status": "ok", "message": "API is running"}
\ No newline at end of file
+    return {"status": "ok", "message": "API is running"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # gauges of shared state are read at scrape time instead of being updated on every change
+    if get_config().repository_type == "postgres":
+        database = get_database()
+        record_pool_usage(database.engine, "sync")
+        record_pool_usage(database.async_engine.sync_engine, "async")
+        for i, (replica, async_replica) in enumerate(zip(database.replica_engines, database.async_replica_engines)):
+            record_pool_usage(replica, f"sync_replica{i}")
+            record_pool_usage(async_replica.sync_engine, f"async_replica{i}")
+    LIVE_SUBSCRIBERS.set(value=len(get_measurement_broadcaster().subscriptions))
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
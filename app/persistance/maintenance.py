@@ -0,0 +1,225 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, inspect, literal_column, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.rollups import refresh_rollups
+
+UNIQUE_INDEX = "uq_measurements_city_parameter_timestamp"
+
+# retention_days key of the parameters without an entry of their own
+DEFAULT_RETENTION = "default"
+
+MAINTENANCE_TASKS = ("dedup", "retention", "reindex", "compact")
+
+
+@dataclass
+class MaintenanceReport:
+    duplicates_removed: int = 0
+    # rows deleted per parameter, DEFAULT_RETENTION for the parameters without their own retention
+    expired_removed: Dict[str, int] = field(default_factory=dict)
+    index: Optional[str] = None
+    compacted: List[str] = field(default_factory=list)
+    seconds: float = 0
+
+
+def _stopped(stop: Optional[threading.Event]) -> bool:
+    return stop is not None and stop.is_set()
+
+
+def _pause(seconds: float, stop: Optional[threading.Event]):
+    # a stop request cuts the pause short
+    if stop is not None:
+        stop.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def _insert_order(dialect: str):
+    # the table has no insert time, the storage order of the rows stands in for it
+    if dialect == "postgresql":
+        # the oldest inserting transaction first, then the row written first within it
+        return [func.age(literal_column("xmin")).desc(), literal_column("ctid")]
+    if dialect == "sqlite":
+        # a new rowid is always above every rowid of the rows already in the table
+        return [literal_column("rowid")]
+    raise ValueError(f"Merging duplicates is not supported for '{dialect}' databases")
+
+
+def merge_duplicates(
+        db: Session,
+        batch_size: int = 500,
+        pause_seconds: float = 0,
+        not_before: Optional[datetime] = None,
+        stop: Optional[threading.Event] = None,
+) -> int:
+    """Deletes all but the earliest-inserted row of every duplicated (city, parameter, timestamp).
+
+    Keeping the first row is what add_many and the archive do with a duplicate. The duplicated keys
+    are found with one scan of the table, then deleted `batch_size` keys per transaction, refreshing
+    the rollup buckets they counted. Duplicates inserted meanwhile are left for the next run. Returns
+    the number of rows deleted. Setting `stop` ends the run after the current transaction.
+    """
+    m = MeasurementEntity
+    key = tuple_(m.city, m.parameter, m.timestamp)
+    order = _insert_order(db.get_bind().dialect.name)
+
+    groups = db.execute(
+        select(m.city, m.parameter, m.timestamp)
+        .group_by(m.city, m.parameter, m.timestamp)
+        .having(func.count() > 1)
+        .order_by(m.city, m.parameter, m.timestamp)
+    ).all()
+    db.commit()
+
+    removed = 0
+    for i in range(0, len(groups), batch_size):
+        if _stopped(stop):
+            break
+        if i:
+            _pause(pause_seconds, stop)
+
+        batch = groups[i:i + batch_size]
+        rank = func.row_number().over(partition_by=(m.city, m.parameter, m.timestamp), order_by=order)
+        ranked = select(m.id, rank.label("rank")).where(key.in_([tuple(g) for g in batch])).subquery()
+        result = db.execute(delete(m).where(m.id.in_(select(ranked.c.id).where(ranked.c.rank > 1))))
+        removed += result.rowcount
+        refresh_rollups(db, [(g.city, g.parameter, g.timestamp) for g in batch], not_before)
+        db.commit()
+    return removed
+
+
+def _retention_cutoff(days: int, now: datetime) -> datetime:
+    # whole UTC days, a day is either complete or gone and its rollups stay consistent
+    cutoff = now.astimezone(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    return datetime.combine(cutoff.date(), datetime.min.time())
+
+
+def enforce_retention(
+        db: Session,
+        retention_days: Dict[str, int],
+        batch_size: int = 5000,
+        pause_seconds: float = 0,
+        now: Optional[datetime] = None,
+        stop: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """Deletes raw measurements older than their parameter's retention, `batch_size` rows per transaction.
+
+    Deletes series by series, each batch is a range scan on the (city, parameter, timestamp) index.
+    The rollups are left alone, hourly and daily aggregates outlive the raw rows they came from.
+    Setting `stop` ends the run after the current transaction.
+    """
+    now = now or datetime.now(timezone.utc)
+    m = MeasurementEntity
+    series = db.execute(select(m.city, m.parameter).distinct().order_by(m.city, m.parameter)).all()
+    db.commit()
+
+    removed: Dict[str, int] = {}
+    for city, parameter in series:
+        retention = parameter if parameter in retention_days else DEFAULT_RETENTION
+        days = retention_days.get(retention)
+        if days is None:
+            continue
+
+        ids = (
+            select(m.id)
+            .where(m.city == city, m.parameter == parameter, m.timestamp < _retention_cutoff(days, now))
+            .limit(batch_size)
+        )
+        removed.setdefault(retention, 0)
+        while not _stopped(stop):
+            deleted = db.execute(delete(m).where(m.id.in_(ids))).rowcount
+            db.commit()
+            removed[retention] += deleted
+            if deleted < batch_size:
+                break
+            _pause(pause_seconds, stop)
+    return removed
+
+
+def rebuild_measurement_index(engine: Engine) -> str:
+    """Creates the unique (city, parameter, timestamp) index if it is missing, rebuilds it otherwise.
+
+    On Postgres both run CONCURRENTLY, writes continue while the index is built.
+    """
+    index = next(i for i in MeasurementEntity.__table__.indexes if i.name == UNIQUE_INDEX)
+    postgres = engine.dialect.name == "postgresql"
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        existing = {i["name"] for i in inspect(conn).get_indexes(MeasurementEntity.__tablename__)}
+        try:
+            if UNIQUE_INDEX in existing:
+                conn.exec_driver_sql(f"REINDEX INDEX CONCURRENTLY {UNIQUE_INDEX}" if postgres else f"REINDEX {UNIQUE_INDEX}")
+                return "rebuilt"
+            if postgres:
+                conn.exec_driver_sql(
+                    f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {UNIQUE_INDEX} "
+                    f"ON {MeasurementEntity.__tablename__} (city, parameter, timestamp)"
+                )
+            else:
+                index.create(bind=conn)
+            return "created"
+        except IntegrityError as e:
+            # rows written between the duplicate cleanup and the build, the next run catches up
+            print(f"Index {UNIQUE_INDEX} not built, table contains duplicates: {e.orig}")
+            return "failed"
+
+
+def compact_tables(engine: Engine) -> List[str]:
+    """Returns the space of deleted rows to the database and refreshes planner statistics.
+
+    Postgres gets a plain VACUUM (ANALYZE), which runs alongside reads and writes. SQLite only
+    runs PRAGMA optimize, its VACUUM would lock the whole database.
+    """
+    tables = [MeasurementEntity.__tablename__, "measurement_rollups_hourly", "measurement_rollups_daily"]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            for table in tables:
+                conn.exec_driver_sql(f"VACUUM (ANALYZE) {table}")
+            return tables
+        conn.exec_driver_sql("PRAGMA optimize")
+        return ["optimize"]
+
+
+def run_maintenance(
+        session_factory: Callable[[], Session],
+        engine: Engine,
+        retention_days: Dict[str, int],
+        batch_size: int = 1000,
+        pause_seconds: float = 0,
+        tasks=MAINTENANCE_TASKS,
+        not_before: Optional[datetime] = None,
+        stop: Optional[threading.Event] = None,
+) -> MaintenanceReport:
+    """Runs the selected maintenance tasks in order: dedup, retention, reindex, compact.
+
+    Setting `stop` skips what has not started yet, a running task ends after its current transaction.
+    """
+    started = time.perf_counter()
+    report = MaintenanceReport()
+
+    db = session_factory()
+    try:
+        if "dedup" in tasks:
+            report.duplicates_removed = merge_duplicates(db, batch_size, pause_seconds, not_before, stop)
+        if "retention" in tasks and retention_days and not _stopped(stop):
+            report.expired_removed = enforce_retention(db, retention_days, batch_size, pause_seconds, stop=stop)
+    finally:
+        db.close()
+
+    # after the cleanup, so the unique index can be built
+    if "reindex" in tasks and not _stopped(stop):
+        report.index = rebuild_measurement_index(engine)
+    if "compact" in tasks and not _stopped(stop):
+        report.compacted = compact_tables(engine)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
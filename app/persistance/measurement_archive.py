@@ -0,0 +1,294 @@
+import heapq
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from itertools import chain, groupby
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.domain.chart_payload import ChartRow
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.rollups import replace_rollups
+
+SEGMENT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("value", pa.float64()),
+    ("unit", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+])
+
+SEGMENT_SUFFIX = ".parquet"
+
+# Rows decoded per step when reading a segment, bounds memory for any date range
+READ_BATCH_SIZE = 1024
+
+# Rows per Parquet row group, reads skip the groups outside their range by the timestamp statistics
+ROW_GROUP_SIZE = 8192
+
+# first instant that is not archived, every month before it is served from segments
+HORIZON_FILE = "HORIZON"
+
+
+def month_start(day: date) -> datetime:
+    return datetime(day.year, day.month, 1)
+
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_before(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 - count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+class MeasurementArchive:
+    """Closed months of measurements, one zstd-compressed Parquet segment per city, parameter and month.
+
+    Layout: <root>/<city>/<parameter>/<YYYY-MM>.parquet. Segments are replaced atomically and read
+    through memory maps, only the requested columns and row groups are decoded.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._horizon: Optional[datetime] = None
+        self._horizon_mtime: Optional[float] = None
+
+    def segment_path(self, city: str, parameter: str, month: datetime) -> Path:
+        return self.root / quote(city, safe="") / quote(parameter, safe="") / f"{month:%Y-%m}{SEGMENT_SUFFIX}"
+
+    def horizon(self) -> Optional[datetime]:
+        """Start of the first month not archived, None while the archive is empty.
+
+        Re-read when the job of another process moved it.
+        """
+        path = self.root / HORIZON_FILE
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime != self._horizon_mtime:
+            self._horizon = datetime.fromisoformat(path.read_text(encoding="utf-8").strip())
+            self._horizon_mtime = mtime
+        return self._horizon
+
+    def advance_horizon(self, horizon: datetime):
+        current = self.horizon()
+        if current is not None and current >= horizon:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f"{HORIZON_FILE}.tmp"
+        tmp_path.write_text(horizon.isoformat(), encoding="utf-8")
+        os.replace(tmp_path, self.root / HORIZON_FILE)
+
+    def covers(self, start_date: Optional[datetime]) -> bool:
+        """False when a range starting at `start_date` cannot contain archived rows."""
+        horizon = self.horizon()
+        return horizon is not None and (start_date is None or start_date < horizon)
+
+    def _segments(
+            self,
+            city: Optional[str],
+            parameters: Optional[List[str]],
+            start: Optional[datetime],
+            end: Optional[datetime],
+    ) -> Iterator[Tuple[str, str, Path]]:
+        # segments from the horizon on belong to a running archive job, the table still serves them
+        first = f"{start:%Y-%m}" if start else ""
+        last = min(f"{end:%Y-%m}" if end else "9999-99", f"{months_before(self.horizon(), 1):%Y-%m}")
+
+        city_dirs = [self.root / quote(city, safe="")] if city else [p for p in self.root.iterdir() if p.is_dir()]
+        for city_dir in city_dirs:
+            if not city_dir.is_dir():
+                continue
+            if parameters:
+                parameter_dirs = [city_dir / quote(p, safe="") for p in parameters]
+            else:
+                parameter_dirs = [p for p in city_dir.iterdir() if p.is_dir()]
+            for parameter_dir in parameter_dirs:
+                if not parameter_dir.is_dir():
+                    continue
+                for entry in sorted(os.scandir(parameter_dir), key=lambda e: e.name):
+                    month = entry.name[:-len(SEGMENT_SUFFIX)]
+                    if entry.name.endswith(SEGMENT_SUFFIX) and first <= month <= last:
+                        yield unquote(city_dir.name), unquote(parameter_dir.name), Path(entry.path)
+
+    def read_segment(self, path: Path, start: Optional[datetime] = None, end: Optional[datetime] = None) -> pa.Table:
+        filters = []
+        if start is not None:
+            filters.append(("timestamp", ">=", start))
+        if end is not None:
+            filters.append(("timestamp", "<=", end))
+        return pq.read_table(path, memory_map=True, filters=filters or None, schema=SEGMENT_SCHEMA)
+
+    def iter_rows(
+            self,
+            city: Optional[str] = None,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+            after: Optional[Tuple[datetime, str]] = None,
+    ) -> Iterator[ChartRow]:
+        """Archived rows in [start, end] in (timestamp, id) order, only those past `after` when given.
+
+        Segments are decoded READ_BATCH_SIZE rows at a time and merged lazily, a caller that stops
+        early never reads the rest. Every archived row is older than the horizon, so they all precede
+        the rows of the table.
+        """
+        if after is not None and (start is None or after[0] > start):
+            start = after[0]
+        if not self.covers(start):
+            return iter(())
+
+        # months never overlap, only the segments of one month are merged and open at a time
+        segments = sorted(self._segments(city, parameters, start, end), key=lambda segment: segment[2].name)
+        return chain.from_iterable(
+            heapq.merge(
+                *(self._iter_segment(*segment, start, end, after) for segment in month),
+                key=lambda row: (row.timestamp, row.id),
+            )
+            for _, month in groupby(segments, key=lambda segment: segment[2].name)
+        )
+
+    def _iter_segment(
+            self,
+            city: str,
+            parameter: str,
+            path: Path,
+            start: Optional[datetime],
+            end: Optional[datetime],
+            after: Optional[Tuple[datetime, str]],
+    ) -> Iterator[ChartRow]:
+        # segments are written in timestamp order, one row per timestamp
+        parquet = pq.ParquetFile(path, memory_map=True)
+        column = parquet.schema_arrow.get_field_index("timestamp")
+        row_groups = []
+        for i in range(parquet.num_row_groups):
+            stats = parquet.metadata.row_group(i).column(column).statistics
+            if stats is not None and stats.has_min_max and (
+                    (start is not None and stats.max < start) or (end is not None and stats.min > end)):
+                continue
+            row_groups.append(i)
+
+        batches = parquet.iter_batches(
+            batch_size=READ_BATCH_SIZE, row_groups=row_groups, columns=["id", "value", "unit", "timestamp"],
+        )
+        for batch in batches:
+            columns = [batch.column(name).to_pylist() for name in ("id", "value", "unit", "timestamp")]
+            for measurement_id, value, unit, timestamp in zip(*columns):
+                if end is not None and timestamp > end:
+                    return
+                if start is not None and timestamp < start:
+                    continue
+                if after is not None and (timestamp, measurement_id) <= after:
+                    continue
+                yield ChartRow(measurement_id, city, parameter, value, unit, timestamp)
+
+    def write_segment(self, city: str, parameter: str, month: datetime, table: pa.Table):
+        path = self.segment_path(city, parameter, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp_path, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+
+
+@dataclass
+class ArchiveReport:
+    months: int = 0
+    segments: int = 0
+    rows: int = 0
+
+
+def archive_closed_months(
+        db: Session,
+        archive: MeasurementArchive,
+        keep_months: int = 3,
+        batch_size: int = 5000,
+        today: Optional[date] = None,
+) -> ArchiveReport:
+    """Moves the months older than the last `keep_months` (current one included) into segments.
+
+    Per (city, parameter, month): rows are merged into the existing segment (late arrivals of an
+    archived month included, duplicates of a timestamp keep the archived row), the rollups of the
+    month are recomputed from the segment, the horizon is advanced, and only then the rows are
+    deleted, `batch_size` per transaction. A crash at any point leaves every row readable, running
+    the job again finishes the work.
+    """
+    cutoff = months_before(month_start(today or date.today()), keep_months - 1)
+    report = ArchiveReport()
+
+    first = db.execute(select(func.min(MeasurementEntity.timestamp))).scalar()
+    if first is None:
+        return report
+
+    month = month_start(first)
+    while month < cutoff:
+        end = next_month(month)
+        in_month = [MeasurementEntity.timestamp >= month, MeasurementEntity.timestamp < end]
+        groups = db.execute(
+            select(MeasurementEntity.city, MeasurementEntity.parameter).where(*in_month).distinct()
+        ).all()
+
+        archived_ids: List[str] = []
+        for city, parameter in groups:
+            stmt = (
+                select(MeasurementEntity.id, MeasurementEntity.value, MeasurementEntity.unit, MeasurementEntity.timestamp)
+                .where(*in_month, MeasurementEntity.city == city, MeasurementEntity.parameter == parameter)
+                .order_by(MeasurementEntity.timestamp)
+            )
+            hot = db.execute(stmt).all()
+            table = _merge(archive, city, parameter, month, hot)
+            archive.write_segment(city, parameter, month, table)
+
+            replace_rollups(
+                db, city, parameter, month, end,
+                table.column("unit").to_pylist(),
+                table.column("timestamp").to_pylist(),
+                table.column("value").to_pylist(),
+            )
+            db.commit()
+
+            archived_ids.extend(row.id for row in hot)
+            report.segments += 1
+
+        # readers skip the table for this month from now on, so the rows can go
+        archive.advance_horizon(end)
+        for i in range(0, len(archived_ids), batch_size):
+            db.execute(delete(MeasurementEntity).where(MeasurementEntity.id.in_(archived_ids[i:i + batch_size])))
+            db.commit()
+
+        if groups:
+            report.months += 1
+            report.rows += len(archived_ids)
+            print(f"Archived {month:%Y-%m}: {len(groups)} segments, {len(archived_ids)} rows")
+        month = end
+
+    archive.advance_horizon(cutoff)
+    return report
+
+
+def _merge(archive: MeasurementArchive, city: str, parameter: str, month: datetime, hot) -> pa.Table:
+    by_timestamp = {}
+    path = archive.segment_path(city, parameter, month)
+    if path.exists():
+        existing = archive.read_segment(path).to_pylist()
+        by_timestamp = {row["timestamp"]: row for row in existing}
+
+    for row in hot:
+        by_timestamp.setdefault(row.timestamp, {"id": row.id, "value": row.value, "unit": row.unit, "timestamp": row.timestamp})
+
+    rows = [by_timestamp[ts] for ts in sorted(by_timestamp)]
+    return pa.Table.from_pylist(rows, schema=SEGMENT_SCHEMA)
+
+
+def day_bounds(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """The whole-day range the SQL repository filters on."""
+    start = datetime.combine(start_date.date(), time.min) if start_date else None
+    end = datetime.combine(end_date.date(), time.max) if end_date else None
+    return start, end
@@ -1,23 +1,143 @@
 import os
 import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import Column, create_engine, Integer, String, Float, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import Column, create_engine, Integer, String, Float, DateTime, Index, func, insert, select
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+from app.domain.model.config import get_config
+from app.persistance.query_metrics import instrument_engine
+from app.persistance.read_routing import ReplicaSet, RoutingSession
 
 load_dotenv()
 Base = declarative_base()
 
-def get_engine():
-    db_url = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def get_database_url() -> str:
+    return os.getenv("DATABASE_URL", "sqlite:///./app.db")
+
+def to_async_url(db_url: str) -> URL:
+    url = make_url(db_url)
+    url = url.set(drivername=_ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+    # asyncpg takes "ssl" where libpq takes "sslmode"
+    sslmode = url.query.get("sslmode")
+    if url.drivername == "postgresql+asyncpg" and sslmode:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    return url
+
+def _pool_options(db_url: str) -> dict:
+    pool = get_config().database
+    options = {"pool_recycle": pool.pool_recycle, "pool_pre_ping": pool.pool_pre_ping}
+    if "sqlite" not in db_url:
+        options.update(
+            pool_size=pool.pool_size,
+            max_overflow=pool.max_overflow,
+            pool_timeout=pool.pool_timeout,
+        )
+    return options
+
+def get_engine(db_url: Optional[str] = None):
+    db_url = db_url or get_database_url()
     connect_args = {"check_same_thread": False} if "sqlite" in db_url else {}
-    return create_engine(db_url, connect_args=connect_args)
+    return create_engine(db_url, connect_args=connect_args, **_pool_options(db_url))
+
+def get_async_engine(db_url: Optional[str] = None):
+    db_url = db_url or get_database_url()
+    return create_async_engine(to_async_url(db_url), **_pool_options(db_url))
+
+@dataclass
+class Database:
+    engine: Engine
+    async_engine: AsyncEngine
+    replica_engines: List[Engine]
+    async_replica_engines: List[AsyncEngine]
+    session_factory: sessionmaker
+    async_session_factory: async_sessionmaker
+
+@lru_cache(maxsize=1)
+def get_database() -> Database:
+    """Engines and session factories of the process, created on first use.
+
+    Creating them imports the drivers but opens no connection, an unreachable database only
+    fails the first query.
+    """
+    config = get_config()
+    engine = get_engine()
+    async_engine = get_async_engine()
+
+    replica_urls = config.database.replica_urls
+    replica_engines = [get_engine(url) for url in replica_urls]
+    async_replica_engines = [get_async_engine(url) for url in replica_urls]
+
+    # without replica_urls both sessions behave like plain sessions on the primary
+    check_seconds = config.database.replica_check_seconds
+    replicas = ReplicaSet(replica_engines, check_seconds) if replica_engines else None
+    async_replicas = ReplicaSet([e.sync_engine for e in async_replica_engines], check_seconds) if replica_engines else None
 
-engine = get_engine()
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    if config.metrics.enabled:
+        instrument_engine(engine, "sync")
+        instrument_engine(async_engine.sync_engine, "async")
+        for i, (replica, async_replica) in enumerate(zip(replica_engines, async_replica_engines)):
+            instrument_engine(replica, f"sync_replica{i}")
+            instrument_engine(async_replica.sync_engine, f"async_replica{i}")
+
+    return Database(
+        engine=engine,
+        async_engine=async_engine,
+        replica_engines=replica_engines,
+        async_replica_engines=async_replica_engines,
+        session_factory=sessionmaker(
+            bind=engine, class_=RoutingSession, replicas=replicas, autoflush=False, autocommit=False
+        ),
+        async_session_factory=async_sessionmaker(
+            bind=async_engine,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=async_replicas,
+            autoflush=False,
+            expire_on_commit=False,
+        ),
+    )
+
+# called like the sessionmakers they stand in for, the engines are created by the first session
+def SessionLocal() -> Session:
+    return get_database().session_factory()
+
+def AsyncSessionLocal() -> AsyncSession:
+    return get_database().async_session_factory()
+
+async def dispose_engines():
+    # a process that never opened a session has nothing to close
+    if get_database.cache_info().currsize == 0:
+        return
+    database = get_database()
+    await database.async_engine.dispose()
+    for replica in database.async_replica_engines:
+        await replica.dispose()
+    # the sync engines serve the thread-pool repository and the background jobs
+    database.engine.dispose()
+    for replica in database.replica_engines:
+        replica.dispose()
 
 class MeasurementEntity(Base):
     __tablename__ = "measurements"
+    __table_args__ = (
+        Index("uq_measurements_city_parameter_timestamp", "city", "parameter", "timestamp", unique=True),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     city = Column(String, index=True)
@@ -26,5 +146,55 @@ class MeasurementEntity(Base):
     unit = Column(String)
     timestamp = Column(DateTime)
 
-def init_db():
+# bump when a table or index is added, init_db() then creates what is missing on the next start
+SCHEMA_VERSION = 1
+
+def get_schema_version(bind) -> int:
+    """Version recorded by the last complete init_db(), 0 for a database that predates the versioning."""
+    from app.persistance.model.schema_version_entity import SchemaVersionEntity
+
+    try:
+        with bind.connect() as conn:
+            return conn.execute(select(func.max(SchemaVersionEntity.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # no schema_versions table yet
+        return 0
+
+def init_db() -> bool:
+    """Creates missing tables and indexes unless the database is at SCHEMA_VERSION already.
+
+    Returns whether the schema had to be checked, a current database only costs one query.
+    """
+    # registers the rollup tables on Base.metadata
+    import app.persistance.model.measurement_rollup_entity  # noqa: F401
+    from app.persistance.model.schema_version_entity import SchemaVersionEntity
+
+    engine = get_database().engine
+    if get_schema_version(engine) >= SCHEMA_VERSION:
+        return False
+
     Base.metadata.create_all(bind=engine)
+
+    # create_all() skips indexes of tables that already exist
+    complete = True
+    for index in MeasurementEntity.__table__.indexes:
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except IntegrityError as e:
+            complete = False
+            print(f"Index {index.name} not created, table contains duplicates: {e.orig}")
+
+    # without the index the next start checks again, `python -m app.cli maintenance` removes the duplicates
+    if complete:
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    insert(SchemaVersionEntity).values(
+                        version=SCHEMA_VERSION,
+                        applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                    )
+                )
+        except IntegrityError:
+            # recorded by another worker starting at the same time
+            pass
+    return True
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Float, DateTime, Integer
+
+from app.persistance.model.measurement_entity import Base
+
+
+class HourlyRollupEntity(Base):
+    __tablename__ = "measurement_rollups_hourly"
+
+    city = Column(String, primary_key=True)
+    parameter = Column(String, primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    unit = Column(String)
+    count = Column(Integer)
+    sum = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+
+
+class DailyRollupEntity(Base):
+    __tablename__ = "measurement_rollups_daily"
+
+    city = Column(String, primary_key=True)
+    parameter = Column(String, primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    unit = Column(String)
+    count = Column(Integer)
+    sum = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
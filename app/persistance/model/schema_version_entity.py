@@ -0,0 +1,10 @@
+from sqlalchemy import Column, DateTime, Integer
+
+from app.persistance.model.measurement_entity import Base
+
+
+class SchemaVersionEntity(Base):
+    __tablename__ = "schema_versions"
+
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime)
@@ -0,0 +1,67 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.domain.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_SECONDS, DB_QUERIES, DB_QUERY_SECONDS
+
+
+class QueryStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# set per HTTP request by the metrics middleware, visible in the threadpool and the async driver's greenlets
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Records statement count and duration, per engine and per request, and pool checkout waits.
+
+    For an AsyncEngine pass its sync_engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.inc(name)
+        DB_QUERY_SECONDS.observe(name, value=seconds)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += seconds
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("query_started")
+            if started:
+                started.pop()
+
+    # the pool has no event before a checkout, so its connect() is timed directly
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(name, value=time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def record_pool_usage(engine: Engine, name: str):
+    checked_out = getattr(engine.pool, "checkedout", None)
+    if checked_out is not None:
+        DB_POOL_CHECKED_OUT.set(name, value=checked_out())
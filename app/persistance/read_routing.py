@@ -0,0 +1,116 @@
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# set by the read-your-writes middleware for clients that wrote recently, their reads stay on the primary
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+_REPLICA_READS = "replica_reads"
+
+
+class Replica:
+    __slots__ = ("engine", "healthy", "checked_at")
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = float("-inf")
+
+
+class ReplicaSet:
+    """Read replicas handed out round-robin, skipping those that failed their last health check.
+
+    Replicas are checked with a SELECT 1 when picked and their last check is older than
+    `check_interval` seconds, and marked down as soon as a query loses its connection.
+    For an AsyncEngine pass its sync_engine, the check then runs on the async driver.
+    """
+
+    def __init__(self, engines: List[Engine], check_interval: float = 10):
+        self.replicas = [Replica(e) for e in engines]
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+
+        for replica in self.replicas:
+            self._watch(replica)
+
+    def _watch(self, replica: Replica):
+        @event.listens_for(replica.engine, "handle_error")
+        def handle_error(context):
+            if context.is_disconnect:
+                self._set_health(replica, False, context.original_exception)
+
+    def _set_health(self, replica: Replica, healthy: bool, error: Optional[Exception] = None):
+        if replica.healthy != healthy:
+            url = replica.engine.url.render_as_string(hide_password=True)
+            print(f"Replica {url} is back" if healthy else f"Replica {url} is down: {error}")
+        replica.healthy = healthy
+        replica.checked_at = time.monotonic()
+
+    def _check(self, replica: Replica) -> bool:
+        if time.monotonic() - replica.checked_at >= self.check_interval:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+                self._set_health(replica, True)
+            except Exception as e:
+                self._set_health(replica, False, e)
+        return replica.healthy
+
+    def pick(self) -> Optional[Engine]:
+        """Next healthy replica, None when all of them are down."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._turn) % len(self.replicas)]
+            if self._check(replica):
+                return replica.engine
+        return None
+
+
+class RoutingSession(Session):
+    """Session that runs the statements of `replica_reads` blocks on a replica, everything else on the primary.
+
+    Flushes always go to the primary, as do the reads of clients inside their read-your-writes window.
+    Used as the sync_session_class of AsyncSession as well.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replicas is not None
+            and self.info.get(_REPLICA_READS)
+            and not self._flushing
+            and not read_from_primary.get()
+        ):
+            engine = self.replicas.pick()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@contextmanager
+def primary_reads():
+    """Keeps the reads of the block on the primary, for results that are cached for every client."""
+    token = read_from_primary.set(True)
+    try:
+        yield
+    finally:
+        read_from_primary.reset(token)
+
+
+@contextmanager
+def replica_reads(db: Session):
+    """Lets the queries of the block run on a replica, a no-op for sessions without replicas."""
+    previous = db.info.get(_REPLICA_READS, False)
+    db.info[_REPLICA_READS] = True
+    try:
+        yield
+    finally:
+        db.info[_REPLICA_READS] = previous
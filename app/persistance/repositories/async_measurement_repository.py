@@ -0,0 +1,118 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.domain.chart_payload import ChartPayload
+from app.domain.measurement_broadcaster import MeasurementBroadcaster
+from app.domain.model.air_quality import AirQualityMeasurement
+from app.domain.time_series import SeriesColumns
+from app.persistance.measurement_archive import MeasurementArchive
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.measurement_repository import MeasurementRepository
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+
+
+class AsyncMeasurementRepository(ABC):
+    """Awaitable facade over a MeasurementRepository, used by the async routes and services.
+
+    Subclasses only decide how a call of the synchronous repository is executed.
+    """
+
+    @abstractmethod
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        pass
+
+    async def get_chart_data(self, **filters) -> List[AirQualityMeasurement]:
+        return await self._call("get_chart_data", **filters)
+
+    async def get_chart_payload(self, fmt: str = "rows", **filters) -> ChartPayload:
+        return await self._call("get_chart_payload", fmt, **filters)
+
+    async def get_chart_payloads(self, specs: List[dict], fmt: str = "rows") -> List[ChartPayload]:
+        return await self._call("get_chart_payloads", specs, fmt)
+
+    async def get_chart_page(self, **filters) -> Tuple[List[AirQualityMeasurement], Optional[str]]:
+        return await self._call("get_chart_page", **filters)
+
+    async def get_series(self, city: str, **filters) -> Dict[str, SeriesColumns]:
+        return await self._call("get_series", city, **filters)
+
+    async def get_latest(self, city: str) -> List[MeasurementEntity]:
+        return await self._call("get_latest", city)
+
+    async def get_by_id(self, measurement_id: str) -> Optional[MeasurementEntity]:
+        return await self._call("get_by_id", measurement_id)
+
+    async def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
+        return await self._call("add", measurement)
+
+    async def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        return await self._call("add_many", measurements)
+
+    async def measurement_exists(self, city: str, parameter: str, timestamp: datetime) -> bool:
+        return await self._call("measurement_exists", city, parameter, timestamp)
+
+    async def update(self, measurement_id: str, updated_data: MeasurementEntity) -> Optional[MeasurementEntity]:
+        return await self._call("update", measurement_id, updated_data)
+
+    async def delete(self, measurement_id: str) -> bool:
+        return await self._call("delete", measurement_id)
+
+
+class AsyncSQLMeasurementRepository(AsyncMeasurementRepository):
+    """Runs SQLMeasurementRepository on an AsyncSession.
+
+    AsyncSession.run_sync executes the repository in a greenlet on the async driver
+    (asyncpg, aiosqlite), so waiting on the database never holds a threadpool thread.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        wrap: Callable[[MeasurementRepository], MeasurementRepository] = lambda repo: repo,
+        archive: Optional[MeasurementArchive] = None,
+    ):
+        self.session = session
+        self.wrap = wrap
+        self.archive = archive
+
+    async def _call(self, method: str, *args, **kwargs):
+        def run(db: Session):
+            return getattr(self.wrap(SQLMeasurementRepository(db, self.archive)), method)(*args, **kwargs)
+
+        return await self.session.run_sync(run)
+
+
+class InlineAsyncMeasurementRepository(AsyncMeasurementRepository):
+    """For repositories without I/O (in-memory), calls them directly on the event loop."""
+
+    def __init__(self, repo: MeasurementRepository):
+        self.repo = repo
+
+    async def _call(self, method: str, *args, **kwargs):
+        return getattr(self.repo, method)(*args, **kwargs)
+
+
+class PublishingAsyncMeasurementRepository(AsyncMeasurementRepository):
+    """Pushes every measurement `inner` stores to the live subscribers once the write is committed."""
+
+    def __init__(self, inner: AsyncMeasurementRepository, broadcaster: MeasurementBroadcaster):
+        self.inner = inner
+        self.broadcaster = broadcaster
+
+    async def _call(self, method: str, *args, **kwargs):
+        return await self.inner._call(method, *args, **kwargs)
+
+    async def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
+        saved = await self.inner.add(measurement)
+        self.broadcaster.publish([saved])
+        return saved
+
+    async def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        # only the rows actually inserted, duplicates were already pushed when first stored
+        saved = await self.inner.add_many(measurements)
+        self.broadcaster.publish(saved)
+        return saved
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import List, Optional
+
+from app.domain.chart_data_cache import ChartDataCache, chart_data_key
+from app.domain.chart_payload import ChartPayload
+from app.domain.model.air_quality import AirQualityMeasurement
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.read_routing import primary_reads, read_from_primary
+from app.persistance.repositories.measurement_repository import MeasurementRepository
+
+
+class CachingMeasurementRepository(MeasurementRepository):
+    """Serves encoded chart-data payloads from a shared cache and invalidates it on every write."""
+
+    def __init__(self, inner: MeasurementRepository, cache: ChartDataCache):
+        self.inner = inner
+        self.cache = cache
+
+    def get_chart_data(self, **filters) -> List[AirQualityMeasurement]:
+        return self.inner.get_chart_data(**filters)
+
+    def get_chart_rows(self, **filters):
+        return self.inner.get_chart_rows(**filters)
+
+    def get_chart_payload(self, fmt: str = "rows", **filters) -> ChartPayload:
+        if read_from_primary.get():
+            # the client wrote recently, maybe through another process whose writes this cache never saw
+            return self.inner.get_chart_payload(fmt, **filters)
+
+        # the encoded bytes are cached, a hit costs no database round trip and no serialization
+        key, scope = chart_data_key(**filters)
+        return self.cache.get_or_load((fmt, key), scope, lambda: self._load_payload(fmt, filters))
+
+    def _load_payload(self, fmt: str, filters: dict) -> ChartPayload:
+        # a lagging replica's result would be served to every client, writers included, until the next write
+        with primary_reads():
+            return self.inner.get_chart_payload(fmt, **filters)
+
+    def get_chart_rows_many(self, specs: List[dict]):
+        return self.inner.get_chart_rows_many(specs)
+
+    def get_chart_payloads(self, specs: List[dict], fmt: str = "rows") -> List[ChartPayload]:
+        if read_from_primary.get():
+            return self.inner.get_chart_payloads(specs, fmt)
+
+        # same entries as get_chart_payload(), only the misses go to the inner repository, in one call
+        keys = [chart_data_key(**filters) for filters in specs]
+        payloads: List[Optional[ChartPayload]] = []
+        generations = []
+        for key, _ in keys:
+            payload, generation = self.cache.lookup((fmt, key))
+            payloads.append(payload)
+            generations.append(generation)
+
+        missing = [i for i, payload in enumerate(payloads) if payload is None]
+        if missing:
+            with primary_reads():
+                loaded = self.inner.get_chart_payloads([specs[i] for i in missing], fmt)
+            for i, payload in zip(missing, loaded):
+                key, scope = keys[i]
+                self.cache.store((fmt, key), scope, payload, generations[i])
+                payloads[i] = payload
+        return payloads
+
+    def get_chart_page(self, **filters):
+        return self.inner.get_chart_page(**filters)
+
+    def iter_chart_data(self, **filters):
+        return self.inner.iter_chart_data(**filters)
+
+    def get_series(self, city: str, **filters):
+        return self.inner.get_series(city, **filters)
+
+    def get_latest(self, city: str) -> List[MeasurementEntity]:
+        return self.inner.get_latest(city)
+
+    def get_by_id(self, measurement_id: str) -> Optional[MeasurementEntity]:
+        return self.inner.get_by_id(measurement_id)
+
+    def measurement_exists(self, city: str, parameter: str, timestamp: datetime) -> bool:
+        return self.inner.measurement_exists(city, parameter, timestamp)
+
+    def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
+        saved = self.inner.add(measurement)
+        self._invalidate(saved)
+        return saved
+
+    def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        saved = self.inner.add_many(measurements)
+        # one invalidation per touched (city, parameter, day) is enough
+        touched = {(m.city, m.parameter, m.timestamp.date()): m for m in saved}
+        for m in touched.values():
+            self._invalidate(m)
+        return saved
+
+    def update(self, measurement_id: str, updated_data: MeasurementEntity) -> Optional[MeasurementEntity]:
+        previous = self.inner.get_by_id(measurement_id)
+        saved = self.inner.update(measurement_id, updated_data)
+        if saved is not None:
+            self._invalidate(previous)
+            self._invalidate(saved)
+        return saved
+
+    def delete(self, measurement_id: str) -> bool:
+        previous = self.inner.get_by_id(measurement_id)
+        deleted = self.inner.delete(measurement_id)
+        if deleted and previous is not None:
+            self._invalidate(previous)
+        return deleted
+
+    def _invalidate(self, measurement: MeasurementEntity):
+        self.cache.invalidate(measurement.city, measurement.parameter, measurement.timestamp)
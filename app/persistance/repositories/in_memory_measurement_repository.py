@@ -0,0 +1,245 @@
+import heapq
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.domain.chart_payload import ChartRow, to_row
+from app.domain.mapper import to_air_quality, to_entity
+from app.domain.model.air_quality import AirQualityMeasurement
+from app.domain.pagination import decode_cursor, encode_cursor
+from app.domain.time_series import (
+    SeriesColumns,
+    aggregate_buckets,
+    bucket_seconds,
+    downsample,
+    naive_utc,
+    sort_items,
+    validate_aggregation,
+)
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.measurement_repository import DuplicateMeasurement, MeasurementRepository
+
+SeriesKey = Tuple[str, str]
+MeasurementKey = Tuple[str, str, datetime]
+
+
+def _as_naive_utc(ts) -> datetime:
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return naive_utc(ts)
+
+
+class InMemoryMeasurementRepository(MeasurementRepository):
+    """Process-local repository keeping one (timestamp, id) sorted array per (city, parameter).
+
+    Timestamps are stored as naive UTC, like the SQL tables. All access goes through one lock,
+    readers copy the slices they need so iteration never races with writers.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, AirQualityMeasurement] = {}
+        self._keys: Set[MeasurementKey] = set()
+        self._series: Dict[SeriesKey, List[Tuple[datetime, str]]] = {}
+        self._lock = threading.RLock()
+
+    def get_chart_data(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+            sort_by: Optional[List[str]] = None,
+            bucket: Optional[str] = None,
+            agg: str = "avg",
+            max_points: Optional[int] = None,
+    ):
+        if bucket:
+            seconds, agg = bucket_seconds(bucket), validate_aggregation(agg)
+
+        with self._lock:
+            items = [self._by_id[i] for _, i in self._range(city, start_date, end_date, parameters)]
+
+        if bucket:
+            items = aggregate_buckets(items, seconds, agg)
+
+        items = sort_items(items, sort_by)
+        if max_points:
+            items = downsample(items, max_points)
+        return items
+
+    def get_chart_page(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+            limit: int = 1000,
+            cursor: Optional[str] = None,
+    ):
+        after = None
+        if cursor:
+            after_ts, after_id = decode_cursor(cursor)
+            after = (naive_utc(after_ts), after_id)
+
+        with self._lock:
+            keys = heapq.merge(*self._slices(city, start_date, end_date, parameters, after=after))
+            page = []
+            for key in keys:
+                page.append(key)
+                if len(page) > limit:
+                    break
+            items = [self._by_id[i] for _, i in page[:limit]]
+
+        next_cursor = None
+        if len(page) > limit:
+            next_cursor = encode_cursor(*page[limit - 1])
+        return items, next_cursor
+
+    def iter_chart_data(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+    ) -> Iterator[ChartRow]:
+        with self._lock:
+            slices = self._slices(city, start_date, end_date, parameters)
+
+        for _, measurement_id in heapq.merge(*slices):
+            item = self._by_id.get(measurement_id)
+            # rows deleted while streaming are skipped
+            if item is not None:
+                yield to_row(item)
+
+    def get_series(
+            self,
+            city: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+    ) -> Dict[str, SeriesColumns]:
+        series = {}
+        with self._lock:
+            for (series_city, parameter), keys in self._series.items():
+                if series_city != city or (parameters and parameter not in parameters):
+                    continue
+                # one series per key, _slices returns at most one slice
+                for sliced in self._slices(city, start_date, end_date, [parameter]):
+                    items = [self._by_id[i] for _, i in sliced]
+                    series[parameter] = SeriesColumns(
+                        unit=items[0].unit,
+                        timestamps=[ts for ts, _ in sliced],
+                        values=[item.value for item in items],
+                    )
+        return series
+
+    def get_latest(self, city: str) -> List[MeasurementEntity]:
+        with self._lock:
+            latest = [
+                self._by_id[series[-1][1]]
+                for (series_city, _), series in self._series.items()
+                if series_city == city and series
+            ]
+        latest.sort(key=lambda m: m.parameter)
+        return [to_entity(m) for m in latest]
+
+    def get_by_id(self, measurement_id: str) -> Optional[MeasurementEntity]:
+        item = self._by_id.get(measurement_id)
+        return to_entity(item) if item is not None else None
+
+    def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
+        item = self._to_item(measurement)
+        with self._lock:
+            if self._key(item) in self._keys:
+                raise DuplicateMeasurement(item.city, item.parameter, item.timestamp)
+            self._insert(item)
+        return to_entity(item)
+
+    def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        items = [self._to_item(m) for m in measurements]
+
+        saved = []
+        with self._lock:
+            for item in items:
+                if self._key(item) in self._keys:
+                    continue
+                self._insert(item)
+                saved.append(to_entity(item))
+        return saved
+
+    def measurement_exists(self, city: str, parameter: str, timestamp: datetime) -> bool:
+        return (city, parameter, _as_naive_utc(timestamp)) in self._keys
+
+    def update(self, measurement_id: str, updated_data: MeasurementEntity) -> Optional[MeasurementEntity]:
+        with self._lock:
+            existing = self._by_id.get(measurement_id)
+            if existing is None:
+                return None
+
+            updated_data.id = measurement_id
+            item = self._to_item(updated_data)
+            if self._key(item) != self._key(existing) and self._key(item) in self._keys:
+                raise DuplicateMeasurement(item.city, item.parameter, item.timestamp)
+
+            self._remove(existing)
+            self._insert(item)
+        return to_entity(item)
+
+    def delete(self, measurement_id: str) -> bool:
+        with self._lock:
+            existing = self._by_id.get(measurement_id)
+            if existing is None:
+                return False
+            self._remove(existing)
+        return True
+
+    @staticmethod
+    def _to_item(measurement: MeasurementEntity) -> AirQualityMeasurement:
+        item = to_air_quality(measurement)
+        item.id = measurement.id or str(uuid.uuid4())
+        item.timestamp = _as_naive_utc(measurement.timestamp)
+        return item
+
+    @staticmethod
+    def _key(item: AirQualityMeasurement) -> MeasurementKey:
+        return item.city, item.parameter, item.timestamp
+
+    def _insert(self, item: AirQualityMeasurement):
+        self._by_id[item.id] = item
+        self._keys.add(self._key(item))
+        # ingestion is append-mostly, so insort usually lands at the end of the list
+        insort(self._series.setdefault((item.city, item.parameter), []), (item.timestamp, item.id))
+
+    def _remove(self, item: AirQualityMeasurement):
+        del self._by_id[item.id]
+        self._keys.discard(self._key(item))
+
+        series = self._series[(item.city, item.parameter)]
+        position = bisect_left(series, (item.timestamp, item.id))
+        del series[position]
+        if not series:
+            del self._series[(item.city, item.parameter)]
+
+    def _slices(self, city, start_date, end_date, parameters, after=None) -> List[List[Tuple[datetime, str]]]:
+        start = datetime.combine(start_date.date(), time.min) if start_date else None
+        end = datetime.combine(end_date.date(), time.max) if end_date else None
+
+        slices = []
+        for (series_city, parameter), series in self._series.items():
+            if city and series_city != city:
+                continue
+            if parameters and parameter not in parameters:
+                continue
+
+            lo = bisect_left(series, (start,)) if start else 0
+            if after is not None:
+                lo = max(lo, bisect_right(series, after))
+            hi = bisect_right(series, (end, chr(0x10FFFF))) if end else len(series)
+            if lo < hi:
+                slices.append(series[lo:hi])
+        return slices
+
+    def _range(self, city, start_date, end_date, parameters) -> List[Tuple[datetime, str]]:
+        return [key for series in self._slices(city, start_date, end_date, parameters) for key in series]
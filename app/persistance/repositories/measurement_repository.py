@@ -1,22 +1,96 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from app.domain.chart_payload import ChartPayload, ChartRow, build_payload, to_row, validate_format
 from app.domain.model.air_quality import AirQualityMeasurement
+from app.domain.time_series import SeriesColumns
 from app.persistance.model.measurement_entity import MeasurementEntity
 
 
+class DuplicateMeasurement(ValueError):
+    """Another measurement of the same city and parameter already exists at the timestamp."""
+
+    def __init__(self, city: str, parameter: str, timestamp: datetime):
+        super().__init__(f"Measurement of {parameter} in {city} at {timestamp.isoformat()} already exists")
+
+
 class MeasurementRepository(ABC):
     @abstractmethod
     def get_chart_data(
         self,
+        city: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         parameters: Optional[List[str]] = None,
         sort_by: Optional[List[str]] = None,
-    ) -> tuple[List["AirQualityMeasurement"], int]:
+        bucket: Optional[str] = None,
+        agg: str = "avg",
+        max_points: Optional[int] = None,
+    ) -> List[AirQualityMeasurement]:
+        """Measurements in the date range.
+
+        With `bucket` the values are aggregated per (city, parameter, bucket) using `agg`,
+        with `max_points` every (city, parameter) series is downsampled to at most that many points.
+        """
         pass
 
+    def get_chart_rows(self, **filters) -> List[ChartRow]:
+        """get_chart_data() as plain tuples, for callers that serialize the rows themselves."""
+        return [to_row(item) for item in self.get_chart_data(**filters)]
+
+    def get_chart_payload(self, fmt: str = "rows", **filters) -> ChartPayload:
+        """get_chart_data() encoded as JSON bytes in `fmt` ("rows" or "columnar"), with an ETag of the body."""
+        return build_payload(self.get_chart_rows(**filters), fmt)
+
+    def get_chart_rows_many(self, specs: List[dict]) -> List[List[ChartRow]]:
+        """get_chart_rows() of every spec (its keyword arguments), backends may answer all in one query."""
+        return [self.get_chart_rows(**filters) for filters in specs]
+
+    def get_chart_payloads(self, specs: List[dict], fmt: str = "rows") -> List[ChartPayload]:
+        """get_chart_payload() of every spec, in order."""
+        validate_format(fmt)
+        return [build_payload(rows, fmt) for rows in self.get_chart_rows_many(specs)]
+
+    @abstractmethod
+    def get_chart_page(
+        self,
+        city: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        parameters: Optional[List[str]] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[AirQualityMeasurement], Optional[str]]:
+        """Keyset page ordered by (timestamp, id), returns the items and the cursor of the next page."""
+        pass
+
+    @abstractmethod
+    def iter_chart_data(
+        self,
+        city: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        parameters: Optional[List[str]] = None,
+    ) -> Iterator[ChartRow]:
+        """Streams measurements ordered by (timestamp, id) without loading the whole range."""
+        pass
+
+    @abstractmethod
+    def get_series(
+        self,
+        city: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        parameters: Optional[List[str]] = None,
+    ) -> Dict[str, SeriesColumns]:
+        """Values of every parameter in the date range as columns, without building a model per row."""
+        pass
+
+    @abstractmethod
+    def get_latest(self, city: str) -> List[MeasurementEntity]:
+        """Most recent stored measurement of every parameter in the city."""
+        pass
 
     @abstractmethod
     def get_by_id(self, measurement_id: str) -> Optional[MeasurementEntity]:
@@ -24,6 +98,15 @@ class MeasurementRepository(ABC):
 
     @abstractmethod
     def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
+        """Raises DuplicateMeasurement when the (city, parameter, timestamp) is taken."""
+        pass
+
+    @abstractmethod
+    def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        """Insert measurements in one transaction, skipping (city, parameter, timestamp) duplicates.
+
+        Returns only the measurements that were actually inserted.
+        """
         pass
 
     @abstractmethod
@@ -32,6 +115,7 @@ class MeasurementRepository(ABC):
 
     @abstractmethod
     def update(self, measurement_id: str, updated_data: MeasurementEntity) -> Optional[MeasurementEntity]:
+        """None when there is no such measurement, DuplicateMeasurement when the new key is taken."""
         pass
 
     @abstractmethod
@@ -1,81 +1,433 @@
 import uuid
-from datetime import datetime, time, timezone
-from typing import Optional, List
+from functools import wraps
+from itertools import chain, islice
+from datetime import datetime, time
+from typing import Dict, Iterator, Optional, List
 
-from sqlalchemy import asc, desc
+from sqlalchemy import String, and_, asc, case, desc, func, literal, or_, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.domain.chart_payload import ChartRow, to_measurement, to_row
 from app.domain.mapper import to_air_quality, to_entity
+from app.domain.pagination import decode_cursor, encode_cursor
+from app.domain.time_series import (
+    SeriesColumns, aggregate_buckets, bucket_seconds, downsample, naive_utc, sort_items, validate_aggregation,
+)
+from app.persistance.measurement_archive import MeasurementArchive, day_bounds
 from app.persistance.model.measurement_entity import MeasurementEntity
-from app.persistance.repositories.measurement_repository import MeasurementRepository
+from app.persistance.read_routing import replica_reads
+from app.persistance.repositories.measurement_repository import DuplicateMeasurement, MeasurementRepository
+from app.persistance.rollups import ROLLUP_AGGREGATES, coarsest_rollup, refresh_rollups, rollup_value
+from app.persistance.sql_time_buckets import bucket_start
+
+# Rows per INSERT statement of a bulk insert
+INSERT_BATCH_SIZE = 1000
+
+# Rows fetched per round trip when streaming, bounds worker memory for any date range
+STREAM_BATCH_SIZE = 1000
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# selected in ChartRow field order
+_ROW_COLUMNS = (
+    MeasurementEntity.id,
+    MeasurementEntity.city,
+    MeasurementEntity.parameter,
+    MeasurementEntity.value,
+    MeasurementEntity.unit,
+    MeasurementEntity.timestamp,
+)
+
+_AGGREGATES = {
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
+
+def _as_naive_utc(ts) -> datetime:
+    # the timestamp column has no time zone, asyncpg refuses aware datetimes for it
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return naive_utc(ts)
+
+
+def _order_by(sort_by: Optional[List[str]], columns):
+    sort_columns = []
+    for sort_item in sort_by or []:
+        try:
+            field, direction = sort_item.split(":")
+            column = columns.get(field)
+            if column is not None:
+                sort_columns.append(asc(column) if direction.lower() == "asc" else desc(column))
+        except ValueError:
+            continue
+
+    return sort_columns or [columns["timestamp"].asc()]
+
+
+def _filters(city, start_date, end_date, parameters, entity=MeasurementEntity) -> list:
+    if start_date:
+        start_date = datetime.combine(start_date.date(), time.min)
+
+    if end_date:
+        end_date = datetime.combine(end_date.date(), time.max)
+
+    conditions = []
+    if city:
+        conditions.append(entity.city == city)
+
+    if start_date and end_date:
+        conditions.append(entity.timestamp.between(start_date, end_date))
+    elif start_date:
+        conditions.append(entity.timestamp >= start_date)
+    elif end_date:
+        conditions.append(entity.timestamp <= end_date)
+
+    if parameters:
+        conditions.append(entity.parameter.in_(parameters))
+
+    return conditions
+
+
+def _replica_read(method):
+    """Read-only methods, their queries may run on a read replica."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with replica_reads(self.db):
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class SQLMeasurementRepository(MeasurementRepository):
-    def __init__(self, db: Session):
+    """Measurements in the SQL table, plus the months moved to `archive` when one is configured.
+
+    Months before the archive horizon are read from the archive only, rows written into them
+    after archiving show up once the archive job ran again.
+    """
+
+    def __init__(self, db: Session, archive: Optional[MeasurementArchive] = None):
         self.db = db
+        self.archive = archive
+
+    def _horizon(self) -> Optional[datetime]:
+        return self.archive.horizon() if self.archive else None
+
+    def _hot_filters(self, city, start_date, end_date, parameters) -> list:
+        conditions = _filters(city, start_date, end_date, parameters)
+        horizon = self._horizon()
+        if horizon is not None:
+            conditions.append(MeasurementEntity.timestamp >= horizon)
+        return conditions
+
+    def _reads_archive(self, start_date: Optional[datetime]) -> bool:
+        return self.archive is not None and self.archive.covers(day_bounds(start_date, None)[0])
 
-    def get_chart_data(
+    def _archived_rows(self, city, start_date, end_date, parameters, after=None) -> Iterator[ChartRow]:
+        if self.archive is None:
+            return iter(())
+        start, end = day_bounds(start_date, end_date)
+        return self.archive.iter_rows(city, start, end, parameters, after)
+
+    def get_chart_data(self, **filters):
+        return [to_measurement(row) for row in self.get_chart_rows(**filters)]
+
+    @_replica_read
+    def get_chart_rows(
             self,
+            city: Optional[str] = None,
             start_date: Optional[datetime] = None,
             end_date: Optional[datetime] = None,
             parameters: Optional[List[str]] = None,
             sort_by: Optional[List[str]] = None,
+            bucket: Optional[str] = None,
+            agg: str = "avg",
+            max_points: Optional[int] = None,
+    ) -> List[ChartRow]:
+        # column tuples straight from the cursor, no ORM identity map or model per row
+        if bucket:
+            filters = (city, start_date, end_date, parameters)
+            rows = self._get_bucketed(filters, bucket_seconds(bucket), validate_aggregation(agg), sort_by)
+        else:
+            stmt = (
+                select(*_ROW_COLUMNS)
+                .where(*self._hot_filters(city, start_date, end_date, parameters))
+                .order_by(*_order_by(sort_by, MeasurementEntity.__table__.c))
+            )
+            rows = [ChartRow._make(row) for row in self.db.execute(stmt)]
+
+            archived = list(self._archived_rows(city, start_date, end_date, parameters))
+            if archived:
+                rows = sort_items(archived + rows, sort_by)
+
+        if max_points:
+            rows = downsample(rows, max_points)
+
+        return rows
+
+    @_replica_read
+    def get_chart_rows_many(self, specs: List[dict]) -> List[List[ChartRow]]:
+        # one UNION ALL over every spec a plain select answers, tagged with the spec index
+        results: List[Optional[List[ChartRow]]] = [None] * len(specs)
+        parts = []
+        for i, filters in enumerate(specs):
+            part = self._batch_select(**filters)
+            if part is None:
+                results[i] = self.get_chart_rows(**filters)
+            else:
+                parts.append(part.add_columns(literal(i).label("spec")))
+                results[i] = []
+
+        if parts:
+            stmt = union_all(*parts)
+            stmt = stmt.order_by(stmt.selected_columns.spec, stmt.selected_columns.timestamp)
+            for row in self.db.execute(stmt):
+                results[row.spec].append(ChartRow(*row[:-1]))
+
+            for i, filters in enumerate(specs):
+                if filters.get("max_points"):
+                    results[i] = downsample(results[i], filters["max_points"])
+
+        return results
+
+    def _batch_select(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+            sort_by: Optional[List[str]] = None,
+            bucket: Optional[str] = None,
+            agg: str = "avg",
+            max_points: Optional[int] = None,
     ):
-        query = self.db.query(MeasurementEntity)
-
-        if start_date:
-            start_date = datetime.combine(start_date.date(), time.min)
-
-        if end_date:
-            end_date = datetime.combine(end_date.date(), time.max)
-
-        if start_date and end_date:
-            query = query.filter(MeasurementEntity.timestamp.between(start_date, end_date))
-        elif start_date:
-            query = query.filter(MeasurementEntity.timestamp >= start_date)
-        elif end_date:
-            query = query.filter(MeasurementEntity.timestamp <= end_date)
-
-        if parameters:
-            query = query.filter(MeasurementEntity.parameter.in_(parameters))
-
-        if sort_by:
-            sort_columns = []
-            for sort_item in sort_by:
-                try:
-                    field, direction = sort_item.split(":")
-                    column = getattr(MeasurementEntity, field, None)
-                    if column is not None:
-                        sort_columns.append(asc(column) if direction.lower() == "asc" else desc(column))
-                except ValueError:
-                    continue
-
-            if sort_columns:
-                query = query.order_by(*sort_columns)
+        """Select of ChartRow columns ordered by timestamp, None when get_chart_rows() needs more than one."""
+        if sort_by and sort_by != ["timestamp:asc"]:
+            return None
+        filters = (city, start_date, end_date, parameters)
+
+        if not bucket:
+            if self._reads_archive(start_date):
+                return None
+            return select(*_ROW_COLUMNS).where(*self._hot_filters(*filters))
+
+        seconds, agg = bucket_seconds(bucket), validate_aggregation(agg)
+        dialect = self.db.get_bind().dialect.name
+        rollup = coarsest_rollup(seconds)
+        if rollup is not None and agg in ROLLUP_AGGREGATES:
+            source, value = rollup, rollup_value(rollup, agg)
+            conditions = _filters(*filters, entity=rollup)
+        elif agg in _AGGREGATES and not self._reads_archive(start_date):
+            source, value = MeasurementEntity, _AGGREGATES[agg](MeasurementEntity.value)
+            conditions = self._hot_filters(*filters)
         else:
-            query = query.order_by(MeasurementEntity.timestamp.asc())
+            return None
+
+        ts = bucket_start(source.timestamp, seconds, dialect)
+        keys = [source.city, source.parameter, source.unit]
+        return (
+            select(literal("", String).label("id"), source.city, source.parameter, value.label("value"),
+                   source.unit, ts.label("timestamp"))
+            .where(*conditions)
+            .group_by(*keys, ts)
+        )
+
+    def _get_bucketed(self, filters, seconds: int, agg: str, sort_by: Optional[List[str]]):
+        dialect = self.db.get_bind().dialect.name
+        rollup = coarsest_rollup(seconds)
 
-        db_items = query.all()
-        return [to_air_quality(i) for i in db_items]
+        if rollup is not None and agg in ROLLUP_AGGREGATES:
+            # rollup rows are whole hours/days, the day-aligned date range always covers them completely
+            ts = bucket_start(rollup.timestamp, seconds, dialect)
+            keys = [rollup.city, rollup.parameter, rollup.unit]
+            stmt = (
+                select(*keys, ts.label("timestamp"), rollup_value(rollup, agg).label("value"))
+                .where(*_filters(*filters, entity=rollup))
+                .group_by(*keys, ts)
+            )
+            return self._bucketed_items(stmt, sort_by)
 
+        archived = list(self._archived_rows(*filters))
+        if archived:
+            # buckets may straddle the horizon, aggregate both sides together
+            stmt = select(*_ROW_COLUMNS).where(*self._hot_filters(*filters))
+            rows = archived + [ChartRow._make(row) for row in self.db.execute(stmt)]
+            return sort_items([to_row(m) for m in aggregate_buckets(rows, seconds, agg)], sort_by)
 
+        ts = bucket_start(MeasurementEntity.timestamp, seconds, dialect)
+        keys = [MeasurementEntity.city, MeasurementEntity.parameter, MeasurementEntity.unit]
+        conditions = self._hot_filters(*filters)
+
+        if agg == "p95":
+            # percentile_cont(0.95) spelled with window functions so SQLite can run it too
+            series = keys + [ts]
+            ranked = (
+                select(
+                    *keys,
+                    ts.label("timestamp"),
+                    MeasurementEntity.value,
+                    func.row_number().over(partition_by=series, order_by=MeasurementEntity.value).label("rn"),
+                    func.count().over(partition_by=series).label("cnt"),
+                )
+                .where(*conditions)
+                .subquery()
+            )
+            lower = (ranked.c.cnt - 1) * 95 // 100
+            fraction = ((ranked.c.cnt - 1) * 95 % 100) / 100.0
+            weight = case(
+                (ranked.c.rn - 1 == lower, 1 - fraction),
+                (ranked.c.rn - 1 == lower + 1, fraction),
+                else_=0,
+            )
+            group = [ranked.c.city, ranked.c.parameter, ranked.c.unit, ranked.c.timestamp]
+            stmt = select(*group, func.sum(ranked.c.value * weight).label("value")).group_by(*group)
+        else:
+            stmt = (
+                select(*keys, ts.label("timestamp"), _AGGREGATES[agg](MeasurementEntity.value).label("value"))
+                .where(*conditions)
+                .group_by(*keys, ts)
+            )
+
+        return self._bucketed_items(stmt, sort_by)
+
+    def _bucketed_items(self, stmt, sort_by: Optional[List[str]]) -> List[ChartRow]:
+        stmt = stmt.order_by(*_order_by(sort_by, stmt.selected_columns))
+        return [
+            ChartRow("", row.city, row.parameter, row.value, row.unit, row.timestamp)
+            for row in self.db.execute(stmt)
+        ]
+
+    @_replica_read
+    def get_chart_page(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+            limit: int = 1000,
+            cursor: Optional[str] = None,
+    ):
+        conditions = self._hot_filters(city, start_date, end_date, parameters)
+        after = None
+        if cursor:
+            after_ts, after_id = decode_cursor(cursor)
+            after = (naive_utc(after_ts), after_id)
+            conditions.append(or_(
+                MeasurementEntity.timestamp > after[0],
+                and_(MeasurementEntity.timestamp == after[0], MeasurementEntity.id > after_id),
+            ))
+
+        # archived rows all precede the table rows, the page starts with them
+        archived = self._archived_rows(city, start_date, end_date, parameters, after)
+        items = [to_measurement(row) for row in islice(archived, limit + 1)]
+
+        if len(items) <= limit:
+            db_items = (
+                self.db.query(MeasurementEntity)
+                .filter(*conditions)
+                .order_by(MeasurementEntity.timestamp.asc(), MeasurementEntity.id.asc())
+                .limit(limit + 1 - len(items))
+                .all()
+            )
+            items += [to_air_quality(i) for i in db_items]
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].timestamp, items[-1].id)
+
+        return items, next_cursor
+
+    def iter_chart_data(
+            self,
+            city: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+    ):
+        # a generator, the block stays open while the caller iterates
+        with replica_reads(self.db):
+            yield from self._archived_rows(city, start_date, end_date, parameters)
+
+            stmt = (
+                select(*_ROW_COLUMNS)
+                .where(*self._hot_filters(city, start_date, end_date, parameters))
+                .order_by(MeasurementEntity.timestamp.asc(), MeasurementEntity.id.asc())
+                .execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            for row in self.db.execute(stmt):
+                yield ChartRow._make(row)
+
+    @_replica_read
+    def get_series(
+            self,
+            city: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            parameters: Optional[List[str]] = None,
+    ) -> Dict[str, SeriesColumns]:
+        stmt = (
+            select(MeasurementEntity.parameter, MeasurementEntity.unit, MeasurementEntity.timestamp, MeasurementEntity.value)
+            .where(*self._hot_filters(city, start_date, end_date, parameters))
+            .order_by(MeasurementEntity.parameter.asc(), MeasurementEntity.timestamp.asc())
+        )
+        # archived rows come in timestamp order and before the table rows
+        archived = (
+            (row.parameter, row.unit, row.timestamp, row.value)
+            for row in self._archived_rows(city, start_date, end_date, parameters)
+        )
+
+        series: Dict[str, SeriesColumns] = {}
+        for parameter, unit, timestamp, value in chain(archived, self.db.execute(stmt)):
+            columns = series.get(parameter)
+            if columns is None:
+                columns = series[parameter] = SeriesColumns(unit=unit, timestamps=[], values=[])
+            columns.timestamps.append(naive_utc(timestamp))
+            columns.values.append(value)
+        return series
+
+    @_replica_read
+    def get_latest(self, city: str) -> List[MeasurementEntity]:
+        latest = (
+            self.db.query(
+                MeasurementEntity.parameter,
+                func.max(MeasurementEntity.timestamp).label("timestamp"),
+            )
+            .filter(MeasurementEntity.city == city)
+            .group_by(MeasurementEntity.parameter)
+            .subquery()
+        )
+        db_items = (
+            self.db.query(MeasurementEntity)
+            .join(latest, and_(
+                MeasurementEntity.parameter == latest.c.parameter,
+                MeasurementEntity.timestamp == latest.c.timestamp,
+            ))
+            .filter(MeasurementEntity.city == city)
+            .order_by(MeasurementEntity.parameter.asc())
+            .all()
+        )
+        return [to_entity(i) for i in db_items]
+
+    @_replica_read
     def get_by_id(self, measurement_id: str) -> Optional[MeasurementEntity]:
         db_item = self.db.query(MeasurementEntity).filter(MeasurementEntity.id == measurement_id).first()
         if db_item:
-            return to_entity(db_item)
-        return None
+            # detached instead of copied, later writes in this session cannot change it
+            self.db.expunge(db_item)
+        return db_item
 
     def add(self, measurement: MeasurementEntity) -> MeasurementEntity:
         if not measurement.id:
             measurement.id = str(uuid.uuid4())
-        ts = measurement.timestamp
-        if isinstance(ts, str):
-            ts = datetime.fromisoformat(ts)
-
-        if ts.tzinfo is None:
-            ts = ts.astimezone(timezone.utc)
-        else:
-            ts = ts.astimezone(timezone.utc)
+        ts = _as_naive_utc(measurement.timestamp)
 
         db_item = MeasurementEntity(
             id=measurement.id,
@@ -83,21 +435,65 @@ class SQLMeasurementRepository(MeasurementRepository):
             parameter=measurement.parameter,
             value=measurement.value,
             unit=measurement.unit,
-            timestamp=ts,  # always UTC now
+            timestamp=ts,
         )
 
         self.db.add(db_item)
+        self._flush_unique(db_item.city, db_item.parameter, ts)
+        refresh_rollups(self.db, [(db_item.city, db_item.parameter, ts)], self._horizon())
         self.db.commit()
         self.db.refresh(db_item)
         return to_entity(db_item)
 
+    def add_many(self, measurements: List[MeasurementEntity]) -> List[MeasurementEntity]:
+        if not measurements:
+            return []
+
+        dialect = self.db.get_bind().dialect.name
+        insert = _DIALECT_INSERTS.get(dialect)
+        if insert is None:
+            raise ValueError(f"Bulk insert is not supported for '{dialect}' databases")
+
+        rows = [
+            {
+                "id": m.id or str(uuid.uuid4()),
+                "city": m.city,
+                "parameter": m.parameter,
+                "value": m.value,
+                "unit": m.unit,
+                "timestamp": _as_naive_utc(m.timestamp),
+            }
+            for m in measurements
+        ]
+        table = MeasurementEntity.__table__
+
+        saved = []
+        try:
+            # executemany with RETURNING is sent as multi-row INSERTs of INSERT_BATCH_SIZE rows
+            # ("insertmanyvalues"), compiled once instead of once per batch
+            stmt = (
+                insert(table)
+                .on_conflict_do_nothing()
+                .returning(*table.columns)
+                .execution_options(insertmanyvalues_page_size=INSERT_BATCH_SIZE)
+            )
+            saved.extend(MeasurementEntity(**row._mapping) for row in self.db.execute(stmt, rows))
+            refresh_rollups(self.db, [(m.city, m.parameter, m.timestamp) for m in saved], self._horizon())
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return saved
+
+    @_replica_read
     def measurement_exists(self, city: str, parameter: str, timestamp: datetime) -> bool:
         exists = (
             self.db.query(MeasurementEntity)
             .filter(
                 MeasurementEntity.city == city,
                 MeasurementEntity.parameter == parameter,
-                MeasurementEntity.timestamp == timestamp
+                MeasurementEntity.timestamp == _as_naive_utc(timestamp)
             )
             .first()
         )
@@ -111,17 +507,30 @@ class SQLMeasurementRepository(MeasurementRepository):
         if not db_item:
             return None
 
+        changes = [(db_item.city, db_item.parameter, db_item.timestamp)]
+
         # Update fields
         db_item.city = updated_data.city
         db_item.parameter = updated_data.parameter
         db_item.value = updated_data.value
         db_item.unit = updated_data.unit
-        db_item.timestamp = updated_data.timestamp
+        db_item.timestamp = _as_naive_utc(updated_data.timestamp)
 
+        self._flush_unique(db_item.city, db_item.parameter, db_item.timestamp)
+        changes.append((db_item.city, db_item.parameter, db_item.timestamp))
+        refresh_rollups(self.db, changes, self._horizon())
         self.db.commit()
         self.db.refresh(db_item)
         return to_entity(db_item)
 
+    def _flush_unique(self, city: str, parameter: str, timestamp: datetime):
+        # the unique index on (city, parameter, timestamp) is the only constraint a write can break
+        try:
+            self.db.flush()
+        except IntegrityError:
+            self.db.rollback()
+            raise DuplicateMeasurement(city, parameter, timestamp) from None
+
     def delete(self, measurement_id: str) -> bool:
         db_item = self.db.query(MeasurementEntity).filter(
             MeasurementEntity.id == measurement_id
@@ -130,6 +539,9 @@ class SQLMeasurementRepository(MeasurementRepository):
         if not db_item:
             return False
 
+        changes = [(db_item.city, db_item.parameter, db_item.timestamp)]
         self.db.delete(db_item)
+        self.db.flush()
+        refresh_rollups(self.db, changes, self._horizon())
         self.db.commit()
         return True
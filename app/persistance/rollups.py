@@ -0,0 +1,222 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import BigInteger, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.model.measurement_rollup_entity import DailyRollupEntity, HourlyRollupEntity
+from app.persistance.sql_time_buckets import bucket_start
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# (bucket width in seconds, table), coarsest first
+ROLLUPS = [
+    (DAY, DailyRollupEntity),
+    (HOUR, HourlyRollupEntity),
+]
+
+ROLLUP_AGGREGATES = ("avg", "min", "max")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def coarsest_rollup(seconds: int):
+    """Coarsest rollup table whose buckets tile a `seconds` wide bucket, None if only raw rows will do."""
+    for width, entity in ROLLUPS:
+        if width <= seconds and seconds % width == 0:
+            return entity
+    return None
+
+
+def rollup_value(entity, agg: str):
+    if agg == "avg":
+        return func.sum(entity.sum) / func.sum(entity.count)
+    if agg == "min":
+        return func.min(entity.min)
+    if agg == "max":
+        return func.max(entity.max)
+    raise ValueError(f"Aggregation '{agg}' cannot be served from rollups")
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _floor(ts: datetime, seconds: int) -> datetime:
+    ts = _naive_utc(ts)
+    elapsed = int((ts - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _span_conditions(entity, start: datetime, end: datetime, city: Optional[str], parameters: Optional[List[str]]):
+    conditions = [entity.timestamp >= start, entity.timestamp < end]
+    if city:
+        conditions.append(entity.city == city)
+    if parameters:
+        conditions.append(entity.parameter.in_(parameters))
+    return conditions
+
+
+def _rebuild(db: Session, target, source, seconds: int, start: datetime, end: datetime,
+             city: Optional[str], parameters: Optional[List[str]]):
+    db.query(target).filter(*_span_conditions(target, start, end, city, parameters)).delete(
+        synchronize_session=False
+    )
+
+    ts = bucket_start(source.timestamp, seconds, db.get_bind().dialect.name)
+    if source is MeasurementEntity:
+        aggregates = [
+            func.count().label("count"),
+            func.sum(source.value).label("sum"),
+            func.min(source.value).label("min"),
+            func.max(source.value).label("max"),
+        ]
+    else:
+        aggregates = [
+            func.sum(source.count).label("count"),
+            func.sum(source.sum).label("sum"),
+            func.min(source.min).label("min"),
+            func.max(source.max).label("max"),
+        ]
+
+    stmt = (
+        select(source.city, source.parameter, ts.label("timestamp"), func.max(source.unit).label("unit"), *aggregates)
+        .where(*_span_conditions(source, start, end, city, parameters))
+        .group_by(source.city, source.parameter, ts)
+    )
+    rows = [dict(row._mapping) for row in db.execute(stmt)]
+    if rows:
+        db.execute(insert(target), rows)
+
+
+def refresh_window(db: Session, start: datetime, end: datetime,
+                   city: Optional[str] = None, parameters: Optional[List[str]] = None):
+    """Recomputes every hourly and daily rollup bucket overlapping [start, end). Does not commit."""
+    hour_start, hour_end = _floor(start, HOUR), _floor(end - timedelta(microseconds=1), HOUR) + timedelta(seconds=HOUR)
+    day_start, day_end = _floor(start, DAY), _floor(end - timedelta(microseconds=1), DAY) + timedelta(seconds=DAY)
+
+    _rebuild(db, HourlyRollupEntity, MeasurementEntity, HOUR, hour_start, hour_end, city, parameters)
+    _rebuild(db, DailyRollupEntity, HourlyRollupEntity, DAY, day_start, day_end, city, parameters)
+
+
+def _runs(starts: Iterable[datetime], seconds: int) -> List[Tuple[datetime, datetime]]:
+    """Contiguous [start, end) ranges covering the buckets of `seconds` that start at `starts`."""
+    width = timedelta(seconds=seconds)
+    runs: List[List[datetime]] = []
+    for start in sorted(set(starts)):
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = start + width
+        else:
+            runs.append([start, start + width])
+    return [(start, end) for start, end in runs]
+
+
+def _lock_key(city: str, parameter: str, day: datetime) -> int:
+    digest = hashlib.blake2b(repr(("rollups", city, parameter, f"{day:%Y-%m-%d}")).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _lock_days(db: Session, days: Iterable[Tuple[str, str, datetime]]):
+    """Serializes the refreshes of a (city, parameter, day) until the transaction ends.
+
+    A refresh deletes and re-aggregates its buckets, two concurrent ones could both insert a bucket
+    or one could aggregate without the rows of the other. Once the lock is held, READ COMMITTED
+    statements see the rows of every writer that refreshed before. Keys are taken in sorted order
+    so writers never deadlock on each other; SQLite runs one writer at a time anyway.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for key in sorted({_lock_key(*day) for day in days}):
+        db.execute(select(func.pg_advisory_xact_lock(literal(key, BigInteger))))
+
+
+def refresh_rollups(db: Session, changes: Iterable[Tuple[str, str, datetime]], not_before: Optional[datetime] = None):
+    """Recomputes the rollup buckets touched by changed (city, parameter, timestamp) rows. Does not commit.
+
+    Only the touched hours and days are recomputed, one range per run of adjacent buckets, so
+    two rows far apart do not rebuild everything in between. Parameters of a city touched at the
+    same hours share their statements. Concurrent refreshes of the same days wait for each other.
+
+    Rows before `not_before` (the archive horizon) are skipped, the rollups of archived months
+    are computed from the archive segments and the table no longer holds their rows.
+    """
+    hours: Dict[Tuple[str, str], Set[datetime]] = {}
+    for city, parameter, ts in changes:
+        ts = _naive_utc(ts)
+        if not_before is not None and ts < not_before:
+            continue
+        hours.setdefault((city, parameter), set()).add(_floor(ts, HOUR))
+
+    _lock_days(db, ((city, parameter, _floor(h, DAY)) for (city, parameter), touched in hours.items() for h in touched))
+
+    groups: Dict[Tuple[str, FrozenSet[datetime]], List[str]] = {}
+    for (city, parameter), touched in hours.items():
+        groups.setdefault((city, frozenset(touched)), []).append(parameter)
+
+    for (city, touched), parameters in groups.items():
+        parameters = sorted(parameters)
+        for start, end in _runs(touched, HOUR):
+            _rebuild(db, HourlyRollupEntity, MeasurementEntity, HOUR, start, end, city, parameters)
+        # after the hours, the days are summed from them
+        for start, end in _runs((_floor(h, DAY) for h in touched), DAY):
+            _rebuild(db, DailyRollupEntity, HourlyRollupEntity, DAY, start, end, city, parameters)
+
+
+def rebuild_rollups(db: Session, batch_days: int = 7, not_before: Optional[datetime] = None) -> int:
+    """Rebuilds all rollups from the raw measurements, committing once per batch of days.
+
+    With `not_before` (a day boundary) only the rollups from there on are rebuilt.
+    """
+    first, last = db.query(func.min(MeasurementEntity.timestamp), func.max(MeasurementEntity.timestamp)).one()
+    if first is None:
+        return 0
+    if not_before is not None:
+        first = max(_naive_utc(first), not_before)
+        if first > _naive_utc(last):
+            return 0
+
+    batches = 0
+    window_start = _floor(first, DAY)
+    end = _floor(last, DAY) + timedelta(seconds=DAY)
+    while window_start < end:
+        window_end = min(window_start + timedelta(days=batch_days), end)
+        refresh_window(db, window_start, window_end)
+        db.commit()
+
+        batches += 1
+        print(f"Rollups rebuilt up to {window_end.isoformat()}")
+        window_start = window_end
+
+    return batches
+
+
+def replace_rollups(db: Session, city: str, parameter: str, start: datetime, end: datetime,
+                    units: List[str], timestamps: List[datetime], values: List[float]):
+    """Replaces the rollups of one series in [start, end) with those of the given rows. Does not commit.
+
+    Used for rows that live outside the measurements table, [start, end) must be whole days.
+    """
+    for width, target in ROLLUPS:
+        buckets = {}
+        for unit, ts, value in zip(units, timestamps, values):
+            key = _floor(ts, width)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {"unit": unit, "count": 1, "sum": value, "min": value, "max": value}
+            else:
+                bucket["count"] += 1
+                bucket["sum"] += value
+                bucket["min"] = min(bucket["min"], value)
+                bucket["max"] = max(bucket["max"], value)
+
+        db.query(target).filter(*_span_conditions(target, start, end, city, [parameter])).delete(
+            synchronize_session=False
+        )
+        rows = [{"city": city, "parameter": parameter, "timestamp": ts, **bucket} for ts, bucket in buckets.items()]
+        if rows:
+            db.execute(insert(target), rows)
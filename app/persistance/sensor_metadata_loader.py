@@ -1,10 +1,157 @@
+import os
+import threading
+import time
 import yaml
+from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
-def load_sensor_metadata() -> dict:
-    metadata_path = Path(__file__).resolve().parent.parent.parent / "sensor_metadata.yaml"
+METADATA_PATH = Path(__file__).resolve().parent.parent.parent / "sensor_metadata.yaml"
+
+# How often get_sensor_registry() looks at the file's mtime
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def load_sensor_metadata(metadata_path: Path = METADATA_PATH) -> dict:
     if not metadata_path.exists():
         raise FileNotFoundError(f"Sensor metadata file not found: {metadata_path}")
 
     with open(metadata_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+        return yaml.safe_load(f)
+
+
+@dataclass(frozen=True)
+class SensorInfo:
+    sensor_id: int
+    city: str
+    parameter: str
+    unit: str
+
+
+@dataclass(frozen=True)
+class CityInfo:
+    name: str
+    location_ids: Tuple[int, ...]
+    sensors: Mapping[int, SensorInfo]
+
+
+class SensorRegistry:
+    """Immutable, indexed view of sensor_metadata.yaml.
+
+    A city entry holds the OpenAQ location `id` (one id or a list) and one `<sensor id>: {parameter, unit}`
+    entry per sensor. City lookups ignore case.
+    """
+
+    def __init__(self, metadata: dict):
+        cities: Dict[str, CityInfo] = {}
+        by_location: Dict[int, str] = {}
+        by_sensor: Dict[int, SensorInfo] = {}
+        by_parameter: Dict[str, List[SensorInfo]] = {}
+
+        for city, entry in (metadata or {}).items():
+            entry = dict(entry or {})
+            location_ids = entry.pop("id", None)
+            if location_ids is None:
+                raise ValueError(f"City '{city}' has no location id")
+            if not isinstance(location_ids, list):
+                location_ids = [location_ids]
+
+            sensors = {}
+            for sensor_id, info in entry.items():
+                sensor = SensorInfo(
+                    sensor_id=int(sensor_id),
+                    city=city,
+                    parameter=(info or {}).get("parameter", "unknown"),
+                    unit=(info or {}).get("unit", "unknown"),
+                )
+                sensors[sensor.sensor_id] = sensor
+                by_sensor[sensor.sensor_id] = sensor
+                by_parameter.setdefault(sensor.parameter, []).append(sensor)
+
+            for location_id in location_ids:
+                by_location[int(location_id)] = city
+
+            cities[city.lower()] = CityInfo(
+                name=city,
+                location_ids=tuple(int(i) for i in location_ids),
+                sensors=MappingProxyType(sensors),
+            )
+
+        self._cities = MappingProxyType(cities)
+        self._by_location = MappingProxyType(by_location)
+        self._by_sensor = MappingProxyType(by_sensor)
+        self._by_parameter = MappingProxyType({p: tuple(s) for p, s in by_parameter.items()})
+
+    @property
+    def cities(self) -> List[str]:
+        return [c.name for c in self._cities.values()]
+
+    @property
+    def sensors(self) -> List[SensorInfo]:
+        return list(self._by_sensor.values())
+
+    def city(self, name: str) -> Optional[CityInfo]:
+        return self._cities.get(name.lower())
+
+    def has_city(self, name: str) -> bool:
+        return name.lower() in self._cities
+
+    def city_for_location(self, location_id: int) -> Optional[str]:
+        return self._by_location.get(location_id)
+
+    def sensor(self, sensor_id: int, city: Optional[str] = None) -> Optional[SensorInfo]:
+        """Sensor by id, None if it is unknown or belongs to another city than `city`."""
+        sensor = self._by_sensor.get(sensor_id)
+        if sensor is None or (city is not None and sensor.city.lower() != city.lower()):
+            return None
+        return sensor
+
+    def sensors_for_parameter(self, parameter: str) -> Tuple[SensorInfo, ...]:
+        return self._by_parameter.get(parameter, ())
+
+
+_registry: Optional[SensorRegistry] = None
+_registry_mtime: Optional[float] = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_sensor_registry() -> SensorRegistry:
+    """Process-wide registry, rebuilt when sensor_metadata.yaml changes on disk.
+
+    A reload builds a new registry and swaps the reference, readers holding the old one keep
+    a consistent view. A file that fails to parse keeps the previous registry in place.
+    """
+    global _registry, _registry_mtime, _next_check
+
+    now = time.monotonic()
+    if _registry is not None and now < _next_check:
+        return _registry
+
+    with _reload_lock:
+        if _registry is not None and now < _next_check:
+            return _registry
+        _next_check = now + RELOAD_CHECK_SECONDS
+
+        try:
+            mtime = os.stat(METADATA_PATH).st_mtime
+        except OSError:
+            if _registry is None:
+                raise FileNotFoundError(f"Sensor metadata file not found: {METADATA_PATH}")
+            return _registry
+
+        if _registry is None or mtime != _registry_mtime:
+            try:
+                registry = SensorRegistry(load_sensor_metadata(METADATA_PATH))
+            except Exception as e:
+                if _registry is None:
+                    raise
+                print(f"Sensor metadata reload failed, keeping the previous version: {e}")
+            else:
+                if _registry is not None:
+                    print(f"Sensor metadata reloaded: {', '.join(registry.cities)}")
+                _registry = registry
+            _registry_mtime = mtime
+
+    return _registry
@@ -0,0 +1,19 @@
+from sqlalchemy import DateTime, Integer, cast, func, literal_column
+
+
+def bucket_start(column, seconds: int, dialect: str):
+    """SQL expression truncating a timestamp column to the start of its `seconds` wide bucket (UTC).
+
+    Constants are rendered inline so the expression is textually identical in SELECT and GROUP BY.
+    """
+    width = literal_column(str(int(seconds)), Integer)
+
+    if dialect == "postgresql":
+        epoch = func.floor(func.extract("epoch", column) / width) * width
+        return func.timezone(literal_column("'UTC'"), func.to_timestamp(epoch), type_=DateTime)
+
+    if dialect == "sqlite":
+        epoch = cast(func.strftime(literal_column("'%s'"), column), Integer) // width * width
+        return func.datetime(epoch, literal_column("'unixepoch'"), type_=DateTime)
+
+    raise ValueError(f"Time buckets are not supported for '{dialect}' databases")
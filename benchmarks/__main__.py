@@ -0,0 +1,108 @@
+import argparse
+import os
+from pathlib import Path
+
+from benchmarks.report import DEFAULT_TOLERANCE
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+CONFIG_PATH = Path(__file__).resolve().parent / "config.yaml"
+
+DEFAULT_DATABASE_URL = "sqlite:///./benchmark.db"
+
+
+def _configure(args):
+    # the app reads both when its modules are imported, so this runs before any app import.
+    # Subprocesses of the load test inherit them
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("CONFIG_PATH", str(CONFIG_PATH))
+
+
+def _seed(args):
+    from benchmarks.seed import seed_measurements
+
+    inserted = seed_measurements(args.rows, args.interval)
+    if not inserted:
+        print("Database already seeded, drop it to seed again")
+    return inserted
+
+
+def _run(args):
+    from benchmarks.report import compare, load_results, print_results, save_results
+    from benchmarks.seed import seed_range
+
+    _seed(args)
+    start, end = seed_range(args.rows, args.interval)
+
+    results = []
+    if not args.skip_repository:
+        from benchmarks.repository_bench import run_repository_benchmarks
+
+        repository_results = run_repository_benchmarks(end, repeat=args.repeat, only=args.only)
+        print_results("Repository", repository_results)
+        results += repository_results
+    if not args.skip_load:
+        from benchmarks.load_test import run_load_test
+
+        http_results = run_load_test(args.database_url, start, end, args.concurrency, args.duration, args.workers)
+        print_results("HTTP load", http_results)
+        results += http_results
+
+    meta = {
+        "database": args.database_url.split(":", 1)[0],
+        "rows": args.rows,
+        "interval_seconds": args.interval,
+        "repeat": args.repeat,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "workers": args.workers,
+    }
+    if args.output:
+        save_results(Path(args.output), results, meta)
+    if args.save_baseline:
+        save_results(Path(args.baseline), results, meta)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    baseline = load_results(Path(args.baseline))
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    if baseline["meta"].get("rows") != args.rows:
+        print(f"\nBaseline was taken with {baseline['meta'].get('rows')} rows, comparison is not meaningful")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        raise SystemExit(f"{len(regressions)} benchmarks regressed: {', '.join(regressions)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Air Quality Monitor benchmarks")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="SQLite or Postgres URL, seeded when empty")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Measurements seeded")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between the seeded readings of a sensor")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="Seed an empty database with synthetic measurements")
+    seed.set_defaults(handler=_seed)
+
+    run = commands.add_parser("run", help="Seed if needed, run the benchmarks and compare them with the baseline")
+    run.add_argument("--repeat", type=int, default=10, help="Timed calls per repository benchmark")
+    run.add_argument("--only", default="", help="Only repository benchmarks whose name contains this")
+    run.add_argument("--concurrency", type=int, default=8, help="Concurrent HTTP clients of the load test")
+    run.add_argument("--duration", type=float, default=60, help="Seconds the load test runs")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run.add_argument("--skip-repository", action="store_true", help="Only run the HTTP load test")
+    run.add_argument("--skip-load", action="store_true", help="Only run the repository benchmarks")
+    run.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline results to compare with")
+    run.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed p95 slowdown before a regression")
+    run.add_argument("--output", help="Also write the results to this JSON file")
+    run.set_defaults(handler=_run)
+
+    args = parser.parse_args(argv)
+    _configure(args)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
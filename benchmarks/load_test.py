@@ -0,0 +1,199 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import httpx
+
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+from benchmarks.report import BenchmarkResult, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# relative share of every operation in the traffic mix
+SCENARIO_WEIGHTS = {
+    "chart_data": 35,
+    "chart_data_bucket": 10,
+    "chart_data_page": 5,
+    "stats": 5,
+    "latest": 10,
+    "ingest": 15,
+    "batch_import": 5,
+    "update": 8,
+    "delete": 7,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+@contextmanager
+def running_app(database_url: str, workers: int = 1) -> Iterator[str]:
+    """Starts the OpenAQ stub and the API in subprocesses, yields the API base URL.
+
+    The API runs with benchmarks/config.yaml: no background ingestion, OpenAQ pointed at the stub.
+    """
+    stub_port, api_port = _free_port(), _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "OPENAQ_STUB_PORT": str(stub_port)}
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "app.adapters.openaq.stub_server", "--port", str(stub_port), "--rate-limit", "100000"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+        ))
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port),
+             "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+        ))
+        _wait_until_up(f"http://127.0.0.1:{stub_port}/v3/locations/0/latest", processes[0])
+        _wait_until_up(f"http://127.0.0.1:{api_port}/", processes[1])
+        yield f"http://127.0.0.1:{api_port}"
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class LoadScenario:
+    """Weighted mix of chart reads, ingest and CRUD calls issued by `concurrency` clients in a loop."""
+
+    def __init__(self, base_url: str, start: datetime, end: datetime, seed: int = 42):
+        self.base_url = base_url.rstrip("/") + "/api"
+        self.start = start
+        self.end = end
+        self.rng = random.Random(seed)
+        self.city = get_sensor_registry().cities[0]
+        self.sensors = get_sensor_registry().sensors
+        self.created: List[str] = []
+        # batch imports go after the seeded range, each call to its own hours
+        self.next_import = end + timedelta(days=30)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # first failure of every operation, printed after the run
+        self.first_errors: Dict[str, str] = {}
+
+    def _window(self, days: int) -> Tuple[str, str]:
+        span = (self.end - self.start).total_seconds() - days * 86400
+        first = self.start + timedelta(seconds=self.rng.uniform(0, max(span, 0)))
+        return first.isoformat(), (first + timedelta(days=days)).isoformat()
+
+    def _request(self, operation: str) -> Tuple[str, str, dict]:
+        """(method, path, httpx keyword arguments) of one `operation` call."""
+        if operation == "chart_data":
+            start, end = self._window(self.rng.choice((1, 1, 3, 7)))
+            return "GET", "/air/measurements/chart-data", {"params": {"city": self.city, "start_date": start, "end_date": end}}
+        if operation == "chart_data_bucket":
+            start, end = self._window(30)
+            return "GET", "/air/measurements/chart-data", {"params": {"city": self.city, "start_date": start, "end_date": end, "bucket": "1h"}}
+        if operation == "chart_data_page":
+            start, end = self._window(7)
+            return "GET", "/air/measurements/chart-data/page", {"params": {"city": self.city, "start_date": start, "end_date": end, "limit": 1000}}
+        if operation == "stats":
+            start, end = self._window(7)
+            return "GET", "/air/measurements/stats", {"params": {"city": self.city, "start_date": start, "end_date": end}}
+        if operation == "latest":
+            return "GET", "/air/measurements", {"params": {"city": self.city}}
+        if operation == "ingest":
+            sensor = self.rng.choice(self.sensors)
+            return "POST", "/air/measurements", {"params": {"city": sensor.city, "sensor_id": sensor.sensor_id, "value": self.rng.uniform(1, 50)}}
+        if operation == "batch_import":
+            first, self.next_import = self.next_import, self.next_import + timedelta(hours=1)
+            records = [
+                {"city": s.city, "sensor_id": s.sensor_id, "value": round(self.rng.uniform(1, 50), 2),
+                 "timestamp": (first + timedelta(minutes=m)).isoformat() + "Z"}
+                for m in range(0, 60, 6)
+                for s in self.sensors
+            ]
+            return "POST", "/air/measurements/batch", {"json": records}
+        if operation == "update":
+            return "POST", f"/air/measurements/{self.rng.choice(self.created)}", {"params": {"value": self.rng.uniform(1, 50)}}
+        if operation == "delete":
+            return "DELETE", f"/air/measurements/{self.created.pop(self.rng.randrange(len(self.created)))}", {}
+        raise ValueError(f"Unknown operation '{operation}'")
+
+    def _pick(self) -> str:
+        operation = self.rng.choices(list(SCENARIO_WEIGHTS), weights=list(SCENARIO_WEIGHTS.values()))[0]
+        # nothing to update or delete until an ingest created something
+        if operation in ("update", "delete") and len(self.created) < 2:
+            return "ingest"
+        return operation
+
+    async def _client_loop(self, client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            operation = self._pick()
+            method, path, kwargs = self._request(operation)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, self.base_url + path, **kwargs)
+                error = None if response.status_code < 400 else f"{response.status_code} {response.text[:200]}"
+            except httpx.HTTPError as e:
+                error = repr(e)
+            elapsed = time.perf_counter() - started
+
+            if error is not None:
+                self.errors[operation] += 1
+                self.first_errors.setdefault(operation, error)
+                continue
+            self.latencies[operation].append(elapsed)
+            if operation == "ingest":
+                self.created.append(response.json()["id"])
+
+    async def run(self, concurrency: int, duration: float) -> List[BenchmarkResult]:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(self._client_loop(client, started + duration) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+        for operation, error in self.first_errors.items():
+            print(f"{operation}: {self.errors[operation]} failed, first with {error}")
+        results = [
+            summarize(f"http_{operation}", self.latencies[operation], elapsed, self.errors[operation])
+            for operation in SCENARIO_WEIGHTS
+        ]
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        results.append(summarize("http_all", everything, elapsed, sum(self.errors.values())))
+        return results
+
+
+def run_load_test(
+        database_url: str,
+        start: datetime,
+        end: datetime,
+        concurrency: int = 8,
+        duration: float = 60,
+        workers: int = 1,
+) -> List[BenchmarkResult]:
+    with running_app(database_url, workers) as base_url:
+        scenario = LoadScenario(base_url, start, end)
+        print(f"Load test: {concurrency} clients for {duration:.0f}s against {base_url}")
+        return asyncio.run(scenario.run(concurrency, duration))
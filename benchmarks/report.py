@@ -0,0 +1,91 @@
+import json
+import platform
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# a result is a regression when its p95 is this much slower than the baseline's
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    count: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    ops_per_second: float
+
+
+def summarize(name: str, latencies: List[float], seconds: float, errors: int = 0) -> BenchmarkResult:
+    """Latency percentiles of `latencies` (seconds) and the throughput over `seconds` of wall time."""
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return BenchmarkResult(
+        name=name,
+        count=len(latencies),
+        errors=errors,
+        p50_ms=round(float(p50), 3),
+        p95_ms=round(float(p95), 3),
+        p99_ms=round(float(p99), 3),
+        ops_per_second=round(len(latencies) / seconds, 1) if seconds else 0.0,
+    )
+
+
+def print_results(title: str, results: List[BenchmarkResult]):
+    print(f"\n{title}")
+    print(f"{'benchmark':<34}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for r in results:
+        print(f"{r.name:<34}{r.count:>8}{r.errors:>8}{r.p50_ms:>10.2f}{r.p95_ms:>10.2f}{r.p99_ms:>10.2f}{r.ops_per_second:>10.1f}")
+
+
+def save_results(path: Path, results: List[BenchmarkResult], meta: dict):
+    document = {
+        "meta": {
+            **meta,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": {r.name: asdict(r) for r in results},
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def load_results(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _error_rate(errors: int, count: int) -> float:
+    return errors / (count + errors) if count + errors else 0.0
+
+
+def compare(results: List[BenchmarkResult], baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Names of the benchmarks whose p95 regressed by more than `tolerance`, with a table printed."""
+    previous: Dict[str, dict] = baseline.get("results", {})
+    regressions = []
+
+    print(f"\nCompared with the baseline of {baseline.get('meta', {}).get('created', '?')} (tolerance {tolerance:.0%})")
+    print(f"{'benchmark':<34}{'base p95':>10}{'p95':>10}{'change':>10}")
+    for r in results:
+        base = previous.get(r.name)
+        if not r.count:
+            print(f"{r.name:<34}{'-':>10}{'-':>10}{'no calls':>10}")
+            continue
+        if base is None or not base["p95_ms"]:
+            print(f"{r.name:<34}{'-':>10}{r.p95_ms:>10.2f}{'new':>10}")
+            continue
+
+        change = r.p95_ms / base["p95_ms"] - 1
+        flag = ""
+        if change > tolerance or _error_rate(r.errors, r.count) > _error_rate(base["errors"], base["count"]) + 0.01:
+            regressions.append(r.name)
+            flag = "  REGRESSION"
+        print(f"{r.name:<34}{base['p95_ms']:>10.2f}{r.p95_ms:>10.2f}{change:>+10.0%}{flag}")
+    return regressions
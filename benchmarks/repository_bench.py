@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from app.persistance.model.measurement_entity import MeasurementEntity, SessionLocal
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+from app.persistance.rollups import refresh_window
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+from benchmarks.report import BenchmarkResult, summarize
+
+
+def _cases(end: datetime) -> List[Tuple[str, Callable[[SQLMeasurementRepository], object]]]:
+    """(name, call) of every read benchmarked, all against the uncached SQL repository."""
+    city = get_sensor_registry().cities[0]
+    day, week, month = (end - timedelta(days=d) for d in (1, 7, 30))
+
+    def consume(rows):
+        return sum(1 for _ in rows)
+
+    return [
+        ("chart_payload_raw_1d", lambda r: r.get_chart_payload(city=city, start_date=day, end_date=end)),
+        ("chart_payload_raw_7d", lambda r: r.get_chart_payload(city=city, start_date=week, end_date=end)),
+        ("chart_payload_columnar_7d", lambda r: r.get_chart_payload("columnar", city=city, start_date=week, end_date=end)),
+        ("chart_data_models_7d", lambda r: r.get_chart_data(city=city, start_date=week, end_date=end)),
+        ("chart_payload_bucket_1h_30d", lambda r: r.get_chart_payload(city=city, start_date=month, end_date=end, bucket="1h")),
+        ("chart_payload_bucket_1d_all", lambda r: r.get_chart_payload(city=city, bucket="1d")),
+        ("chart_payload_p95_1h_7d", lambda r: r.get_chart_payload(city=city, start_date=week, end_date=end, bucket="1h", agg="p95")),
+        ("chart_payload_lttb_30d", lambda r: r.get_chart_payload(city=city, start_date=month, end_date=end, max_points=500)),
+        ("chart_page_1000", lambda r: r.get_chart_page(city=city, start_date=week, end_date=end, limit=1000)),
+        ("iter_chart_data_7d", lambda r: consume(r.iter_chart_data(city=city, start_date=week, end_date=end))),
+        ("series_30d", lambda r: r.get_series(city, start_date=month, end_date=end)),
+        ("latest", lambda r: r.get_latest(city)),
+    ]
+
+
+def _timed(call: Callable[[], object], repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_repository_benchmarks(end: datetime, repeat: int = 10, only: str = "") -> List[BenchmarkResult]:
+    """Times the repository methods on the seeded data, one warm-up call per case.
+
+    Every call gets a fresh session, like a request would.
+    """
+    results = []
+
+    def fresh(call):
+        def run():
+            db = SessionLocal()
+            try:
+                return call(SQLMeasurementRepository(db))
+            finally:
+                db.close()
+        return run
+
+    def selected(name: str) -> bool:
+        return not only or only in name
+
+    for name, call in _cases(end):
+        if not selected(name):
+            continue
+        fresh(call)()
+        latencies = _timed(fresh(call), repeat)
+        results.append(summarize(name, latencies, sum(latencies)))
+        print(f"{name}: p50 {results[-1].p50_ms:.1f} ms")
+
+    if selected("get_by_id"):
+        db = SessionLocal()
+        try:
+            ids = [row[0] for row in db.query(MeasurementEntity.id).limit(repeat * 10)]
+        finally:
+            db.close()
+        latencies = []
+        for measurement_id in ids:
+            latencies += _timed(fresh(lambda r, i=measurement_id: r.get_by_id(i)), 1)
+        results.append(summarize("get_by_id", latencies, sum(latencies)))
+
+    if selected("add_many_1000"):
+        results.append(_add_many(end, repeat))
+
+    return results
+
+
+def _add_many(end: datetime, repeat: int) -> BenchmarkResult:
+    """Inserts batches of 1000 rows after the seeded range and deletes them again."""
+    sensors = get_sensor_registry().sensors
+    latencies = []
+    db = SessionLocal()
+    try:
+        repo = SQLMeasurementRepository(db)
+        for run in range(repeat):
+            first = end + timedelta(days=365 + run)
+            batch = [
+                MeasurementEntity(
+                    city=s.city, parameter=s.parameter, value=1.0, unit=s.unit,
+                    timestamp=first + timedelta(minutes=i),
+                )
+                for i in range(1000 // len(sensors) + 1)
+                for s in sensors
+            ][:1000]
+            latencies += _timed(lambda batch=batch: repo.add_many(batch), 1)
+
+        # the rollups of the deleted days are rebuilt from nothing, i.e. dropped
+        added_from, added_to = end + timedelta(days=365), end + timedelta(days=366 + repeat)
+        db.query(MeasurementEntity).filter(MeasurementEntity.timestamp >= added_from).delete()
+        refresh_window(db, added_from, added_to)
+        db.commit()
+    finally:
+        db.close()
+    return summarize("add_many_1000", latencies, sum(latencies))
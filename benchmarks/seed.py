@@ -0,0 +1,82 @@
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import func, insert, select
+
+from app.persistance.model.measurement_entity import MeasurementEntity, SessionLocal, init_db
+from app.persistance.rollups import rebuild_rollups
+from app.persistance.sensor_metadata_loader import SensorInfo, get_sensor_registry
+
+SEED_BATCH_SIZE = 10_000
+
+# seeded history ends here, so repeated runs query the same rows whatever day it is
+SEED_END = datetime(2025, 1, 1)
+
+
+def seed_range(rows: int, interval_seconds: int) -> Tuple[datetime, datetime]:
+    """First and last timestamp of `rows` measurements spread over every configured sensor."""
+    steps = math.ceil(rows / len(get_sensor_registry().sensors))
+    return SEED_END - timedelta(seconds=interval_seconds * (steps - 1)), SEED_END
+
+
+def _value(sensor: SensorInfo, step: int, rng: random.Random) -> float:
+    # a daily cycle plus noise, enough for aggregations and LTTB to have something to pick from
+    base = {"co": 400.0, "no2": 30.0, "pm10": 35.0, "pm25": 20.0}.get(sensor.parameter, 5.0)
+    return round(base * (1 + 0.5 * math.sin(step / 1440 * 2 * math.pi)) + rng.gauss(0, base * 0.1), 2)
+
+
+def seed_measurements(rows: int, interval_seconds: int = 60, seed: int = 42) -> int:
+    """Fills an empty measurements table with `rows` synthetic readings and rebuilds the rollups.
+
+    Returns the number of rows inserted, 0 when the table already holds data.
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        if db.execute(select(func.count()).select_from(MeasurementEntity)).scalar():
+            return 0
+
+        rng = random.Random(seed)
+        sensors = get_sensor_registry().sensors
+        start, _ = seed_range(rows, interval_seconds)
+        started = time.perf_counter()
+
+        batch: List[dict] = []
+        inserted = 0
+        step = 0
+        while inserted + len(batch) < rows:
+            timestamp = start + timedelta(seconds=interval_seconds * step)
+            for sensor in sensors[:rows - inserted - len(batch)]:
+                batch.append({
+                    "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                    "city": sensor.city,
+                    "parameter": sensor.parameter,
+                    "value": _value(sensor, step, rng),
+                    "unit": sensor.unit,
+                    "timestamp": timestamp,
+                })
+            step += 1
+
+            if len(batch) >= SEED_BATCH_SIZE:
+                db.execute(insert(MeasurementEntity), batch)
+                db.commit()
+                inserted += len(batch)
+                batch = []
+                print(f"Seeded {inserted}/{rows} measurements", end="\r")
+
+        if batch:
+            db.execute(insert(MeasurementEntity), batch)
+            db.commit()
+            inserted += len(batch)
+        print(f"Seeded {inserted} measurements in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        rebuild_rollups(db, batch_days=30)
+        print(f"Rollups rebuilt in {time.perf_counter() - started:.1f}s")
+        return inserted
+    finally:
+        db.close()
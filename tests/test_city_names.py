@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.adapters.restapi import air_quality_controller
+from app.adapters.restapi.air_quality_controller import router
+from app.adapters.restapi.dependecies import get_export_manager, get_measurement_repository
+from app.domain.export_jobs import ExportManager
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.async_measurement_repository import InlineAsyncMeasurementRepository
+from app.persistance.repositories.in_memory_measurement_repository import InMemoryMeasurementRepository
+
+CITY_SPELLINGS = ["Warsaw", "warsaw", "WARSAW", "wArSaW"]
+
+
+@pytest.fixture
+def repository():
+    repo = InMemoryMeasurementRepository()
+    for hour in range(3):
+        repo.add(MeasurementEntity(
+            city="Warsaw", parameter="pm25", value=10.0 + hour, unit="µg/m³", timestamp=datetime(2024, 6, 1, hour),
+        ))
+    return repo
+
+
+@pytest.fixture
+def client(repository, monkeypatch, tmp_path):
+    app = FastAPI()
+    app.include_router(router)
+
+    async def measurement_repository():
+        yield InlineAsyncMeasurementRepository(repository)
+
+    @contextmanager
+    def open_measurement_repository():
+        yield repository
+
+    export_manager = ExportManager(open_measurement_repository, tmp_path)
+
+    app.dependency_overrides[get_measurement_repository] = measurement_repository
+    app.dependency_overrides[get_export_manager] = lambda: export_manager
+    monkeypatch.setattr(air_quality_controller, "open_measurement_repository", open_measurement_repository)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("city", CITY_SPELLINGS)
+def test_chart_data_matches_city_case_insensitively(client, city):
+    response = client.get("/api/air/measurements/chart-data", params={"city": city})
+
+    assert response.status_code == 200
+    assert [row["city"] for row in response.json()] == ["Warsaw"] * 3
+
+
+@pytest.mark.parametrize("city", CITY_SPELLINGS)
+def test_chart_page_matches_city_case_insensitively(client, city):
+    response = client.get("/api/air/measurements/chart-data/page", params={"city": city, "limit": 2})
+    assert response.status_code == 200
+    first = response.json()
+
+    response = client.get("/api/air/measurements/chart-data/page", params={"city": city, "cursor": first["next_cursor"]})
+    assert response.status_code == 200
+    assert [row["value"] for row in first["items"] + response.json()["items"]] == [10.0, 11.0, 12.0]
+
+
+@pytest.mark.parametrize("city", CITY_SPELLINGS)
+def test_chart_stream_matches_city_case_insensitively(client, city):
+    response = client.get("/api/air/measurements/chart-data/stream", params={"city": city})
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
+
+
+def test_chart_batch_matches_city_case_insensitively(client):
+    series = [{"key": city, "city": city} for city in CITY_SPELLINGS]
+    response = client.post("/api/air/measurements/chart-data/batch", json={"series": series})
+
+    assert response.status_code == 200
+    assert {key: len(rows) for key, rows in response.json().items()} == {city: 3 for city in CITY_SPELLINGS}
+
+
+@pytest.mark.parametrize("city", CITY_SPELLINGS)
+def test_export_matches_city_case_insensitively(client, city):
+    response = client.post("/api/air/exports", json={"city": city})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    for _ in range(100):
+        job = client.get(f"/api/air/exports/{job_id}").json()
+        if job["state"] not in ("queued", "running"):
+            break
+        time.sleep(0.02)
+    assert job["state"] == "done"
+    assert job["rows"] == 3
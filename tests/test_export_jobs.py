@@ -0,0 +1,27 @@
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.domain.export_jobs import ExportManager
+from app.persistance.repositories.in_memory_measurement_repository import InMemoryMeasurementRepository
+
+
+@contextmanager
+def open_repository():
+    yield InMemoryMeasurementRepository()
+
+
+def test_purge_only_deletes_expired_job_files(tmp_path):
+    job_id = uuid.uuid4().hex
+    names = [f"{job_id}.csv.gz", f"{job_id}.parquet", f"{job_id}.parquet.tmp", "README.txt", "report.parquet", f"{job_id}.csv"]
+    expired = time.time() - 2 * 3600
+    for name in names:
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (expired, expired))
+    fresh = f"{uuid.uuid4().hex}.csv.gz"
+    (tmp_path / fresh).write_text("x")
+
+    ExportManager(open_repository, tmp_path, retention_hours=1).purge_expired()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(["README.txt", "report.parquet", f"{job_id}.csv", fresh])
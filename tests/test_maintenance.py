@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.domain.maintenance_scheduler import MaintenanceScheduler
+from app.persistance.maintenance import UNIQUE_INDEX, MaintenanceReport, enforce_retention, merge_duplicates
+from app.persistance.model.measurement_entity import MeasurementEntity
+
+NOW = datetime(2024, 7, 1, 12, tzinfo=timezone.utc)
+
+
+def measurement(ts, parameter="pm25", city="Warsaw", value=1.0):
+    return MeasurementEntity(city=city, parameter=parameter, value=value, unit="µg/m³", timestamp=ts)
+
+
+def timestamps(db, parameter):
+    m = MeasurementEntity
+    return db.execute(select(m.timestamp).where(m.parameter == parameter).order_by(m.timestamp)).scalars().all()
+
+
+@pytest.fixture
+def duplicates(db):
+    db.connection().exec_driver_sql(f"DROP INDEX {UNIQUE_INDEX}")
+    for hour in range(4):
+        for value in (1.0, 2.0):
+            db.add(measurement(datetime(2024, 6, 1, hour), value=value))
+    db.commit()
+    return db
+
+
+def test_retention_per_parameter_with_default(db):
+    for day in (1, 10, 25):
+        for parameter in ("pm25", "no2", "o3"):
+            db.add(measurement(datetime(2024, 6, day), parameter, city="Warsaw"))
+            db.add(measurement(datetime(2024, 6, day), parameter, city="Krakow"))
+    db.commit()
+
+    removed = enforce_retention(db, {"no2": 10, "default": 25}, batch_size=1, now=NOW)
+
+    assert removed == {"no2": 4, "default": 4}
+    assert timestamps(db, "no2") == [datetime(2024, 6, 25)] * 2
+    assert timestamps(db, "pm25") == [datetime(2024, 6, 10), datetime(2024, 6, 10), datetime(2024, 6, 25), datetime(2024, 6, 25)]
+
+
+def test_merge_duplicates_keeps_one_row_per_key(duplicates):
+    assert merge_duplicates(duplicates, batch_size=3) == 4
+    assert duplicates.execute(select(func.count()).select_from(MeasurementEntity)).scalar() == 4
+
+
+def test_merge_duplicates_keeps_the_earliest_inserted_row(db):
+    db.connection().exec_driver_sql(f"DROP INDEX {UNIQUE_INDEX}")
+    for value in range(8):
+        db.add(measurement(datetime(2024, 6, 1), value=float(value)))
+        db.commit()
+
+    assert merge_duplicates(db) == 7
+    assert db.execute(select(MeasurementEntity.value)).scalars().all() == [0.0]
+
+
+def test_merge_duplicates_scans_for_groups_once(duplicates, engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    assert merge_duplicates(duplicates, batch_size=1) == 4
+    assert sum("HAVING" in sql for sql in statements) == 1
+
+
+def test_merge_duplicates_stops_between_batches(duplicates):
+    stop = threading.Event()
+    stop.set()
+
+    assert merge_duplicates(duplicates, batch_size=1, stop=stop) == 0
+
+
+def test_scheduler_stop_waits_for_the_run_to_see_the_stop():
+    started, seen = threading.Event(), []
+
+    def run(stop: threading.Event) -> MaintenanceReport:
+        started.set()
+        seen.append(stop.wait(5))
+        return MaintenanceReport()
+
+    async def scenario():
+        scheduler = MaintenanceScheduler(run, interval_seconds=3600)
+        await scheduler.start()
+        await asyncio.to_thread(started.wait, 5)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert seen == [True]
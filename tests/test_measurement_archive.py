@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+
+from app.domain.pagination import encode_cursor
+from app.persistance import measurement_archive
+from app.persistance.measurement_archive import MeasurementArchive, archive_closed_months
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def repo(db, tmp_path, monkeypatch):
+    # four archived months, two parameters interleaved, and a few hot rows after the horizon
+    rows = [
+        MeasurementEntity(city="Warsaw", parameter=parameter, value=float(i), unit="µg/m³", timestamp=START + timedelta(hours=i))
+        for i in range(0, 2880, 2)
+        for parameter in ("pm25", "no2")
+    ]
+    rows += [
+        MeasurementEntity(city="Warsaw", parameter="pm25", value=1.0, unit="µg/m³", timestamp=datetime(2024, 5, 2, h))
+        for h in range(3)
+    ]
+    db.add_all(rows)
+    db.commit()
+
+    monkeypatch.setattr(measurement_archive, "ROW_GROUP_SIZE", 64)
+    monkeypatch.setattr(measurement_archive, "READ_BATCH_SIZE", 16)
+    archive = MeasurementArchive(tmp_path)
+    archive_closed_months(db, archive, keep_months=1, today=date(2024, 5, 15))
+    return SQLMeasurementRepository(db, archive)
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    read = []
+    iter_batches = pq.ParquetFile.iter_batches
+
+    def counting(self, *args, **kwargs):
+        for batch in iter_batches(self, *args, **kwargs):
+            read.append(batch.num_rows)
+            yield batch
+
+    monkeypatch.setattr(pq.ParquetFile, "iter_batches", counting)
+    return read
+
+
+def test_stream_merges_segments_lazily(repo, batches):
+    rows = repo.iter_chart_data(city="Warsaw")
+
+    first = next(rows)
+    assert first.timestamp == START
+    # the first batch of every segment, not the whole archive
+    assert sum(batches) <= 8 * 16
+
+    rest = list(rows)
+    keys = [(r.timestamp, r.id) for r in [first] + rest]
+    assert len(keys) == 2880 + 3
+    assert keys[:-3] == sorted(keys[:-3])
+    assert all(r.timestamp >= datetime(2024, 5, 1) for r in rest[-3:])
+
+
+def test_pages_start_reading_at_the_cursor(repo, batches):
+    everything = [(r.timestamp, r.id) for r in repo.iter_chart_data(city="Warsaw")]
+
+    collected, cursor = [], None
+    for _ in range(3):
+        del batches[:]
+        items, cursor = repo.get_chart_page(city="Warsaw", limit=10, cursor=cursor)
+        collected += [(m.timestamp, m.id) for m in items]
+        assert sum(batches) <= 2 * 16
+    assert collected == everything[:30]
+
+    # the cursor prunes whole months and row groups, a page deep in April decodes a group per segment
+    del batches[:]
+    april = everything.index(next(k for k in everything if k[0] >= datetime(2024, 4, 20)))
+    items, cursor = repo.get_chart_page(city="Warsaw", limit=10, cursor=encode_cursor(*everything[april]))
+    assert [(m.timestamp, m.id) for m in items] == everything[april + 1:april + 11]
+    assert sum(batches) <= 2 * 64
+
+
+def test_last_archived_page_continues_into_the_table(repo):
+    everything = [(r.timestamp, r.id) for r in repo.iter_chart_data(city="Warsaw")]
+
+    items, cursor = repo.get_chart_page(city="Warsaw", limit=5, cursor=encode_cursor(*everything[-6]))
+
+    assert [(m.timestamp, m.id) for m in items] == everything[-5:]
+    assert cursor is None
+
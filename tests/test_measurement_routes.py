@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.adapters.restapi import air_quality_controller
+from app.adapters.restapi.air_quality_controller import router
+from app.adapters.restapi.dependecies import get_measurement_repository
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.async_measurement_repository import InlineAsyncMeasurementRepository
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+
+NOW = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def repository(db):
+    return SQLMeasurementRepository(db)
+
+
+@pytest.fixture
+def client(repository, monkeypatch):
+    app = FastAPI()
+    app.include_router(router)
+
+    async def measurement_repository():
+        yield InlineAsyncMeasurementRepository(repository)
+
+    app.dependency_overrides[get_measurement_repository] = measurement_repository
+    monkeypatch.setattr(air_quality_controller, "datetime", FrozenDatetime)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_adding_a_taken_timestamp_conflicts(client, repository):
+    params = {"city": "warsaw", "sensor_id": 36161, "value": 18.4}
+    assert client.post("/api/air/measurements", params=params).status_code == 201
+
+    response = client.post("/api/air/measurements", params={**params, "value": 20.0})
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Measurement of pm10 in Warsaw at 2024-06-01T12:00:00 already exists"
+    # the session was rolled back and keeps working
+    assert [m.value for m in repository.get_chart_data(city="Warsaw")] == [18.4]
+
+
+def test_updating_onto_a_taken_timestamp_conflicts(client, repository):
+    for hour in (10, 11):
+        repository.add(MeasurementEntity(
+            city="Warsaw", parameter="pm10", value=float(hour), unit="µg/m³", timestamp=datetime(2024, 6, 1, hour),
+        ))
+    moved = repository.get_chart_data(city="Warsaw")[1]
+
+    response = client.post(f"/api/air/measurements/{moved.id}", params={"timestamp": "2024-06-01T10:00:00Z"})
+
+    assert response.status_code == 409
+    assert "INSERT" not in response.text and "UPDATE" not in response.text
+    assert [(m.timestamp, m.value) for m in repository.get_chart_data(city="Warsaw")] == [
+        (datetime(2024, 6, 1, 10), 10.0),
+        (datetime(2024, 6, 1, 11), 11.0),
+    ]
@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.adapters.restapi.air_quality_controller import router
+from app.adapters.restapi.dependecies import get_measurement_repository
+from app.adapters.restapi.metrics_middleware import MetricsMiddleware
+from app.domain.metrics import HTTP_REQUESTS
+from app.persistance.repositories.async_measurement_repository import InlineAsyncMeasurementRepository
+from app.persistance.repositories.in_memory_measurement_repository import InMemoryMeasurementRepository
+
+
+def api():
+    app = FastAPI()
+    app.include_router(router)
+
+    async def measurement_repository():
+        yield InlineAsyncMeasurementRepository(InMemoryMeasurementRepository())
+
+    app.dependency_overrides[get_measurement_repository] = measurement_repository
+    app.add_middleware(MetricsMiddleware, enabled=True)
+    return app
+
+
+def test_routes_are_labelled_with_the_served_path():
+    with TestClient(api()) as client:
+        assert client.delete("/api/air/measurements/missing").status_code == 404
+
+    assert 'route="/api/air/measurements/{measurement_id}",status="404"' in "\n".join(HTTP_REQUESTS.render())
+
+
+def test_mounted_app_labels_include_the_mount_path():
+    outer = FastAPI()
+    outer.mount("/aq", api())
+    with TestClient(outer) as client:
+        assert client.delete("/aq/api/air/measurements/missing").status_code == 404
+
+    assert 'route="/aq/api/air/measurements/{measurement_id}",status="404"' in "\n".join(HTTP_REQUESTS.render())
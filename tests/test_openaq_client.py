@@ -0,0 +1,135 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.adapters.openaq import openaq_client
+from app.adapters.openaq.openaq_client import OpenAQClient
+from app.adapters.openaq.stub_server import StubState, serve
+from app.domain.backfill import BackfillCheckpoint, BackfillJob
+from app.persistance.repositories.async_measurement_repository import InlineAsyncMeasurementRepository
+from app.persistance.repositories.in_memory_measurement_repository import InMemoryMeasurementRepository
+from app.persistance.sensor_metadata_loader import get_sensor_registry
+
+HISTORY_FROM = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def stub():
+    """Starts a stub server with the given StubState settings, returns (state, base_url)."""
+    servers = []
+
+    def start(rate_limit=1000, window_seconds=60, latency=0.0, error_rate=0.0):
+        state = StubState(rate_limit, window_seconds, latency, error_rate)
+        servers.append(serve("127.0.0.1", 0, state))
+        return state, f"http://127.0.0.1:{servers[-1].server_port}/v3"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def run(client: OpenAQClient, call):
+    async def scenario():
+        async with client:
+            return await call(client)
+
+    return asyncio.run(scenario())
+
+
+def test_retries_after_429_honouring_retry_after(stub):
+    state, base_url = stub(rate_limit=1, window_seconds=1)
+    client = OpenAQClient(base_url, "key", requests_per_minute=6000, backoff_seconds=0.01)
+
+    started = time.monotonic()
+    payloads = run(client, lambda c: c.get_latest_many([1, 2]))
+
+    assert set(payloads) == {1, 2}
+    # the second request was refused once, then waited for the window to reset
+    assert state.requests == 3
+    assert time.monotonic() - started >= 0.9
+
+
+def test_retries_with_full_jitter_backoff_then_raises(stub, monkeypatch):
+    state, base_url = stub(error_rate=1.0)
+    backoffs = []
+    monkeypatch.setattr(openaq_client, "random", SimpleNamespace(uniform=lambda a, b: backoffs.append((a, b)) or 0))
+    client = OpenAQClient(base_url, "key", requests_per_minute=6000, max_retries=3, backoff_seconds=0.01)
+
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(client, lambda c: c.get_latest(1))
+
+    assert error.value.response.status_code == 503
+    assert state.requests == 4
+    assert backoffs == [(0, 0.02), (0, 0.04), (0, 0.08)]
+
+
+def test_token_bucket_spaces_requests(stub):
+    state, base_url = stub()
+    # 10 requests per second, a burst of 2
+    client = OpenAQClient(base_url, "key", max_concurrency=2, requests_per_minute=600)
+
+    started = time.monotonic()
+    run(client, lambda c: c.get_latest_many(range(1, 7)))
+
+    assert state.requests == 6
+    assert time.monotonic() - started >= 0.35
+
+
+def test_rate_limit_headers_pause_before_the_server_refuses(stub):
+    state, base_url = stub(rate_limit=2, window_seconds=1)
+    client = OpenAQClient(base_url, "key", max_concurrency=1, requests_per_minute=6000)
+
+    async def sequential(c):
+        for location_id in (1, 2, 3):
+            await c.get_latest(location_id)
+
+    started = time.monotonic()
+    run(client, sequential)
+
+    # x-ratelimit-remaining reached 0 after the second request, the third waited instead of getting a 429
+    assert state.requests == 3
+    assert time.monotonic() - started >= 0.9
+
+
+def test_sensor_measurements_pages(stub):
+    _, base_url = stub()
+    client = OpenAQClient(base_url, "key", requests_per_minute=6000)
+
+    async def pages(c):
+        return [
+            await c.get_sensor_measurements(1, HISTORY_FROM, HISTORY_FROM + timedelta(hours=25), page=page, limit=10)
+            for page in (1, 2, 3, 4)
+        ]
+
+    result = run(client, pages)
+
+    assert [len(p["results"]) for p in result] == [10, 10, 5, 0]
+    assert {p["meta"]["found"] for p in result} == {25}
+    stamps = [r["period"]["datetimeFrom"]["utc"] for p in result for r in p["results"]]
+    assert len(set(stamps)) == 25
+
+
+def test_backfill_walks_every_page(stub, tmp_path):
+    _, base_url = stub()
+    repository = InMemoryMeasurementRepository()
+    sensors = get_sensor_registry().sensors[:2]
+    checkpoint = BackfillCheckpoint.open(tmp_path / "checkpoint.json", HISTORY_FROM, HISTORY_FROM + timedelta(hours=25))
+
+    class open_repository:
+        async def __aenter__(self):
+            return InlineAsyncMeasurementRepository(repository)
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+    client = OpenAQClient(base_url, "key", requests_per_minute=6000)
+    report = run(client, lambda c: BackfillJob(open_repository, c, sensors, checkpoint, page_size=10).run())
+
+    assert report.errors == {}
+    assert report.pages == 3 * len(sensors)
+    assert report.rows_stored == 25 * len(sensors)
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.persistance.model.measurement_rollup_entity  # noqa: F401
+from app.domain.chart_data_cache import ChartDataCache
+from app.persistance.model.measurement_entity import Base, MeasurementEntity
+from app.persistance.read_routing import ReplicaSet, RoutingSession, read_from_primary
+from app.persistance.repositories.caching_measurement_repository import CachingMeasurementRepository
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a primary and a replica that never catches up."""
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(bind=engine)
+
+    yield sessionmaker(bind=primary, class_=RoutingSession, replicas=ReplicaSet([replica]), autoflush=False)
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def repository(session_factory):
+    cache = ChartDataCache(max_entries=100, ttl_seconds=60)
+    sessions = []
+
+    def open_repository():
+        sessions.append(session_factory())
+        return CachingMeasurementRepository(SQLMeasurementRepository(sessions[-1]), cache)
+
+    yield open_repository
+    for session in sessions:
+        session.close()
+
+
+def chart_rows(repo):
+    return repo.get_chart_payload(city="Warsaw", sort_by=["timestamp:asc"]).body
+
+
+def test_uncached_reads_go_to_the_replica(session_factory):
+    repo = SQLMeasurementRepository(session_factory())
+    repo.add(MeasurementEntity(city="Warsaw", parameter="pm25", value=1.0, unit="µg/m³", timestamp=datetime(2024, 6, 1)))
+
+    assert repo.get_chart_rows(city="Warsaw") == []
+
+
+def test_cached_payloads_are_loaded_from_the_primary(repository):
+    writer = repository()
+    writer.add(MeasurementEntity(city="Warsaw", parameter="pm25", value=1.0, unit="µg/m³", timestamp=datetime(2024, 6, 1)))
+
+    # another client fills the cache first
+    assert b"pm25" in chart_rows(repository())
+
+    token = read_from_primary.set(True)
+    try:
+        assert b"pm25" in chart_rows(repository())
+    finally:
+        read_from_primary.reset(token)
+
+
+def test_read_your_writes_window_bypasses_the_cache(repository):
+    assert b"pm25" not in chart_rows(repository())
+
+    # written by another process, this cache was not invalidated
+    other_process = CachingMeasurementRepository(repository().inner, ChartDataCache(max_entries=100, ttl_seconds=60))
+    other_process.add(MeasurementEntity(city="Warsaw", parameter="pm25", value=1.0, unit="µg/m³", timestamp=datetime(2024, 6, 1)))
+
+    token = read_from_primary.set(True)
+    try:
+        assert b"pm25" in chart_rows(repository())
+        assert b"pm25" in repository().get_chart_payloads([{"city": "Warsaw", "sort_by": ["timestamp:asc"]}])[0].body
+    finally:
+        read_from_primary.reset(token)
@@ -0,0 +1,91 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.persistance.model.measurement_entity import Base, MeasurementEntity
+from app.persistance.model.measurement_rollup_entity import DailyRollupEntity, HourlyRollupEntity
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+from app.persistance.rollups import rebuild_rollups, refresh_rollups
+
+
+def measurement(ts, value, parameter="pm25"):
+    return MeasurementEntity(city="Warsaw", parameter=parameter, value=value, unit="µg/m³", timestamp=ts)
+
+
+def rollups(db, entity):
+    return [
+        (r.city, r.parameter, r.timestamp, r.count, r.sum, r.min, r.max)
+        for r in db.execute(select(entity).order_by(entity.city, entity.parameter, entity.timestamp)).scalars()
+    ]
+
+
+def test_refresh_only_recomputes_touched_buckets(db):
+    # a bucket between the two changes, refreshing the whole span would delete it
+    sentinel = HourlyRollupEntity(
+        city="Warsaw", parameter="pm25", timestamp=datetime(2024, 1, 1, 5), unit="µg/m³", count=1, sum=9, min=9, max=9,
+    )
+    db.add_all([measurement(datetime(2023, 6, 1, 10, 15), 1.0), measurement(datetime(2024, 6, 1, 10, 45), 3.0), sentinel])
+    db.flush()
+
+    refresh_rollups(db, [("Warsaw", "pm25", datetime(2023, 6, 1, 10, 15)), ("Warsaw", "pm25", datetime(2024, 6, 1, 10, 45))])
+
+    assert rollups(db, HourlyRollupEntity) == [
+        ("Warsaw", "pm25", datetime(2023, 6, 1, 10), 1, 1.0, 1.0, 1.0),
+        ("Warsaw", "pm25", datetime(2024, 1, 1, 5), 1, 9.0, 9.0, 9.0),
+        ("Warsaw", "pm25", datetime(2024, 6, 1, 10), 1, 3.0, 3.0, 3.0),
+    ]
+    assert [r[2] for r in rollups(db, DailyRollupEntity)] == [datetime(2023, 6, 1), datetime(2024, 6, 1)]
+
+
+def test_refresh_matches_a_full_rebuild(db):
+    rows = [
+        measurement(datetime(2024, 6, 1, 0, 10), 1.0),
+        measurement(datetime(2024, 6, 1, 0, 50), 2.0),
+        measurement(datetime(2024, 6, 1, 1, 5), 4.0),
+        measurement(datetime(2024, 6, 2, 23, 59), 8.0),
+        measurement(datetime(2024, 6, 1, 0, 30), 16.0, "no2"),
+        measurement(datetime(2024, 6, 9, 12), 32.0, "no2"),
+    ]
+    db.add_all(rows)
+    db.flush()
+
+    refresh_rollups(db, [(m.city, m.parameter, m.timestamp) for m in rows])
+    refreshed = rollups(db, HourlyRollupEntity), rollups(db, DailyRollupEntity)
+    rebuild_rollups(db)
+
+    assert refreshed == (rollups(db, HourlyRollupEntity), rollups(db, DailyRollupEntity))
+
+
+def test_concurrent_writers_to_one_bucket(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    start = threading.Barrier(2)
+    errors = []
+
+    def write(offset):
+        with Session() as db:
+            repo = SQLMeasurementRepository(db)
+            start.wait()
+            try:
+                for i in range(20):
+                    repo.add(measurement(datetime(2024, 6, 1, 10) + timedelta(seconds=2 * i + offset), float(offset + 1)))
+                repo.add_many([measurement(datetime(2024, 6, 1, 11, offset), 5.0)])
+            except Exception as e:
+                errors.append(e)
+
+    writers = [threading.Thread(target=write, args=(offset,)) for offset in (0, 1)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    with Session() as db:
+        written = rollups(db, HourlyRollupEntity), rollups(db, DailyRollupEntity)
+        rebuild_rollups(db)
+        assert errors == []
+        assert written[0][0][3:] == (40, 60.0, 1.0, 2.0)
+        assert written == (rollups(db, HourlyRollupEntity), rollups(db, DailyRollupEntity))
+    engine.dispose()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.persistance.model.measurement_entity import MeasurementEntity
+from app.persistance.repositories.sql_measurement_repository import SQLMeasurementRepository
+
+WARSAW = timezone(timedelta(hours=2))
+
+
+@pytest.fixture
+def bound_datetimes(engine):
+    """Every datetime bound as a statement parameter, as handed to the dialect."""
+    seen = []
+
+    # before the bind processors, SQLite's turns datetimes into strings
+    @event.listens_for(engine, "before_cursor_execute")
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        for params in context.compiled_parameters:
+            seen.extend(v for v in params.values() if isinstance(v, datetime))
+
+    return seen
+
+
+def measurement(ts, value=1.0, parameter="pm25"):
+    return MeasurementEntity(city="Warsaw", parameter=parameter, value=value, unit="µg/m³", timestamp=ts)
+
+
+def test_writes_and_paging_bind_naive_utc(db, bound_datetimes):
+    repo = SQLMeasurementRepository(db)
+
+    added = repo.add(measurement(datetime(2024, 6, 1, 12, tzinfo=WARSAW)))
+    repo.add_many([
+        measurement(datetime(2024, 6, 1, 10, 30, tzinfo=timezone.utc), 2.0),
+        measurement("2024-06-01T13:00:00+02:00", 3.0, "no2"),
+    ])
+    repo.update(added.id, measurement(datetime(2024, 6, 1, 14, tzinfo=WARSAW), 4.0))
+    assert repo.measurement_exists("Warsaw", "pm25", datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+
+    page, cursor = repo.get_chart_page(city="Warsaw", limit=1)
+    rest, _ = repo.get_chart_page(city="Warsaw", limit=10, cursor=cursor)
+
+    assert bound_datetimes
+    assert all(ts.tzinfo is None for ts in bound_datetimes)
+    assert [m.timestamp for m in page + rest] == [
+        datetime(2024, 6, 1, 10, 30),
+        datetime(2024, 6, 1, 11),
+        datetime(2024, 6, 1, 12),
+    ]
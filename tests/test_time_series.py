@@ -0,0 +1,31 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.domain.chart_payload import ChartRow
+from app.domain.time_series import downsample, lttb
+
+
+@pytest.fixture
+def warsaw_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Warsaw")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_downsample_weights_points_by_utc_time_across_dst(warsaw_time):
+    # hourly UTC rows over the spring-forward night, the naive 02:00 does not exist in Warsaw
+    rng = random.Random(12)
+    start = datetime(2024, 3, 30, 12)
+    rows = [
+        ChartRow(str(i), "Warsaw", "pm25", rng.uniform(0, 100), "µg/m³", start + timedelta(hours=i))
+        for i in range(36)
+    ]
+
+    expected = lttb([(i * 3600.0, row.value) for i, row in enumerate(rows)], 8)
+
+    assert downsample(rows, 8) == [rows[i] for i in expected]